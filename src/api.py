@@ -1,17 +1,24 @@
 """
 FastAPI REST API - Mobil test için
 """
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
+import asyncio
+import json
+import threading
 import time
 
-from fastapi import FastAPI, HTTPException  # type: ignore
+from fastapi import FastAPI, HTTPException, Request  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
+from fastapi.responses import StreamingResponse  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
 from pydantic import BaseModel, Field
 
 import uvicorn  # type: ignore
 
 from config import config
-from rag_pipeline_hybrid import HybridRAGPipeline
+from rag_pipeline_async import AsyncHybridRAGPipeline
+from resilience import DeadlineExceeded, BackendUnavailable
+from retrieval_types import sources_to_json, result_to_json
 
 
 # ============================================================
@@ -36,6 +43,40 @@ class QueryRequest(BaseModel):
         default=True,
         description="Web fallback kullanıldı mı?",
     )
+    expand_neighbors: Optional[int] = Field(
+        default=None,
+        ge=0,
+        le=2,
+        description="En iyi hit'lere eklenecek komşu chunk sayısı (her yönde)",
+    )
+    adaptive_k: Optional[bool] = Field(
+        default=None,
+        description="top_k yerine similarity dağılımına göre k seçilsin mi?",
+    )
+    retrieval_mode: Optional[str] = Field(
+        default=None,
+        pattern="^(flat|multi_query|hierarchical)$",
+        description="Retrieval modu: flat, multi_query veya hierarchical",
+    )
+    books: Optional[List[str]] = Field(
+        default=None,
+        description="Sadece bu kitaplarda ara (PDF dosya adları, boş = hepsi)",
+    )
+    use_cache: Optional[bool] = Field(
+        default=True,
+        description="False ise generation cache atlanır, cevap yeniden üretilir",
+    )
+    deadline_s: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=300,
+        description="Uçtan uca süre limiti, saniye (boş = REQUEST_DEADLINE)",
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Chat oturumu; aynı id ile gelen takip soruları Llama context'ini devam ettirir",
+    )
 
 
 class Source(BaseModel):
@@ -51,11 +92,12 @@ class QueryResponse(BaseModel):
     success: bool
     answer: str
     confidence: float
-    method_used: str  # "llama" veya "claude+web"
+    method_used: str  # "llama", "claude+web" veya "entity"
     sources: List[Source]
     web_enhanced: bool
     web_sources: Optional[List[Dict[str, str]]] = None
     response_time: float
+    diagnostics: Optional[Dict[str, Any]] = None
 
 
 class HealthResponse(BaseModel):
@@ -98,8 +140,9 @@ app.add_middleware(
 )
 
 # Global RAG pipeline (lazy init)
-rag_pipeline: Optional[HybridRAGPipeline] = None
+rag_pipeline: Optional[AsyncHybridRAGPipeline] = None
 pipeline_ready: bool = False
+_pipeline_lock = threading.Lock()
 
 
 # ============================================================
@@ -117,12 +160,22 @@ async def startup_event():
         config.validate()
         print("✅ Config OK. RAG pipeline ilk istek geldiğinde oluşturulacak.")
         print(f"ℹ️ USE_OLLAMA = {config.USE_OLLAMA}")
+        if config.USE_OLLAMA and config.OLLAMA_WARMUP:
+            # Pipeline lazy kurulsa da Ollama modeli (her sunucuda) şimdiden yüklensin
+            AsyncHybridRAGPipeline.start_warm_up()
     except Exception as e:
         print(f"❌ Config hatası: {e}")
         # Config bozuksa server hiç ayağa kalkmasın
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Async HTTP bağlantılarını ve thread pool'u kapat"""
+    if rag_pipeline is not None:
+        await rag_pipeline.aclose()
+
+
 # ============================================================
 # ENDPOINTLER
 # ============================================================
@@ -149,37 +202,51 @@ async def health_check():
         - Vector DB document sayısı (pipeline yüklüyse)
         - PDF sayısı
     """
-    import requests
-    from anthropic import Anthropic
+    import httpx  # type: ignore
+    from anthropic import AsyncAnthropic
     from pdf_processor import list_pdfs
 
-    # Ollama kontrol (isteğe bağlı)
-    ollama_ok = False
-    if getattr(config, "USE_OLLAMA", False):
-        try:
-            r = requests.get(f"{config.OLLAMA_BASE_URL}/api/tags", timeout=3)
-            ollama_ok = r.status_code == 200
-        except Exception:
-            ollama_ok = False
+    # Pipeline yüklüyse paylaşılan async client'lar, değilse bu istek için geçici olanlar
+    owned = rag_pipeline is None
+    http = httpx.AsyncClient() if owned else rag_pipeline.http
+    claude = AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY) if owned else rag_pipeline.async_claude
 
-    # Claude kontrol
-    claude_ok = False
     try:
-        client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
-        client.messages.create(
-            model=config.CLAUDE_MODEL,
-            max_tokens=10,
-            messages=[{"role": "user", "content": "Hi"}],
-        )
-        claude_ok = True
-    except Exception:
+        # Ollama kontrol (isteğe bağlı) - pool'daki sunucular paralel yoklanır,
+        # biri cevap veriyorsa yeterli
+        async def probe(url: str) -> bool:
+            try:
+                r = await http.get(f"{url}/api/tags", timeout=config.HEALTH_CHECK_TIMEOUT)
+                return r.status_code == 200
+            except Exception:
+                return False
+
+        ollama_ok = False
+        if getattr(config, "USE_OLLAMA", False):
+            ollama_ok = any(await asyncio.gather(*(probe(url) for url in config.OLLAMA_BASE_URLS)))
+
+        # Claude kontrol
         claude_ok = False
+        try:
+            await claude.messages.create(
+                model=config.CLAUDE_MODEL,
+                max_tokens=10,
+                messages=[{"role": "user", "content": "Hi"}],
+                timeout=config.HEALTH_CHECK_TIMEOUT,
+            )
+            claude_ok = True
+        except Exception:
+            claude_ok = False
+    finally:
+        if owned:
+            await http.aclose()
+            await claude.close()
 
     # Vector DB
     vector_count = 0
     if rag_pipeline is not None:
         try:
-            vector_count = rag_pipeline.vector_db.collection.count()
+            vector_count = await run_in_threadpool(rag_pipeline.vector_db.count)
         except Exception:
             vector_count = 0
 
@@ -202,8 +269,74 @@ async def health_check():
     )
 
 
+def get_pipeline() -> AsyncHybridRAGPipeline:
+    """
+    İlk istek geldiğinde RAG pipeline'ı oluştur (lazy init)
+
+    Model yükleme bloklayıcı olduğu için async endpoint'lerden
+    run_in_threadpool ile çağrılır; aynı anda gelen ilk istekler tek init bekler.
+    """
+    global rag_pipeline, pipeline_ready
+
+    if rag_pipeline is None:
+        with _pipeline_lock:
+            if rag_pipeline is None:
+                try:
+                    print("⚙️  İlk istek geldi, RAG pipeline oluşturuluyor...")
+                    start_init = time.time()
+                    rag_pipeline = AsyncHybridRAGPipeline()
+                    pipeline_ready = True
+                    print(f"✅ RAG pipeline hazır. Süre: {time.time() - start_init:.2f} sn")
+                except Exception as e:
+                    pipeline_ready = False
+                    print(f"❌ RAG pipeline oluşturulamadı: {e}")
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"RAG pipeline init hatası: {str(e)}",
+                    )
+
+    if rag_pipeline is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG Pipeline henüz hazır değil",
+        )
+
+    return rag_pipeline
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Pipeline event'ini Server-Sent Events formatına çevir"""
+    payload = result_to_json(event) if "sources" in event else event
+    return f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def cancel_on_disconnect(task: asyncio.Task, http_request: Request,
+                               pipeline: AsyncHybridRAGPipeline):
+    """
+    Pipeline task'ını bekle; client bağlantıyı kapatırsa task'ı iptal et
+
+    İptal Ollama/Claude/web isteklerine kadar iner (httpx bağlantıları kapanır).
+
+    Raises:
+        HTTPException(499): Client bağlantıyı kapattı (cevabı okuyan yok)
+    """
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print("🔌 Client bağlantıyı kapattı - pipeline iptal ediliyor")
+                task.cancel()
+                pipeline.wasted_compute.add(requests_cancelled=1)
+                raise HTTPException(status_code=499, detail="Client bağlantıyı kapattı")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 @app.post("/query", response_model=QueryResponse, tags=["RAG"])
-async def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest, http_request: Request):
     """
     RAG sistemine soru sor
 
@@ -216,39 +349,26 @@ async def ask_question(request: QueryRequest):
     }
     ```
     """
-    global rag_pipeline, pipeline_ready
-
-    # İlk istek geldiğinde RAG pipeline'ı oluştur (lazy init)
-    if rag_pipeline is None:
-        try:
-            print("⚙️  İlk istek geldi, RAG pipeline oluşturuluyor...")
-            start_init = time.time()
-            rag_pipeline = HybridRAGPipeline()
-            pipeline_ready = True
-            print(f"✅ RAG pipeline hazır. Süre: {time.time() - start_init:.2f} sn")
-        except Exception as e:
-            pipeline_ready = False
-            print(f"❌ RAG pipeline oluşturulamadı: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"RAG pipeline init hatası: {str(e)}",
-            )
-
-    if rag_pipeline is None:
-        raise HTTPException(
-            status_code=503,
-            detail="RAG Pipeline henüz hazır değil",
-        )
+    pipeline = await run_in_threadpool(get_pipeline)
 
     try:
         # Timing
         start_time = time.time()
 
-        # RAG query
-        result = rag_pipeline.query(
+        # RAG query - async (HTTP çağrıları await, CPU işleri thread pool'da)
+        # Ayrı task: client giderse iptal edilebilsin
+        task = asyncio.create_task(pipeline.aquery(
             request.question,
             top_k=request.top_k,
-        )
+            expand_neighbors=request.expand_neighbors,
+            adaptive_k=request.adaptive_k,
+            mode=request.retrieval_mode,
+            books=request.books,
+            use_cache=request.use_cache is not False,
+            deadline=request.deadline_s,
+            session_id=request.session_id,
+        ))
+        result = await cancel_on_disconnect(task, http_request, pipeline)
 
         elapsed = time.time() - start_time
 
@@ -258,22 +378,20 @@ async def ask_question(request: QueryRequest):
             answer=result["answer"],
             confidence=result["confidence"],
             method_used=result["method_used"],
-            sources=[
-                Source(
-                    source=s["source"],
-                    chunk_id=s["chunk_id"],
-                    text_preview=s["text_preview"],
-                    similarity=s.get("similarity"),
-                )
-                for s in result["sources"]
-            ],
+            # Pipeline içi SourceRef objeleri sadece burada JSON'a çevrilir
+            sources=[Source(**s) for s in sources_to_json(result["sources"])],
             web_enhanced=result.get("web_enhanced", False),
             web_sources=result.get("web_sources"),
             response_time=elapsed,
+            diagnostics=result.get("diagnostics"),
         )
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -281,13 +399,63 @@ async def ask_question(request: QueryRequest):
         )
 
 
+@app.post("/query/stream", tags=["RAG"])
+async def ask_question_stream(request: QueryRequest):
+    """
+    RAG sistemine soru sor, cevabı Server-Sent Events ile parça parça al
+
+    Event sırası: `sources` -> `token`... -> (`fallback` -> `token`...) -> `done`.
+    `fallback` gelirse o ana kadar gösterilen Llama cevabı silinip Claude cevabı yazılmalı.
+    Hata olursa `error` event'i gönderilir ve stream kapanır.
+    Client bağlantıyı kapatırsa Llama/Claude stream'leri de kapatılır.
+    """
+    pipeline = await run_in_threadpool(get_pipeline)
+
+    def event_stream():
+        start_time = time.time()
+        events = pipeline.query_stream(
+            request.question,
+            top_k=request.top_k,
+            expand_neighbors=request.expand_neighbors,
+            adaptive_k=request.adaptive_k,
+            mode=request.retrieval_mode,
+            books=request.books,
+            use_cache=request.use_cache is not False,
+            deadline=request.deadline_s,
+            session_id=request.session_id,
+        )
+        finished = False
+        try:
+            for event in events:
+                if event["type"] == "done":
+                    finished = True
+                    event = dict(event, response_time=time.time() - start_time)
+                yield format_sse(event)
+        except Exception as e:
+            finished = True
+            yield format_sse({"type": "error", "detail": f"Query işlenirken hata: {str(e)}"})
+        finally:
+            if not finished:
+                # Starlette client gidince bu generator'ı bırakır; Ollama/Claude bağlantıları hemen kapansın
+                events.close()
+                pipeline.wasted_compute.add(requests_cancelled=1)
+
+    # Sync generator; Starlette onu threadpool'da çalıştırır, event loop bloklanmaz
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/stats", tags=["General"])
 async def get_stats():
     """Sistem istatistikleri"""
     if not rag_pipeline:
         raise HTTPException(status_code=503, detail="Pipeline yüklenmedi")
 
-    stats = rag_pipeline.vector_db.get_stats()
+    # Chroma count'ları bloklayan çağrılar; event loop'u tutmasın
+    stats = await run_in_threadpool(rag_pipeline.vector_db.get_stats)
 
     return {
         "vector_db": stats,
@@ -299,6 +467,30 @@ async def get_stats():
             "claude_model": config.CLAUDE_MODEL,
             "use_ollama": getattr(config, "USE_OLLAMA", False),
         },
+        "generation_cache": rag_pipeline.generation_cache.stats(),
+        # coalesced: devam eden aynı sorguya bağlanıp kendi hesaplamasını yapmayan istekler
+        "single_flight": {
+            "async": rag_pipeline.async_single_flight.stats(),
+            "sync": rag_pipeline.single_flight.stats(),
+        },
+        "ollama_pool": rag_pipeline.ollama_pool.snapshot(),
+        # Sunucuda tutulan chat oturumu context'leri
+        "ollama_sessions": rag_pipeline.ollama_sessions.stats(),
+        # Küçük/büyük model başına latency, confidence ve fallback oranı
+        "model_tiers": rag_pipeline.model_router.stats(),
+        # Soru tipi başına bütçelenen/üretilen token ve kesilme oranı
+        "generation_budgets": rag_pipeline.generation_budgets.stats(),
+        "circuit_breakers": {
+            "llama": rag_pipeline.llama_breaker.snapshot(),
+            "claude": rag_pipeline.claude_breaker.snapshot(),
+        },
+        # İptal edilen isteklerin ve yarıda kesilen generation'ların harcadığı iş
+        "wasted_compute": rag_pipeline.wasted_compute.snapshot(),
+        "hedge": {
+            "enabled": config.HEDGE_TO_CLAUDE,
+            "cutoff_ms": rag_pipeline.hedge_cutoff_ms(),
+            "ttft_samples": len(rag_pipeline.llama_ttft),
+        },
     }
 
 
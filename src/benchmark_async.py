@@ -0,0 +1,103 @@
+"""
+Async pipeline benchmark scripti
+Eş zamanlı istek throughput'unu sync (event loop'u bloklayan) ve async yol için karşılaştırır
+"""
+
+import asyncio
+import time
+from typing import List, Dict, Callable, Awaitable
+import numpy as np # type: ignore
+from rag_pipeline_async import AsyncHybridRAGPipeline
+from test_questions import TEST_QUESTIONS
+
+
+async def _probe_loop_lag(stop: asyncio.Event, interval: float = 0.05) -> List[float]:
+    """
+    Event loop gecikmesini ölç (/health gibi hafif endpoint'lerin göreceği bekleme)
+
+    Returns:
+        Her ölçümde planlanandan ne kadar geç uyandığı (ms)
+    """
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+    return lags
+
+
+async def _run(label: str, handler: Callable[[str], Awaitable[Dict]], questions: List[str]) -> Dict:
+    """Tüm soruları aynı anda gönder, süreleri ve loop gecikmesini ölç"""
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_loop_lag(stop))
+    latencies = []
+
+    async def one(question: str):
+        start = time.perf_counter()
+        await handler(question)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in questions))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = await probe
+
+    return {
+        "label": label,
+        "throughput": len(questions) / elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "max_loop_lag_ms": max(lags) if lags else elapsed * 1000,
+    }
+
+
+async def benchmark_concurrency(concurrency: int = 8):
+    """
+    Aynı soru setini iki şekilde çalıştır:
+    - sync: async handler içinde rag.query() (eski api.py davranışı)
+    - async: rag.aquery()
+
+    Not: Ollama tek istek işliyorsa (OLLAMA_NUM_PARALLEL=1) generation sıralı kalır;
+    kazanç retrieval/web/Claude örtüşmesinden ve loop'un serbest kalmasından gelir.
+
+    Args:
+        concurrency: Aynı anda gönderilecek soru sayısı
+    """
+    rag = AsyncHybridRAGPipeline()
+    questions = [TEST_QUESTIONS[i % len(TEST_QUESTIONS)]['question'] for i in range(concurrency)]
+
+    async def sync_handler(question: str) -> Dict:
+        return rag.query(question)
+
+    try:
+        # Web cache'i iki koşuyu eşitlemesin
+        rag.web_scraper.cache.clear()
+        sync_stats = await _run("sync", sync_handler, questions)
+
+        rag.web_scraper.cache.clear()
+        async_stats = await _run("async", rag.aquery, questions)
+    finally:
+        await rag.aclose()
+
+    print("\n" + "="*60)
+    print(f"CONCURRENCY BENCHMARK ({concurrency} eş zamanlı istek)")
+    print("="*60)
+    for stats in (sync_stats, async_stats):
+        print(f"{stats['label']:>6}: {stats['throughput']:.3f} req/s  "
+              f"p50={stats['p50']:.1f}s  p95={stats['p95']:.1f}s  "
+              f"max loop lag={stats['max_loop_lag_ms']:.0f} ms")
+
+
+def main():
+    """Benchmark scripti"""
+    import sys
+
+    # python benchmark_async.py 16 -> 16 eş zamanlı istek
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    asyncio.run(benchmark_concurrency(concurrency))
+
+
+if __name__ == "__main__":
+    main()
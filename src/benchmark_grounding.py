@@ -0,0 +1,99 @@
+"""
+Confidence benchmark scripti
+Test sorularının Llama cevaplarında kural tabanlı confidence ile grounding confidence'ı
+karşılaştırır: fallback oranı, gereksiz/kaçan fallback'ler ve skorlama süresi
+"""
+
+import time
+from typing import List, Dict, Callable
+import numpy as np # type: ignore
+from rag_pipeline_hybrid import HybridRAGPipeline
+from test_questions import TEST_QUESTIONS
+from config import config
+
+
+# Beklenen anahtar kelimelerin en az bu kadarını içeren cevap "iyi" sayılır
+GOOD_ANSWER_COVERAGE = 0.5
+
+
+def _keyword_coverage(answer: str, expected_keywords: List[str]) -> float:
+    """evaluate_rag'daki answer quality ile aynı ölçü"""
+    answer_lower = answer.lower()
+    found = sum(1 for keyword in expected_keywords if keyword.lower() in answer_lower)
+    return found / len(expected_keywords) if expected_keywords else 0.0
+
+
+def _run(label: str, score_fn: Callable[[Dict], float], items: List[Dict]) -> Dict:
+    """Her cevabı skorla, CONFIDENCE_THRESHOLD altını fallback say"""
+    scores, timings = [], []
+    for item in items:
+        start = time.perf_counter()
+        scores.append(score_fn(item))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    fallbacks = [score < config.CONFIDENCE_THRESHOLD for score in scores]
+    good = [item['coverage'] >= GOOD_ANSWER_COVERAGE for item in items]
+
+    return {
+        "label": label,
+        "fallback_rate": float(np.mean(fallbacks)),
+        # İyi cevap Claude'a gönderildi (web + Claude maliyeti boşa)
+        "needless": sum(f and g for f, g in zip(fallbacks, good)),
+        # Kötü cevap kullanıcıya gitti
+        "missed": sum(not f and not g for f, g in zip(fallbacks, good)),
+        "ms": float(np.mean(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def benchmark_grounding():
+    """
+    Her test sorusu için bir kez Llama cevabı üret, iki skorlayıcıyı aynı cevaplarda karşılaştır
+
+    Ollama ve vector DB çalışıyor olmalı. Cevabın "iyi" olup olmadığı beklenen anahtar
+    kelimelerle ölçülür (evaluate_rag ile aynı).
+    """
+    rag = HybridRAGPipeline()
+
+    print("🦙 Llama cevapları üretiliyor...")
+    items = []
+    for test_case in TEST_QUESTIONS:
+        docs, context = rag.prepare_context(test_case['question'], [])
+        answer = rag.generate_with_llama(test_case['question'], context)
+        items.append({
+            "question": test_case['question'],
+            "docs": docs,
+            "answer": answer,
+            "coverage": _keyword_coverage(answer, test_case['expected_keywords']),
+        })
+
+    heuristic = _run(
+        "kural", lambda item: rag.heuristic_confidence(item['answer'], item['docs']), items
+    )
+    grounding = _run(
+        "grounding",
+        lambda item: rag.grounding_scorer.score(
+            item['answer'], [doc.text or "" for doc in item['docs']]
+        )['confidence'],
+        items
+    )
+
+    good = sum(item['coverage'] >= GOOD_ANSWER_COVERAGE for item in items)
+    print("\n" + "="*60)
+    print(f"CONFIDENCE ({len(items)} soru, {good} iyi cevap, threshold={config.CONFIDENCE_THRESHOLD})")
+    print("="*60)
+    for stats in [heuristic, grounding]:
+        print(f"{stats['label']:>9}: fallback={stats['fallback_rate']:.0%}  "
+              f"gereksiz={stats['needless']}  kaçan={stats['missed']}  "
+              f"{stats['ms']:.2f} ms (p95 {stats['p95_ms']:.2f} ms)")
+
+    print(f"\nFallback oranı: {heuristic['fallback_rate']:.0%} -> {grounding['fallback_rate']:.0%}")
+
+
+def main():
+    """Benchmark scripti"""
+    benchmark_grounding()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Ollama prompt benchmark scripti
+Eski tek parça prompt ile sabit system prefix'li prompt'un prefill (prompt eval) süresini karşılaştırır
+"""
+
+import time
+from typing import List, Dict, Callable
+import numpy as np # type: ignore
+import requests
+from rag_pipeline_hybrid import HybridRAGPipeline, LLAMA_SYSTEM_PROMPT
+from test_questions import TEST_QUESTIONS
+from config import config
+
+
+def _legacy_request(query: str, context: str) -> Dict:
+    """Eski format: tek satır talimat prompt'un içinde, system yok, keep_alive Ollama varsayılanı"""
+    prompt = f"""You are a D&D 5th Edition expert. Answer ONLY based on the provided context.
+
+Context:
+{context}
+
+Question: {query}
+
+Answer with source citations (Source X):"""
+    return {
+        "model": config.OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": False,
+        "options": {"temperature": 0.7, "top_p": 0.9, "num_predict": 1}
+    }
+
+
+def _run(label: str, build_request: Callable[[str, str], Dict], items: List[Dict]) -> Dict:
+    """
+    Her soru için sadece prefill ölç (num_predict=1)
+
+    Ardışık sorular farklı olduğu için KV cache'ten sadece ortak prefix tekrar kullanılır.
+    """
+    url = f"{config.OLLAMA_BASE_URL}/api/generate"
+    eval_ms, eval_counts, load_ms = [], [], []
+
+    for item in items:
+        request = build_request(item['question'], item['context'])
+        request.setdefault("options", {})["num_predict"] = 1
+        result = requests.post(url, json=request, timeout=300).json()
+
+        eval_ms.append(result.get('prompt_eval_duration', 0) / 1e6)
+        eval_counts.append(result.get('prompt_eval_count', 0))
+        load_ms.append(result.get('load_duration', 0) / 1e6)
+
+    return {
+        "label": label,
+        "prompt_eval_ms": float(np.mean(eval_ms)),
+        "prompt_eval_p95": float(np.percentile(eval_ms, 95)),
+        "prompt_eval_count": float(np.mean(eval_counts)),
+        "load_ms": float(np.mean(load_ms)),
+    }
+
+
+def benchmark_prompt_prefix():
+    """
+    Aynı retrieval context'leriyle iki prompt düzenini karşılaştır
+
+    - legacy: eski tek satırlık talimat + context tek prompt, system yok
+    - prefix: genişletilmiş talimatlar system'de (her istekte aynı), keep_alive ile model bellekte
+
+    Prefix prompt'u daha uzun olduğu halde prefill edilen token (prompt_eval_count)
+    sayısının artmaması gerekir; system bloğu KV cache'ten gelir.
+    """
+    rag = HybridRAGPipeline()
+
+    print("📚 Context'ler hazırlanıyor...")
+    items = []
+    for item in TEST_QUESTIONS:
+        _, context = rag.prepare_context(item['question'], [])
+        items.append({"question": item['question'], "context": context})
+
+    def prefix_request(query: str, context: str) -> Dict:
+        return rag.build_llama_request(rag.build_llama_prompt(query, context))
+
+    # İlk çağrı model yüklemesini ölçmesin
+    rag.warm_up_llama()
+    time.sleep(1)
+
+    legacy = _run("legacy", _legacy_request, items)
+    prefix = _run("prefix", prefix_request, items)
+
+    print("\n" + "="*60)
+    print(f"PROMPT PREFILL ({len(items)} soru, {config.OLLAMA_MODEL})")
+    print("="*60)
+    for stats in (legacy, prefix):
+        print(f"{stats['label']:>7}: prompt_eval={stats['prompt_eval_ms']:7.1f} ms  "
+              f"p95={stats['prompt_eval_p95']:7.1f} ms  "
+              f"{stats['prompt_eval_count']:6.0f} token  load={stats['load_ms']:.0f} ms")
+
+    system_tokens = rag.token_counter.count(LLAMA_SYSTEM_PROMPT)
+    print(f"\nSystem prefix: ~{system_tokens} token "
+          f"(prefix düzeninde istek başına prefill {prefix['prompt_eval_count']:.0f} token)")
+    print(f"Prefill farkı: {legacy['prompt_eval_ms'] - prefix['prompt_eval_ms']:+.1f} ms/istek")
+
+
+def main():
+    """Benchmark scripti"""
+    benchmark_prompt_prefix()
+
+
+if __name__ == "__main__":
+    main()
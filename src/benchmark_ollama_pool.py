@@ -0,0 +1,109 @@
+"""
+Ollama pool benchmark scripti
+Lokal mock Ollama fleet'ine (1, 2, 4 sunucu) karşı eşzamanlı Llama isteklerinin
+throughput'unu ölçer; sonra bir sunucuyu bozup pool'dan çıkarılmasını ve geri alınmasını gösterir
+"""
+
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+import numpy as np # type: ignore
+from rag_pipeline_hybrid import HybridRAGPipeline
+from ollama_pool import OllamaPool
+from mock_ollama_server import start_mock_fleet, server_url
+from test_questions import TEST_QUESTIONS
+
+
+def _run(rag: HybridRAGPipeline, items: List[Dict], requests_count: int, concurrency: int) -> Dict:
+    """requests_count isteği concurrency thread ile gönder"""
+    def one(i: int) -> Dict:
+        item = items[i % len(items)]
+        stats = {}
+        start = time.perf_counter()
+        try:
+            rag.generate_with_llama(item['question'], item['context'], stats=stats)
+            ok = True
+        except Exception:
+            ok = False
+        return {"ms": (time.perf_counter() - start) * 1000, "ok": ok,
+                "endpoint": stats.get('llama_endpoint')}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests_count)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [r['ms'] for r in results if r['ok']]
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        "errors": sum(not r['ok'] for r in results),
+        "per_endpoint": Counter(r['endpoint'] for r in results if r['ok']),
+    }
+
+
+def benchmark_pool(fleet_sizes: List[int] = (1, 2, 4), requests_count: int = 32, concurrency: int = 8):
+    """
+    Sunucu sayısı arttıkça throughput neredeyse doğrusal artmalı
+
+    Args:
+        fleet_sizes: Denenecek sunucu sayıları
+        requests_count: Her turda gönderilen istek sayısı
+        concurrency: Aynı anda bekleyen istek sayısı
+    """
+    rag = HybridRAGPipeline()
+
+    print("📚 Context'ler hazırlanıyor...")
+    items = []
+    for item in TEST_QUESTIONS:
+        _, context = rag.prepare_context(item['question'], [])
+        items.append({"question": item['question'], "context": context})
+
+    print("\n" + "="*60)
+    print(f"OLLAMA POOL (mock, {requests_count} istek, {concurrency} eşzamanlı)")
+    print("="*60)
+    baseline = None
+    for size in fleet_sizes:
+        fleet = start_mock_fleet(size)
+        rag.ollama_pool = OllamaPool([server_url(s) for s in fleet], health_interval=0)
+        stats = _run(rag, items, requests_count, concurrency)
+        baseline = baseline or stats['throughput']
+        print(f"{size} sunucu: {stats['throughput']:6.2f} istek/sn  "
+              f"(x{stats['throughput'] / baseline:.2f})  p95={stats['p95']:7.1f} ms  "
+              f"dağılım={sorted(stats['per_endpoint'].values())}")
+        for server in fleet:
+            server.shutdown()
+
+    # Ejection / re-admission
+    fleet = start_mock_fleet(3)
+    rag.ollama_pool = OllamaPool([server_url(s) for s in fleet], health_interval=0.5)
+    rag.ollama_pool.start_health_checks()
+    try:
+        fleet[0].failing = True
+        broken = _run(rag, items, requests_count, concurrency)
+        print(f"\n1/3 sunucu bozuk: {broken['errors']} hata, "
+              f"{broken['throughput']:.2f} istek/sn, pool={_health(rag.ollama_pool)}")
+
+        fleet[0].failing = False
+        time.sleep(1.0)
+        healed = _run(rag, items, requests_count, concurrency)
+        print(f"Sunucu düzeldi:   {healed['errors']} hata, "
+              f"{healed['throughput']:.2f} istek/sn, pool={_health(rag.ollama_pool)}")
+    finally:
+        rag.ollama_pool.stop()
+        for server in fleet:
+            server.shutdown()
+
+
+def _health(pool: OllamaPool) -> List[str]:
+    return ["✅" if e['healthy'] else "❌" for e in pool.snapshot()]
+
+
+def main():
+    """Benchmark scripti"""
+    benchmark_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Retrieval benchmark scripti
+Flat arama ile hierarchical (section -> chunk) aramayı latency ve recall açısından karşılaştırır
+"""
+
+import time
+import tracemalloc
+from typing import List, Dict, Callable
+import numpy as np # type: ignore
+from rag_pipeline_hybrid import HybridRAGPipeline
+from retrieval_types import build_sources, format_context, result_to_json
+from vector_db import format_query_results
+from test_questions import TEST_QUESTIONS
+from config import config
+
+
+def keyword_hit_rate(docs: List[Dict], expected_keywords: List[str]) -> float:
+    """Beklenen keyword'lerin kaçı retrieved text'te geçiyor"""
+    text = " ".join(doc['text'] for doc in docs).lower()
+    return sum(1 for kw in expected_keywords if kw.lower() in text) / len(expected_keywords)
+
+
+def benchmark_hierarchical(top_k: int = 5, repeats: int = 3):
+    """
+    Test setinde flat ve hierarchical aramayı karşılaştır
+
+    recall@k: Hierarchical sonuçların flat top-k ile örtüşme oranı
+    (flat arama tüm collection'ı taradığı için referans kabul edilir).
+
+    Args:
+        top_k: Karşılaştırılacak sonuç sayısı
+        repeats: Latency için her sorgunun kaç kez çalıştırılacağı
+    """
+    rag = HybridRAGPipeline()
+
+    if not rag.section_index.sections:
+        print("❌ Section index boş! Önce build_database.py çalıştırın.")
+        return
+
+    flat_ms, hier_ms, recalls = [], [], []
+    flat_hits, hier_hits = [], []
+
+    for item in TEST_QUESTIONS:
+        question = item['question']
+        query_embedding = rag.embedder.embed_text(question)
+
+        # Flat
+        start = time.perf_counter()
+        for _ in range(repeats):
+            flat = rag.vector_db.search(question, n_results=top_k, query_embedding=query_embedding)
+        flat_ms.append((time.perf_counter() - start) * 1000 / repeats)
+
+        # Hierarchical
+        start = time.perf_counter()
+        for _ in range(repeats):
+            hierarchical = rag.fetch_hierarchical(query_embedding, top_k)
+        hier_ms.append((time.perf_counter() - start) * 1000 / repeats)
+
+        flat_ids = {doc['id'] for doc in flat}
+        hier_ids = {doc['id'] for doc in hierarchical}
+        recalls.append(len(flat_ids & hier_ids) / max(len(flat_ids), 1))
+
+        flat_hits.append(keyword_hit_rate(flat, item['expected_keywords']))
+        hier_hits.append(keyword_hit_rate(hierarchical, item['expected_keywords']))
+
+        print(f"   {question[:50]:<50} recall@{top_k}={recalls[-1]:.0%}")
+
+    print("\n" + "="*60)
+    print(f"FLAT vs HIERARCHICAL (top_k={top_k}, "
+          f"{config.HIERARCHICAL_TOP_SECTIONS} section, {len(rag.section_index.sections)} toplam)")
+    print("="*60)
+    print(f"Flat:         {np.mean(flat_ms):7.2f} ms  p95={np.percentile(flat_ms, 95):7.2f} ms  "
+          f"keyword={np.mean(flat_hits):.2%}")
+    print(f"Hierarchical: {np.mean(hier_ms):7.2f} ms  p95={np.percentile(hier_ms, 95):7.2f} ms  "
+          f"keyword={np.mean(hier_hits):.2%}")
+    print(f"Recall@{top_k} (flat'e göre): {np.mean(recalls):.2%}")
+
+
+def _fake_query_results(n_results: int, dim: int = 768) -> Dict:
+    """ChromaDB query() çıktısı formatında sentetik sonuç"""
+    rng = np.random.default_rng(0)
+    return {
+        'ids': [[f"doc_{i}" for i in range(n_results)]],
+        'documents': [["Grappling rules text. " * 25 for _ in range(n_results)]],
+        'metadatas': [[{"source": "PlayerHandbook.pdf", "chunk_id": i} for i in range(n_results)]],
+        'distances': [[0.4 + i * 0.02 for i in range(n_results)]],
+        'embeddings': [rng.normal(size=(n_results, dim)).tolist()],
+    }
+
+
+def _legacy_request(results: Dict, top_k: int) -> Dict:
+    """Eski dict tabanlı akış: dict document'lar, her branch'te yeni sources dict'leri"""
+    docs = []
+    for i in range(len(results['ids'][0])):
+        distance = results['distances'][0][i]
+        doc = {
+            'id': results['ids'][0][i],
+            'text': results['documents'][0][i],
+            'metadata': results['metadatas'][0][i],
+            'distance': distance,
+            'similarity': max(0, 1 - (distance / 2)),
+            'embedding': np.asarray(results['embeddings'][0][i]),
+        }
+        docs.append(doc)
+
+    selected = [dict(doc) for doc in docs[:top_k]]
+    context = "\n\n---\n\n".join(
+        f"[Source {i}: {d['metadata'].get('source')}, Chunk {d['metadata'].get('chunk_id')}, "
+        f"Similarity: {d.get('similarity', 0.0):.2f}]\n{d['text']}"
+        for i, d in enumerate(selected, 1)
+    )
+    return {
+        "answer": context[:50],
+        "sources": [
+            {
+                "source": d['metadata']['source'],
+                "chunk_id": d['metadata']['chunk_id'],
+                "text_preview": d['text'][:200],
+                "similarity": d.get('similarity', 0.0)
+            }
+            for d in selected
+        ],
+    }
+
+
+def _slotted_request(results: Dict, top_k: int) -> Dict:
+    """Yeni akış: RetrievedChunk'lar, JSON'a sadece sonda çevrilir"""
+    docs = format_query_results(results, 0, include_embeddings=True)
+    selected = [doc.copy() for doc in docs[:top_k]]
+    context = format_context(selected)
+    return result_to_json({"answer": context[:50], "sources": build_sources(selected)})
+
+
+def _measure(fn: Callable[[], Dict], iterations: int) -> Dict:
+    """
+    Request başına süre, tracemalloc peak'i ve request boyunca oluşan obje sayısı
+
+    Obje sayısı: request sırasında ayrılan ve request bitmeden serbest bırakılmayan
+    ara objeler hariç, peak anındaki canlı blok sayısı (snapshot farkı).
+    """
+    for _ in range(10):
+        fn()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed_us = (time.perf_counter() - start) * 1e6 / iterations
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(iterations):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+
+    before = tracemalloc.take_snapshot()
+    kept = [fn() for _ in range(iterations)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+    del kept
+
+    return {"us": elapsed_us, "blocks": blocks / iterations, "peak": float(np.mean(peaks))}
+
+
+def benchmark_result_types(n_results: int = 15, top_k: int = 5, iterations: int = 200):
+    """
+    Dict tabanlı eski akış ile __slots__'lı sonuç tiplerini karşılaştır
+
+    Chroma ve LLM olmadan, sadece sonuç objelerinin hot path'i ölçülür:
+    format -> seçim -> format_context -> sources -> JSON. Sonuçlar bellekte
+    tutulduğu için blok sayısı request başına yaşayan obje sayısını, peak ise
+    request sırasındaki en yüksek ek belleği gösterir.
+    """
+    results = _fake_query_results(n_results)
+
+    legacy = _measure(lambda: _legacy_request(results, top_k), iterations)
+    slotted = _measure(lambda: _slotted_request(results, top_k), iterations)
+
+    print("\n" + "="*60)
+    print(f"RESULT TYPES ({n_results} aday, top_k={top_k}, {iterations} iterasyon)")
+    print("="*60)
+    for label, stats in [("dict", legacy), ("slots", slotted)]:
+        print(f"{label:>6}: {stats['us']:8.1f} µs/request  "
+              f"peak={stats['peak'] / 1024:7.1f} KB  {stats['blocks']:6.1f} blok/sonuç")
+
+
+def main():
+    """Benchmark scripti"""
+    print("="*60)
+    print("RETRIEVAL BENCHMARK")
+    print("="*60 + "\n")
+
+    benchmark_hierarchical()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python benchmark_retrieval.py types -> sonuç tipi microbenchmark'ı
+    if len(sys.argv) > 1 and sys.argv[1] == "types":
+        benchmark_result_types()
+    else:
+        main()
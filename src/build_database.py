@@ -3,14 +3,26 @@ Tüm PDF'leri işleyip ChromaDB'ye yükle
 Bu script bir kez çalıştırılmalı (database build yapar)
 """
 
+from typing import List
 from text_chunker import TextChunker
 from embedder import Embedder
-from vector_db import VectorDB
+from vector_db import VectorDB, ShardedVectorDB
+from config import config
 from pdf_processor import extract_text_from_pdf, list_pdfs
+from entity_index import EntityIndex
+from section_index import SectionIndex
 
 
-def build_knowledge_base():
-    """PDF'lerden knowledge base oluştur"""
+def build_knowledge_base(sharded: bool = None, books: List[str] = None):
+    """
+    PDF'lerden knowledge base oluştur
+    
+    Args:
+        sharded: Kitap başına ayrı shard (None = config.USE_SHARDS)
+        books: Sadece bu PDF'lerin shard'larını yeniden oluştur (sadece sharded modda)
+    """
+    if sharded is None:
+        sharded = config.USE_SHARDS
     
     print("="*60)
     print("KNOWLEDGE BASE BUILDER")
@@ -25,6 +37,10 @@ def build_knowledge_base():
     
     print(f"📚 {len(pdfs)} PDF bulundu\n")
     
+    if sharded:
+        build_sharded_knowledge_base(pdfs, books)
+        return
+    
     # Tüm chunk'ları topla
     all_chunks = []
     
@@ -61,6 +77,14 @@ def build_knowledge_base():
     
     db.add_documents(embedded_docs)
     
+    # Entity index (spell/condition/feature -> canonical chunk)
+    print("\n🏷️ Entity index oluşturuluyor...")
+    EntityIndex(db.index_dir / "entity_index.json").build(embedded_docs).save()
+    
+    # Section centroid'leri (hierarchical retrieval)
+    print("\n📑 Section index oluşturuluyor...")
+    SectionIndex(db.index_dir).clear().update(embedded_docs).save()
+    
     # Statlar
     print("\n" + "="*60)
     print("DATABASE STATS")
@@ -74,5 +98,63 @@ def build_knowledge_base():
     print("\n💡 Artık RAG pipeline'ını çalıştırabilirsiniz!")
 
 
+def build_sharded_knowledge_base(pdfs, books: List[str] = None):
+    """
+    Her PDF'i kendi shard'ına yükle; books verilirse sadece onları yeniden oluştur
+    """
+    if books:
+        pdfs = [pdf for pdf in pdfs if pdf.name in books]
+        if not pdfs:
+            print(f"❌ Seçilen kitaplar bulunamadı: {books}")
+            return
+    
+    embedder = Embedder(model_name="all-mpnet-base-v2")
+    db = ShardedVectorDB(base_name="dnd_knowledge")
+    chunker = TextChunker(chunk_size=512, chunk_overlap=50)
+    # Index'ler sharded layout'un klasörüne (flat build'in dosyalarına dokunmaz)
+    section_index = SectionIndex(db.index_dir)
+    
+    for pdf_path in pdfs:
+        print(f"\n📄 Shard oluşturuluyor: {pdf_path.name}")
+        
+        text = extract_text_from_pdf(pdf_path)
+        chunks = chunker.chunk_text(text, source_name=pdf_path.name)
+        print(f"   ✂️ {len(chunks)} chunk oluşturuldu")
+        
+        embedded_docs = embedder.embed_documents(chunks)
+        db.rebuild_shard(pdf_path.name, embedded_docs)
+        
+        # Sadece bu kitabın section'ları yenilenir
+        section_index.update(embedded_docs)
+    
+    section_index.save()
+    
+    # Tüm kitapların chunk'ları (embedding'siz okuma, ucuz)
+    all_documents = db.get_all_documents()
+    
+    # Lazy text okuma için sıkıştırılmış chunk store
+    db.rebuild_chunk_store(all_documents)
+    
+    # Entity index tüm kitaplardan
+    print("\n🏷️ Entity index oluşturuluyor...")
+    EntityIndex(db.index_dir / "entity_index.json").build(all_documents).save()
+    
+    print("\n" + "="*60)
+    print("DATABASE STATS")
+    print("="*60)
+    stats = db.get_stats()
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    
+    print("\n✅ Sharded knowledge base hazır!")
+
+
 if __name__ == "__main__":
-    build_knowledge_base()
\ No newline at end of file
+    import sys
+    
+    # python build_database.py --sharded [kitap.pdf ...] -> kitap başına shard
+    args = sys.argv[1:]
+    if args and args[0] == "--sharded":
+        build_knowledge_base(sharded=True, books=args[1:] or None)
+    else:
+        build_knowledge_base()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Chunk komşuluk index'i
+(source, chunk_id) -> document id eşlemesi, ingest sırasında oluşturulur
+"""
+
+import json
+from pathlib import Path
+from typing import List, Dict, Optional
+from config import config
+
+
+class ChunkIndex:
+    """Her kitap için chunk_id sırasına göre document id listesi tutar"""
+
+    def __init__(self, index_path: Optional[Path] = None):
+        """
+        Args:
+            index_path: Index dosyası (varsayılan: config.index_dir()/chunk_index.json)
+        """
+        self.index_path = Path(index_path or config.index_dir() / "chunk_index.json")
+        self.sources: Dict[str, List[Optional[str]]] = self._load()
+
+    def _load(self) -> Dict:
+        """Index dosyasını yükle"""
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save(self):
+        """Index'i diske kaydet"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sources, f)
+
+    def update(self, documents: List[Dict]):
+        """
+        Document'lardan index'i güncelle
+
+        Document'larda 'id' ve metadata'da 'source'/'chunk_id' olmalı.
+        Gelen kaynakların eski kayıtları tamamen değiştirilir.
+
+        Args:
+            documents: VectorDB'ye eklenen document'lar
+        """
+        rebuilt: Dict[str, List[Optional[str]]] = {}
+
+        for doc in documents:
+            source = doc['metadata']['source']
+            chunk_id = doc['metadata']['chunk_id']
+            ids = rebuilt.setdefault(source, [])
+
+            if chunk_id >= len(ids):
+                ids.extend([None] * (chunk_id + 1 - len(ids)))
+            ids[chunk_id] = doc['id']
+
+        self.sources.update(rebuilt)
+
+    def remove_source(self, source: str):
+        """Bir kitabın kayıtlarını sil"""
+        self.sources.pop(source, None)
+
+    def get_id(self, source: str, chunk_id: int) -> Optional[str]:
+        """(source, chunk_id) için document id"""
+        ids = self.sources.get(source)
+        if ids is None or not 0 <= chunk_id < len(ids):
+            return None
+        return ids[chunk_id]
+
+    def neighbor_ids(self, source: str, chunk_id: int, window: int = 1) -> List[str]:
+        """
+        Bir chunk'ın önceki/sonraki komşularının id'leri
+
+        Args:
+            source: Kitap adı
+            chunk_id: Chunk numarası
+            window: Her yönde kaç komşu
+
+        Returns:
+            Komşu document id'leri (chunk sırasıyla, chunk'ın kendisi hariç)
+        """
+        neighbors = []
+
+        for offset in range(-window, window + 1):
+            if offset == 0:
+                continue
+            doc_id = self.get_id(source, chunk_id + offset)
+            if doc_id is not None:
+                neighbors.append(doc_id)
+
+        return neighbors
@@ -0,0 +1,219 @@
+"""
+Chunk text store modülü
+Chunk metinlerini zlib ile sıkıştırılmış bloklar halinde tek bir dosyada tutar.
+Dosya mmap ile açılır (worker'lar page cache'i paylaşır), bloklar ihtiyaç oldukça açılır.
+"""
+
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Optional
+from config import config
+
+
+class ChunkStore:
+    """
+    Sıkıştırılmış blok dosyası + offset index'i
+
+    - chunk_store.bin: Art arda zlib blokları (her blok = ardışık chunk'ların JSON listesi)
+    - chunk_store.json: Blok offset/uzunlukları ve id -> (blok, sıra, metin uzunluğu) eşlemesi
+
+    Aynı kitabın ardışık chunk'ları aynı bloğa düştüğü için komşu chunk'lar
+    ve birleştirilen span'ler genelde tek blok açılarak okunur.
+    """
+
+    def __init__(self, store_dir: Optional[Path] = None, cache_blocks: int = None):
+        """
+        Args:
+            store_dir: Store dosyalarının klasörü (varsayılan: config.index_dir())
+            cache_blocks: Bellekte açık tutulacak blok sayısı (None = config)
+        """
+        store_dir = Path(store_dir or config.index_dir())
+        self.data_path = store_dir / "chunk_store.bin"
+        self.index_path = store_dir / "chunk_store.json"
+        self.cache_blocks = cache_blocks or config.CHUNK_STORE_CACHE_BLOCKS
+
+        self.blocks: List[List[int]] = []
+        self.locations: Dict[str, List[int]] = {}
+        self._mmap = None
+        self._file = None
+        self._cache: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._open()
+
+    @property
+    def available(self) -> bool:
+        """Store diskte var ve açık mı?"""
+        return self._mmap is not None
+
+    def _open(self):
+        """Index'i yükle ve blok dosyasını mmap ile aç"""
+        if not (self.index_path.exists() and self.data_path.exists()):
+            return
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.blocks = index['blocks']
+        self.locations = index['locations']
+
+        if os.path.getsize(self.data_path) == 0:
+            return
+
+        self._file = open(self.data_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """mmap ve dosyayı kapat"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+    def build(self, documents: List[Dict], block_size: int = None) -> "ChunkStore":
+        """
+        Document'lardan store'u sıfırdan yaz
+
+        Dosyalar önce geçici isimle yazılıp rename edilir; açık olan
+        okuyucular eski dosyayı okumaya devam eder.
+
+        Args:
+            documents: 'id', 'text' ve metadata'lı chunk'lar
+            block_size: Blok başına chunk sayısı (None = config)
+        """
+        block_size = block_size or config.CHUNK_STORE_BLOCK_SIZE
+        ordered = sorted(
+            documents,
+            key=lambda d: (d['metadata'].get('source', ''), d['metadata'].get('chunk_id', 0))
+        )
+
+        blocks = []
+        locations = {}
+        offset = 0
+        raw_size = 0
+
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_data = self.data_path.with_suffix(".bin.tmp")
+        tmp_index = self.index_path.with_suffix(".json.tmp")
+
+        with open(tmp_data, 'wb') as f:
+            for start in range(0, len(ordered), block_size):
+                batch = ordered[start:start + block_size]
+                raw = json.dumps([doc['text'] for doc in batch]).encode('utf-8')
+                compressed = zlib.compress(raw, 6)
+
+                f.write(compressed)
+                block_no = len(blocks)
+                blocks.append([offset, len(compressed)])
+                for position, doc in enumerate(batch):
+                    locations[doc['id']] = [block_no, position, len(doc['text'])]
+
+                offset += len(compressed)
+                raw_size += len(raw)
+
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump({"blocks": blocks, "locations": locations}, f)
+
+        self.close()
+        os.replace(tmp_data, self.data_path)
+        os.replace(tmp_index, self.index_path)
+        self._open()
+
+        ratio = offset / raw_size if raw_size else 0
+        print(f"✅ Chunk store: {len(locations)} chunk, {len(blocks)} blok, "
+              f"{offset / 1024:.0f} KB (%{ratio * 100:.0f} sıkıştırma oranı)")
+        return self
+
+    def invalidate(self, id_prefix: str) -> int:
+        """
+        Bu önekle başlayan id'leri store'dan düşür (blok dosyasına dokunmaz)
+
+        Shard yeniden oluşturulduğunda aynı '<shard>#<n>' id'leri başka chunk'lara
+        işaret eder; düşürülen id'ler bir sonraki build'e kadar ChromaDB'den okunur.
+
+        Returns:
+            Düşürülen id sayısı
+        """
+        stale = [doc_id for doc_id in self.locations if doc_id.startswith(id_prefix)]
+        if not stale:
+            return 0
+
+        locations = {k: v for k, v in self.locations.items() if not k.startswith(id_prefix)}
+        tmp_index = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump({"blocks": self.blocks, "locations": locations}, f)
+        os.replace(tmp_index, self.index_path)
+
+        self.locations = locations
+        return len(stale)
+
+    def _read_block(self, block_no: int) -> List[str]:
+        """Bloğu LRU cache'ten ya da mmap'ten açarak getir"""
+        with self._lock:
+            block = self._cache.get(block_no)
+            if block is not None:
+                self._cache.move_to_end(block_no)
+                return block
+
+        offset, length = self.blocks[block_no]
+        block = json.loads(zlib.decompress(self._mmap[offset:offset + length]).decode('utf-8'))
+
+        with self._lock:
+            self._cache[block_no] = block
+            while len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+
+        return block
+
+    def get_texts(self, ids: List[str]) -> Dict[str, str]:
+        """
+        ID listesi için chunk metinleri
+
+        Returns:
+            id -> text (store'da olmayan id'ler atlanır)
+        """
+        if not self.available:
+            return {}
+
+        texts = {}
+        for doc_id in ids:
+            location = self.locations.get(doc_id)
+            if location is None:
+                continue
+            block_no, position = location[0], location[1]
+            texts[doc_id] = self._read_block(block_no)[position]
+
+        return texts
+
+    def text_length(self, doc_id: str) -> Optional[int]:
+        """Chunk metninin karakter sayısı (blok açmadan, index'ten; eski store'larda None)"""
+        location = self.locations.get(doc_id)
+        if location is None or len(location) < 3:
+            return None
+        return location[2]
+
+
+def main():
+    """Chunk store test scripti"""
+    store = ChunkStore()
+
+    if not store.available:
+        print("❌ Chunk store bulunamadı! Önce build_database.py çalıştırın.")
+        return
+
+    print(f"📦 {len(store.locations)} chunk, {len(store.blocks)} blok")
+
+    sample_ids = list(store.locations)[:3]
+    for doc_id, text in store.get_texts(sample_ids).items():
+        print(f"\n🔹 {doc_id}: {text[:150]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,22 +20,179 @@ class Config:
     # Ollama Settings
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = "llama3.1:8b-instruct-q4_K_M"
+    # Birden fazla Ollama sunucusu: virgülle ayrılmış URL'ler (boş = sadece OLLAMA_BASE_URL).
+    # İstekler en az bekleyen isteği olan sağlıklı sunucuya gider.
+    _ollama_urls = os.getenv("OLLAMA_BASE_URLS") or OLLAMA_BASE_URL
+    OLLAMA_BASE_URLS = [url.strip().rstrip("/") for url in _ollama_urls.split(",") if url.strip()]
+    OLLAMA_EJECT_FAILURES = 2  # Art arda bu kadar hata veren sunucu pool'dan çıkarılır
+    OLLAMA_EJECT_SECONDS = 15  # Çıkarılan sunucu bu kadar sonra tekrar denenir
+    OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))  # saniye, 0 = kapalı
+    # Model routing: kısa, tek entity'li ve retrieval'ı güçlü sorular küçük modele gider
+    MODEL_ROUTING = os.getenv("MODEL_ROUTING", "false").lower() == "true"
+    OLLAMA_SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "llama3.2:3b-instruct-q4_K_M")
+    SMALL_MODEL_MIN_SIMILARITY = 0.7  # En iyi chunk'ın similarity'si en az bu olmalı
+    SMALL_MODEL_MAX_WORDS = 12  # Daha uzun sorular büyük modele
+    # Chat oturumları: Ollama'nın döndürdüğü context (token id'leri) sunucuda tutulur,
+    # takip sorularında sadece yeni token'lar için prefill yapılır
+    SESSION_MAX = 256  # En fazla bu kadar oturum (LRU)
+    SESSION_TTL = 1800  # saniye
+
+    # Ollama context penceresi; 0 = modelin varsayılanı (num_ctx gönderilmez). Oturumlar sadece
+    # pencere açıkça verilince (ör. 8192) çalışır. Tüm isteklerde ve warm-up'ta aynı değer gider;
+    # değişirse model yeniden yüklenir ve büyük pencere her istekte KV cache belleği ayırır.
+    # Bir tur ~2k token (context bütçesi + cevap); oturum context'i bir tur daha sığacak kadar tutulur.
+    OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+    SESSION_MAX_CONTEXT_TOKENS = max(OLLAMA_NUM_CTX - 2560, 0)  # Aşan oturum sıfırdan başlar
 
     USE_OLLAMA = os.getenv("USE_OLLAMA", "true").lower() == "true"
+    # Model bellekte ne kadar kalsın ("30m", "-1" = hep, "0" = hemen boşalt).
+    # Her istekle gönderilir; warm-up pipeline/API başlarken modeli yükler.
+    _keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Ollama sayıları saniye olarak alır ("-1" string'i duration olarak parse edilemez)
+    OLLAMA_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+    OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+    
+    # Async API yolu: embedding/Chroma gibi CPU işleri için thread sayısı ve
+    # Ollama/Claude/web için paylaşılan HTTP bağlantı havuzu
+    ASYNC_CPU_WORKERS = int(os.getenv("ASYNC_CPU_WORKERS", "4"))
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "20"))
+
+    # Spekülatif web araması: retrieval zayıfsa (fallback muhtemel) web araması
+    # Llama cevap üretirken arka planda başlar. heuristic_confidence'ta ortalama
+    # similarity 0.5 altı her zaman, 0.5-0.7 arası çoğunlukla fallback'e düşer.
+    SPECULATIVE_WEB = os.getenv("SPECULATIVE_WEB", "true").lower() == "true"
+    SPECULATIVE_WEB_SIMILARITY = float(os.getenv("SPECULATIVE_WEB_SIMILARITY", "0.6"))
+    # Web araması thread sayısı; spekülatif aramalar gerçek fallback aramalarını sıraya sokmasın
+    WEB_PREFETCH_WORKERS = int(os.getenv("WEB_PREFETCH_WORKERS", "8"))
+
+    # Pre-generation router: retrieval skorlarından fallback olasılığı (query_router.py).
+    # Olasılık eşiğin üstündeyse Llama hiç çalışmaz. Model yoksa router pasiftir.
+    USE_ROUTER = os.getenv("USE_ROUTER", "true").lower() == "true"
+    ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.85"))
+    # Router eğitimi için veri toplarken açılır; dosya QUERY_LOG_MAX_MB'ı geçince .1'e döndürülür
+    LOG_QUERIES = os.getenv("LOG_QUERIES", "false").lower() == "true"
+    QUERY_LOG_MAX_MB = float(os.getenv("QUERY_LOG_MAX_MB", "50"))
+
+    # Generation cache: (model, ayarlar, normalize soru, chunk id'leri) -> cevap
+    GENERATION_CACHE = os.getenv("GENERATION_CACHE", "true").lower() == "true"
+    GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "512"))
+    GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "3600"))  # saniye
+    # Aynı anda gelen aynı sorgular (normalize soru + parametreler) tek hesaplamayı paylaşır
+    SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+    # Resilience: uçtan uca istek deadline'ı, backend başına circuit breaker,
+    # Llama ilk token'ı geç kalırsa Claude'a geçiş (hedge)
+    # saniye; 0 = deadline yok (her çağrı sadece LLAMA_TIMEOUT/CLAUDE_TIMEOUT ile sınırlı)
+    REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "0"))
+    LLAMA_TIMEOUT = 300  # Tek Ollama çağrısı için üst sınır (deadline daha azsa o geçerli)
+    CLAUDE_TIMEOUT = 60
+    HEALTH_CHECK_TIMEOUT = 5  # /health'teki her Ollama/Claude kontrolü için
+    BREAKER_FAILURE_THRESHOLD = 3  # Art arda bu kadar hata -> backend atlanır
+    BREAKER_RESET_TIMEOUT = 30  # saniye sonra tek deneme isteği
+    HEDGE_TO_CLAUDE = os.getenv("HEDGE_TO_CLAUDE", "false").lower() == "true"
+    HEDGE_PERCENTILE = 95  # Llama TTFT'nin bu persentili cutoff olur
+    HEDGE_MIN_SAMPLES = 20  # Bundan az ölçüm varsa HEDGE_DEFAULT_CUTOFF_MS
+    HEDGE_DEFAULT_CUTOFF_MS = 10000
+    # /query sürerken client bağlantısı bu aralıkla kontrol edilir; kapandıysa pipeline iptal edilir
+    DISCONNECT_POLL_INTERVAL = 0.5  # saniye
     
     # RAG Settings
     CHUNK_SIZE = 512  
     CHUNK_OVERLAP = 50  
     TOP_K = 7  
     
+    # Retrieval sonrası: MMR çeşitlendirme + örtüşen chunk birleştirme (varsayılan kapalı,
+    # açılınca hangi chunk'ların prompt'a girdiği değişir)
+    USE_MMR = os.getenv("USE_MMR", "false").lower() == "true"
+    MMR_LAMBDA = 0.7  # 1.0 = sadece relevance, 0.0 = sadece çeşitlilik
+    MMR_FETCH_MULTIPLIER = 3  # top_k * 3 aday çekilir
+    MMR_DUPLICATE_THRESHOLD = 0.95  # Bundan benzer chunk'lar tekrar sayılır
+    
+    # Adaptive top-k (similarity dağılımına göre k seçimi)
+    ADAPTIVE_K = os.getenv("ADAPTIVE_K", "false").lower() == "true"
+    ADAPTIVE_K_MIN = 2
+    ADAPTIVE_K_MAX = 10  # Bu kadar aday üzerinden kesme noktası aranır
+    ADAPTIVE_K_GAP = 0.05  # Ardışık skorlar arası bu kadar düşüş = kes
+    ADAPTIVE_K_KNEE = 0.02
+    ADAPTIVE_K_CUMULATIVE = 0.8
+    
+    # Retrieval modu: "flat", "multi_query" (alt sorgular + rank fusion)
+    # veya "hierarchical" (önce section centroid'leri, sonra section içi chunk'lar)
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "flat")
+    MULTI_QUERY_MAX = 5  # Orijinal soru dahil en fazla sorgu sayısı
+    SECTION_SIZE = 20  # Section başına ardışık chunk sayısı
+    HIERARCHICAL_TOP_SECTIONS = int(os.getenv("HIERARCHICAL_TOP_SECTIONS", "4"))
+    
+    # Entity fast path (spell/condition/feature isimleri -> canonical chunk)
+    USE_ENTITY_FAST_PATH = os.getenv("USE_ENTITY_FAST_PATH", "true").lower() == "true"
+    # Tam eşleşen lookup'larda ("what does Prone do") LLM'siz kitap metni döndür
+    ENTITY_DIRECT_ANSWER = os.getenv("ENTITY_DIRECT_ANSWER", "false").lower() == "true"
+    ENTITY_MAX_PINNED = 3  # Context'in başına en fazla kaç canonical chunk
+    
+    # Komşu chunk genişletme (kural chunk sınırında devam ediyorsa)
+    NEIGHBOR_WINDOW = int(os.getenv("NEIGHBOR_WINDOW", "0"))  # Her yönde kaç komşu (0 = kapalı)
+    NEIGHBOR_EXPAND_TOP = 3  # Sadece en iyi 3 hit genişletilir
+    
+    # Context token bütçesi (0 = sınırsız, eski davranış; örn. 1500 ile açılır)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+    # Hedef modelin HuggingFace tokenizer'ı; boşsa ~4 karakter/token yaklaşımı
+    TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "")
+    
+    # Kitap başına shard (her PDF ayrı collection, paralel arama)
+    USE_SHARDS = os.getenv("USE_SHARDS", "false").lower() == "true"
+    SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "4"))
+    SHARD_LAZY_LOAD = os.getenv("SHARD_LAZY_LOAD", "true").lower() == "true"
+    
+    # Chunk text store (sıkıştırılmış + mmap); açıksa arama sonuçları text'siz döner,
+    # text sadece context'e/kaynaklara giren chunk'lar için store'dan okunur
+    USE_CHUNK_STORE = os.getenv("USE_CHUNK_STORE", "true").lower() == "true"
+    CHUNK_STORE_BLOCK_SIZE = 32  # Blok başına ardışık chunk
+    CHUNK_STORE_CACHE_BLOCKS = 256  # Bellekte açık tutulan blok sayısı (LRU)
+    
     # Paths
     PROJECT_ROOT = Path(__file__).parent.parent
     PDF_DIR = PROJECT_ROOT / "data" / "pdfs"
     VECTOR_DB_DIR = PROJECT_ROOT / "data" / "chroma_db"
+    # Sharded build'in chunk/entity/section index'leri ve chunk store'u (flat build'inkileri ezmesin)
+    SHARDED_INDEX_DIR = VECTOR_DB_DIR / "sharded"
+    QUERY_LOG_PATH = PROJECT_ROOT / "data" / "query_log.jsonl"
+    ROUTER_MODEL_PATH = PROJECT_ROOT / "data" / "router_model.json"
     
     # Claude Settings
     CLAUDE_MODEL = "claude-3-5-haiku-20241022"
+    # System talimatları ve PDF context'ine cache_control (Anthropic prompt caching)
+    CLAUDE_PROMPT_CACHE = os.getenv("CLAUDE_PROMPT_CACHE", "true").lower() == "true"
     CONFIDENCE_THRESHOLD = 0.8
+    # Confidence: cevabın chunk'larla kelime örtüşmesi + sayı ve (Source X) kontrolü (grounding.py).
+    # Kapalıysa eski kural tabanlı skor (ifade/uzunluk/"source" kelimesi/similarity).
+    GROUNDING_CONFIDENCE = os.getenv("GROUNDING_CONFIDENCE", "false").lower() == "true"
+    GROUNDING_MIN_SUPPORT = 0.3  # Örtüşme bunun altındaysa confidence 0
+    GROUNDING_FULL_SUPPORT = 0.65  # Örtüşme bu ve üstündeyse confidence 1.0 (cezalar hariç)
+    # Generation bütçesi: soru tipine göre Llama num_predict ve Claude max_tokens (generation_budget.py).
+    # Kapalıyken sınıf başına gerçekleşen token'lar yine kaydedilir (/stats), limitler 512 / 1024.
+    GENERATION_BUDGETS = os.getenv("GENERATION_BUDGETS", "false").lower() == "true"
+    GENERATION_BUDGET_TOKENS = {
+        "numeric": {"llama": 160, "claude": 300},
+        "definition": {"llama": 256, "claude": 512},
+        "comparison": {"llama": 448, "claude": 900},
+        "procedural": {"llama": 512, "claude": 1024},
+        "general": {"llama": 512, "claude": 1024},
+    }
+    
+    def index_dir(self, sharded: bool = None) -> Path:
+        """
+        Layout'a göre index/store dosyalarının klasörü
+
+        ChromaDB collection'ları farklı isimlerle aynı klasörde durur; ama chunk index,
+        chunk store, entity ve section index'leri sabit dosya adlı olduğu için
+        flat ve sharded build'ler ayrı klasörlere yazar.
+
+        Args:
+            sharded: Sharded layout mı (None = USE_SHARDS)
+        """
+        if sharded is None:
+            sharded = self.USE_SHARDS
+        return self.SHARDED_INDEX_DIR if sharded else self.VECTOR_DB_DIR
     
     @classmethod
     def validate(cls):
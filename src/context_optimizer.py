@@ -0,0 +1,205 @@
+"""
+Context optimizasyon modülü
+Retrieval sonrası MMR çeşitlendirme, örtüşen chunk birleştirme ve adaptive top-k
+"""
+
+from typing import List, Dict, Tuple
+import numpy as np # type: ignore
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Satır bazında L2 normalize et (cosine similarity için)"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def mmr_select(
+    query_embedding: np.ndarray,
+    candidates: List[Dict],
+    k: int,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = 0.95
+) -> List[Dict]:
+    """
+    Maximal Marginal Relevance ile çeşitli chunk'lar seç
+
+    Search'ten gelen embedding'ler tekrar kullanılır, yeni encode yapılmaz.
+
+    Args:
+        query_embedding: Query embedding'i
+        candidates: 'embedding' field'ı olan aday document'lar
+        k: Seçilecek chunk sayısı
+        lambda_mult: 1.0 = sadece relevance, 0.0 = sadece çeşitlilik
+        duplicate_threshold: Seçilmiş bir chunk'a bundan daha benzer adaylar atılır
+
+    Returns:
+        Seçilen document'lar (seçim sırasıyla)
+    """
+    if not candidates:
+        return []
+
+    # Embedding yoksa MMR yapılamaz, sıralamayı koru
+    if any(doc.get('embedding') is None for doc in candidates):
+        return candidates[:k]
+
+    embeddings = _normalize(np.asarray([doc['embedding'] for doc in candidates], dtype=np.float32))
+    query_vec = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+    relevance = embeddings @ query_vec
+    pairwise = embeddings @ embeddings.T
+
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best_pos = int(np.argmax(scores))
+        best_idx = remaining.pop(best_pos)
+
+        # Neredeyse aynı metin (handbook'lar arası tekrar) - prompt'a girmesin
+        if redundancy[best_pos] >= duplicate_threshold:
+            continue
+
+        selected.append(best_idx)
+
+    return [candidates[i] for i in selected]
+
+
+def _find_overlap(left: str, right: str, max_overlap: int, min_overlap: int = 10) -> int:
+    """left'in sonu ile right'ın başı arasındaki en uzun örtüşmeyi bul"""
+    limit = min(len(left), len(right), max_overlap)
+
+    for size in range(limit, min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+
+    return 0
+
+
+def merge_adjacent_chunks(docs: List[Dict], max_overlap: int = 100) -> List[Dict]:
+    """
+    Aynı kaynaktan gelen ardışık chunk'ları tek bir span'e birleştir
+
+    TextChunker chunk_overlap kadar metni iki chunk'ta tekrarlar;
+    birleştirme sırasında bu tekrar bir kez yazılır.
+
+    Args:
+        docs: Retrieved document'lar
+        max_overlap: Aranacak maksimum örtüşme (karakter)
+
+    Returns:
+        Birleştirilmiş document'lar (en yüksek similarity'ye göre sıralı)
+    """
+    by_source: Dict[str, List[Dict]] = {}
+    passthrough = []
+
+    for doc in docs:
+        chunk_id = doc['metadata'].get('chunk_id')
+        if not isinstance(chunk_id, int):
+            passthrough.append(doc)
+            continue
+        by_source.setdefault(doc['metadata'].get('source', 'Unknown'), []).append(doc)
+
+    merged = []
+
+    for source_docs in by_source.values():
+        source_docs.sort(key=lambda d: d['metadata']['chunk_id'])
+
+        span = None
+        for doc in source_docs:
+            if span is not None and doc['metadata']['chunk_id'] == span['metadata']['merged_chunk_ids'][-1] + 1:
+                overlap = _find_overlap(span['text'], doc['text'], max_overlap)
+                separator = "" if overlap else " "
+                span['text'] = span['text'] + separator + doc['text'][overlap:]
+                span['metadata']['merged_chunk_ids'].append(doc['metadata']['chunk_id'])
+                span['merged_ids'].append(doc['id'])
+
+                # Span'in skoru en alakalı parçasının skoru
+                if (doc.get('similarity') or 0.0) > (span.get('similarity') or 0.0):
+                    span['similarity'] = doc.get('similarity')
+                    span['distance'] = doc.get('distance')
+                    span['embedding'] = doc.get('embedding')
+                continue
+
+            if span is not None:
+                merged.append(span)
+
+            span = doc.copy()
+            span['metadata'] = dict(doc['metadata'])
+            span['metadata']['merged_chunk_ids'] = [doc['metadata']['chunk_id']]
+            span['merged_ids'] = [doc['id']]
+
+        if span is not None:
+            merged.append(span)
+
+    merged.sort(key=lambda d: d.get('similarity') or 0.0, reverse=True)
+    return merged + passthrough
+
+
+def choose_adaptive_k(
+    similarities: List[float],
+    min_k: int,
+    max_k: int,
+    gap_threshold: float = 0.05,
+    knee_threshold: float = 0.02,
+    cumulative_threshold: float = 0.8
+) -> Tuple[int, str]:
+    """
+    Similarity dağılımına göre kaç chunk kullanılacağını seç
+
+    Sırasıyla denenir:
+    1. gap: Ardışık skorlar arasında belirgin bir düşüş
+    2. knee: Skor eğrisinin dirseği (ilk-son skor doğrusundan en uzak nokta)
+    3. cumulative: Göreli relevance'ın belirli bir oranını kapsayan ilk k
+
+    Args:
+        similarities: Aday similarity skorları
+        min_k: En az kaç chunk
+        max_k: En fazla kaç chunk
+        gap_threshold: Bu değerden büyük düşüş = kesme noktası
+        knee_threshold: Dirseğin doğrudan minimum uzaklığı
+        cumulative_threshold: Kapsanacak relevance oranı
+
+    Returns:
+        (k, kullanılan yöntem)
+    """
+    scores = sorted((s or 0.0 for s in similarities), reverse=True)[:max_k]
+
+    if len(scores) <= min_k:
+        return len(scores), "all"
+
+    # 1. Gap - min_k'dan sonraki en büyük düşüş
+    gaps = [scores[i] - scores[i + 1] for i in range(min_k - 1, len(scores) - 1)]
+    best_gap = max(range(len(gaps)), key=lambda i: gaps[i])
+    if gaps[best_gap] >= gap_threshold:
+        return min_k + best_gap, "gap"
+
+    # 2. Knee - skorlar ilk-son doğrusunun ne kadar altında?
+    first, last = scores[0], scores[-1]
+    steps = len(scores) - 1
+    deviations = [
+        (first + (last - first) * i / steps) - scores[i]
+        for i in range(min_k - 1, len(scores))
+    ]
+    best_knee = max(range(len(deviations)), key=lambda i: deviations[i])
+    if deviations[best_knee] >= knee_threshold:
+        return min_k + best_knee, "knee"
+
+    # 3. Cumulative - en zayıf adaya göre göreli relevance
+    weights = [s - last for s in scores]
+    total = sum(weights)
+    if total <= 0:
+        return len(scores), "flat"
+
+    covered = 0.0
+    for i, weight in enumerate(weights, 1):
+        covered += weight
+        if i >= min_k and covered / total >= cumulative_threshold:
+            return i, "cumulative"
+
+    return len(scores), "cumulative"
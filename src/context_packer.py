@@ -0,0 +1,200 @@
+"""
+Context packing modülü
+Retrieved chunk'ları token bütçesine sığdırır, gerekirse cümle bazında sıkıştırır
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Callable, Tuple
+import numpy as np # type: ignore
+from config import config
+
+
+class TokenCounter:
+    """Hedef modelin tokenizer'ı ile token sayar"""
+
+    def __init__(self, tokenizer_name: str = None):
+        """
+        Args:
+            tokenizer_name: HuggingFace tokenizer adı (örn. Llama 3.1 tokenizer'ı).
+                Yüklenemezse karakter bazlı yaklaşık sayım kullanılır.
+        """
+        self.tokenizer = None
+        tokenizer_name = tokenizer_name or config.TOKENIZER_MODEL
+
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer # type: ignore
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                print(f"✅ Tokenizer hazır: {tokenizer_name}")
+            except Exception as e:
+                print(f"⚠️ Tokenizer yüklenemedi ({e}), yaklaşık sayım kullanılacak")
+
+    @property
+    def exact(self) -> bool:
+        """Gerçek tokenizer mı kullanılıyor?"""
+        return self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        """Text'in token sayısı"""
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        # İngilizce metin için ~4 karakter = 1 token
+        return max(1, len(text) // 4)
+
+
+class ContextPacker:
+    """Chunk'ları relevance sırasıyla token bütçesine yerleştirir"""
+
+    SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+    def __init__(self, token_counter: TokenCounter, embed_fn: Callable[[List[str]], np.ndarray],
+                 cache_size: int = 2048):
+        """
+        Args:
+            token_counter: Token sayacı
+            embed_fn: Cümle listesini (N, dim) embedding'e çeviren fonksiyon
+            cache_size: Saklanacak cümle embedding'i sayısı
+        """
+        self.token_counter = token_counter
+        self.embed_fn = embed_fn
+        self.cache_size = cache_size
+        self._sentence_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Async pipeline'da birden fazla thread aynı cache'i kullanır
+        self._cache_lock = threading.Lock()
+
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Cümle embedding'leri (cache'te olmayanlar tek batch'te encode edilir)"""
+        with self._cache_lock:
+            found = {s: self._sentence_cache[s] for s in sentences if s in self._sentence_cache}
+            for sentence in found:
+                self._sentence_cache.move_to_end(sentence)
+
+        missing = [s for s in dict.fromkeys(sentences) if s not in found]
+
+        if missing:
+            # Encode lock dışında yapılır; diğer thread'ler cache'i okumaya devam eder
+            found.update(zip(missing, self.embed_fn(missing)))
+            with self._cache_lock:
+                for sentence in missing:
+                    self._sentence_cache[sentence] = found[sentence]
+                while len(self._sentence_cache) > self.cache_size:
+                    self._sentence_cache.popitem(last=False)
+
+        return np.asarray([found[s] for s in sentences])
+
+    def compress(self, query_embedding: np.ndarray, doc: Dict, budget: int, overhead: int) -> Dict:
+        """
+        Chunk'tan sadece query'ye en benzer cümleleri çıkar
+
+        Args:
+            query_embedding: Query embedding'i
+            doc: Sıkıştırılacak document
+            budget: Bu document için kalan token
+            overhead: Header ve ayraç token'ları
+
+        Returns:
+            Sıkıştırılmış document ya da hiçbir cümle sığmıyorsa None
+        """
+        sentences = [s for s in self.SENTENCE_SPLIT.split(doc['text']) if s.strip()]
+        if not sentences:
+            return None
+
+        # Tek cümlelik chunk'ta chunk embedding'i zaten var
+        if len(sentences) == 1 and doc.get('embedding') is not None:
+            embeddings = np.asarray([doc['embedding']])
+        else:
+            embeddings = self._embed_sentences(sentences)
+
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding)
+        scores = (embeddings @ query_embedding) / np.clip(norms, 1e-12, None)
+
+        chosen = []
+        used = overhead
+        for idx in np.argsort(-scores):
+            cost = self.token_counter.count(sentences[idx]) + 1
+            if used + cost > budget:
+                continue
+            chosen.append(int(idx))
+            used += cost
+
+        # Birleştirilmiş metni tekrar say, bütçeyi aşıyorsa en zayıf cümleyi çıkar
+        while chosen:
+            text = " ... ".join(sentences[i] for i in sorted(chosen))
+            if self.token_counter.count(text) + overhead <= budget:
+                break
+            chosen.pop()
+
+        if not chosen:
+            return None
+
+        compressed = doc.copy()
+        # Orijinal cümle sırası korunur
+        compressed['text'] = text
+        compressed['compressed'] = True
+        return compressed
+
+    def pack(self, query_embedding: np.ndarray, docs: List[Dict], budget: int,
+             format_fn: Callable[[List[Dict]], str]) -> Tuple[List[Dict], Dict]:
+        """
+        Document'ları relevance sırasıyla bütçeye yerleştir
+
+        Args:
+            query_embedding: Query embedding'i
+            docs: Retrieved document'lar
+            budget: Context için toplam token bütçesi (0 = sınırsız, document'lar aynen döner)
+            format_fn: Document listesini prompt context'ine çeviren fonksiyon
+
+        Returns:
+            (paketlenmiş document'lar, istatistikler)
+        """
+        if budget <= 0:
+            return docs, {'context_token_budget': 0}
+
+        # Pinned (entity fast path) chunk'lar her zaman önce yerleşir
+        ordered = sorted(docs, key=lambda d: (not d.get('pinned'), -(d.get('similarity') or 0.0)))
+        packed = []
+        used = 0
+        compressed_count = 0
+        dropped = 0
+
+        for doc in ordered:
+            remaining = budget - used
+            # Header + ayraç maliyeti (text olmadan formatlanmış hali)
+            overhead = self.token_counter.count(format_fn([doc.copy(text="")])) + 2
+            cost = self.token_counter.count(doc['text']) + overhead
+
+            if cost <= remaining:
+                packed.append(doc)
+                used += cost
+                continue
+
+            compressed = self.compress(query_embedding, doc, remaining, overhead) if remaining > overhead else None
+            if compressed is None:
+                dropped += 1
+                continue
+
+            packed.append(compressed)
+            used += self.token_counter.count(compressed['text']) + overhead
+            compressed_count += 1
+
+        # Parça parça sayım (yuvarlama, ayraçlar, Source numarası) toplamdan biraz az çıkabilir;
+        # formatlanmış context bütçeyi aşıyorsa en az alakalı chunk'lar çıkarılır
+        context_tokens = self.token_counter.count(format_fn(packed))
+        while packed and context_tokens > budget:
+            removed = packed.pop()
+            compressed_count -= 1 if removed.get('compressed') else 0
+            dropped += 1
+            context_tokens = self.token_counter.count(format_fn(packed))
+
+        stats = {
+            'context_token_budget': budget,
+            'context_tokens': context_tokens,
+            'chunks_compressed': compressed_count,
+            'chunks_dropped': dropped,
+            'token_count_exact': self.token_counter.exact
+        }
+        return packed, stats
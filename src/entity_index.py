@@ -0,0 +1,275 @@
+"""
+Entity index modülü
+Spell, condition, class feature ve item isimlerini canonical chunk'lara eşler
+"""
+
+import json
+import re
+from collections import deque
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Any
+from config import config
+
+
+class AhoCorasick:
+    """Çoklu pattern arama için Aho-Corasick otomatı (saf Python)"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Any]]] = [[]]
+
+    def add(self, pattern: str, value: Any):
+        """Pattern ekle (build'den önce çağrılmalı)"""
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append((len(pattern), value))
+
+    def build(self):
+        """Failure link'lerini BFS ile hesapla"""
+        queue = deque(self.goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        Text'teki tüm eşleşmeler
+
+        Returns:
+            (başlangıç, bitiş, value) listesi
+        """
+        matches = []
+        state = 0
+
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                matches.append((i - length + 1, i + 1, value))
+
+        return matches
+
+
+def squash(text: str) -> str:
+    """Küçük harf + sadece harf/rakam (chunk temizliğindeki boşluk kaybına dayanıklı)"""
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+
+class EntityIndex:
+    """Entity ismi -> canonical chunk id'leri"""
+
+    CONDITIONS = [
+        "Blinded", "Charmed", "Deafened", "Exhaustion", "Frightened", "Grappled",
+        "Incapacitated", "Invisible", "Paralyzed", "Petrified", "Poisoned",
+        "Prone", "Restrained", "Stunned", "Unconscious",
+    ]
+
+    # Sık sorulan class feature'lar (data/entities.json ile genişletilebilir)
+    FEATURES = [
+        "Rage", "Reckless Attack", "Sneak Attack", "Cunning Action", "Uncanny Dodge",
+        "Evasion", "Action Surge", "Second Wind", "Extra Attack", "Divine Smite",
+        "Lay on Hands", "Wild Shape", "Bardic Inspiration", "Channel Divinity",
+        "Flurry of Blows", "Stunning Strike", "Metamagic", "Eldritch Invocations",
+        "Arcane Recovery", "Favored Enemy", "Fighting Style", "Concentration",
+    ]
+
+    SCHOOLS = "abjuration|conjuration|divination|enchantment|evocation|illusion|necromancy|transmutation"
+    SPELL_HEADER = re.compile(
+        r"\b((?:[A-Z][a-z']+\s?){1,4}?)\s?(?:\d(?:st|nd|rd|th)-level\s?(?:" + SCHOOLS + r")"
+        r"|(?:" + SCHOOLS + r")\s?cantrip)"
+    )
+
+    # "Fireball damage", "what does prone do" gibi direkt lookup soruları
+    LOOKUP_FILLER = {
+        "what", "whats", "is", "are", "does", "do", "the", "a", "an", "how", "work",
+        "works", "condition", "spell", "feature", "mean", "means", "rules", "rule",
+        "for", "of", "explain", "describe", "damage", "range", "duration",
+        "casting", "time", "components", "effect", "effects", "level",
+    }
+
+    def __init__(self, index_path: Optional[Path] = None):
+        """
+        Args:
+            index_path: Index dosyası (varsayılan: config.index_dir()/entity_index.json)
+        """
+        self.index_path = Path(index_path or config.index_dir() / "entity_index.json")
+        self.entities: Dict[str, Dict] = self._load()
+        self.matcher = self._build_matcher()
+
+    def _load(self) -> Dict:
+        """Index dosyasını yükle"""
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save(self):
+        """Index'i diske kaydet"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entities, f, indent=2)
+
+    def _build_matcher(self) -> AhoCorasick:
+        """Query eşleştirmesi için (küçük harfli isimler üzerinde) otomat"""
+        matcher = AhoCorasick()
+        for key in self.entities:
+            matcher.add(key, key)
+        matcher.build()
+        return matcher
+
+    @staticmethod
+    def _split_camel(raw: str) -> str:
+        """'MagicMissile' -> 'Magic Missile'"""
+        return " ".join(re.findall(r"[A-Z][a-z']*", raw))
+
+    def _seed_names(self) -> Dict[str, str]:
+        """Sabit + data/entities.json'daki isimler -> tipleri"""
+        names = {name: "condition" for name in self.CONDITIONS}
+        names.update({name: "feature" for name in self.FEATURES})
+
+        extra_path = config.PROJECT_ROOT / "data" / "entities.json"
+        if extra_path.exists():
+            with open(extra_path, 'r', encoding='utf-8') as f:
+                for entity_type, extra_names in json.load(f).items():
+                    names.update({name: entity_type for name in extra_names})
+
+        return names
+
+    def build(self, documents: List[Dict]) -> "EntityIndex":
+        """
+        Ingest edilen chunk'lardan index oluştur
+
+        - Spell'ler: "Fireball 3rd-level evocation" başlıklarından çıkarılır
+        - Condition'lar: "Prone A prone creature ..." tanımının olduğu chunk
+        - Feature/item'lar: İsmin en yoğun geçtiği chunk
+
+        Args:
+            documents: 'id' field'ı olan chunk document'ları
+        """
+        entities: Dict[str, Dict] = {}
+
+        # 1. Spell başlıkları
+        for doc in documents:
+            for match in self.SPELL_HEADER.finditer(doc['text']):
+                name = self._split_camel(match.group(1).replace(" ", ""))
+                if not name:
+                    continue
+                entry = entities.setdefault(name.lower(), {"name": name, "type": "spell", "ids": []})
+                if doc['id'] not in entry['ids']:
+                    entry['ids'].append(doc['id'])
+
+        # 2. Seed isimler - squash edilmiş chunk'larda tek geçişte ara
+        seeds = self._seed_names()
+        matcher = AhoCorasick()
+        for name in seeds:
+            matcher.add(squash(name), name)
+        matcher.build()
+
+        occurrences: Dict[str, Dict[str, int]] = {}
+        definitions: Dict[str, str] = {}
+
+        for doc in documents:
+            squashed = squash(doc['text'])
+            for _, end, name in matcher.find(squashed):
+                counts = occurrences.setdefault(name, {})
+                counts[doc['id']] = counts.get(doc['id'], 0) + 1
+
+                # "Prone A prone creature" tarzı tanım
+                key = squash(name)
+                if name not in definitions and re.match(r"(?:an?|the)" + key + "creature", squashed[end:end + 40]):
+                    definitions[name] = doc['id']
+
+        for name, entity_type in seeds.items():
+            if name in definitions:
+                canonical = definitions[name]
+            elif entity_type != "condition" and name in occurrences:
+                canonical = max(occurrences[name].items(), key=lambda item: item[1])[0]
+            else:
+                continue
+            entities.setdefault(name.lower(), {"name": name, "type": entity_type, "ids": [canonical]})
+
+        self.entities = entities
+        self.matcher = self._build_matcher()
+        print(f"✅ Entity index: {len(entities)} entity")
+        return self
+
+    def match(self, query: str) -> List[Dict]:
+        """
+        Query'deki entity'leri bul (kelime sınırına uyan en uzun eşleşmeler)
+
+        Returns:
+            Entity kayıtları (query'deki sıraya göre)
+        """
+        text = query.lower()
+        found = []
+
+        for start, end, key in self.matcher.find(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            found.append((start, end, key))
+
+        # Daha uzun eşleşme kısa olanı kapsar ("Magic Missile" > "Magic")
+        found.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        results = []
+        last_end = -1
+        for start, end, key in found:
+            if start < last_end:
+                continue
+            results.append(dict(self.entities[key], key=key))
+            last_end = end
+
+        return results
+
+    def is_exact_lookup(self, query: str, entity: Dict) -> bool:
+        """Soru sadece entity'nin kendisini mi soruyor? ("what does Prone do")"""
+        rest = query.lower().replace(entity['key'], " ")
+        words = re.findall(r"[a-z']+", rest)
+        return all(word.replace("'", "") in self.LOOKUP_FILLER for word in words)
+
+
+def main():
+    """Entity index test scripti"""
+    index = EntityIndex()
+
+    if not index.entities:
+        print("❌ Entity index boş! Önce build_database.py çalıştırın.")
+        return
+
+    print(f"📚 {len(index.entities)} entity yüklendi\n")
+
+    test_queries = [
+        "What does Prone do?",
+        "Fireball damage",
+        "Can I use Sneak Attack while grappled?",
+        "What are the six ability scores?",
+    ]
+
+    for query in test_queries:
+        hits = index.match(query)
+        print(f"🔍 {query}")
+        for hit in hits:
+            exact = index.is_exact_lookup(query, hit)
+            print(f"   -> {hit['name']} ({hit['type']}) ids={hit['ids']} exact={exact}")
+
+
+if __name__ == "__main__":
+    main()
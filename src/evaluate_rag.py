@@ -43,8 +43,14 @@ class RAGEvaluator:
         # ÖNEMLİ: RETURN SATIRI OLMALI!
         return found_keywords / len(expected_keywords) if expected_keywords else 0.0
     
-    def run_evaluation(self, test_questions: List[Dict] = None):
-        """Tüm test sorularını çalıştır ve değerlendir"""
+    def run_evaluation(self, test_questions: List[Dict] = None, query_kwargs: Dict = None):
+        """
+        Tüm test sorularını çalıştır ve değerlendir
+        
+        Args:
+            test_questions: Test soruları (varsayılan TEST_QUESTIONS)
+            query_kwargs: rag.query'ye geçilecek ek parametreler (örn. adaptive_k)
+        """
         
         if test_questions is None:
             test_questions = TEST_QUESTIONS
@@ -64,7 +70,8 @@ class RAGEvaluator:
             start_time = time.time()
             
             # RAG query
-            result = self.rag.query(test_case['question'], top_k=5)
+            result = self.rag.query(test_case['question'], top_k=5, **(query_kwargs or {}))
+            diagnostics = result.get('diagnostics', {})
             
             # Retrieval için ayrı timing
             retrieval_docs = self.rag.retrieve_context(test_case['question'], top_k=5)
@@ -94,7 +101,9 @@ class RAGEvaluator:
                 "retrieval_quality": retrieval_quality,
                 "confidence": confidence,
                 "response_time": elapsed_time,
-                "sources_used": len(result['sources'])
+                "sources_used": len(result['sources']),
+                "k_used": diagnostics.get('k_used', len(result['sources'])),
+                "prompt_tokens": diagnostics.get('prompt_tokens')
             }
             
             self.results.append(eval_result)
@@ -136,6 +145,13 @@ class RAGEvaluator:
         print(f"   Confidence: {avg_confidence:.2%}")
         print(f"   Response Time: {avg_response_time:.2f}s")
         
+        avg_k = sum(r['k_used'] for r in self.results) / len(self.results)
+        print(f"   Chunk Sayısı (k): {avg_k:.1f}")
+        
+        prompt_tokens = [r['prompt_tokens'] for r in self.results if r.get('prompt_tokens') is not None]
+        if prompt_tokens:
+            print(f"   Prompt Token: {sum(prompt_tokens) / len(prompt_tokens):.0f}")
+        
         # Category breakdown
         print(f"\n📊 Kategori Bazlı:")
         categories = {}
@@ -163,6 +179,33 @@ class RAGEvaluator:
             print("\n❌ RAG sistemi zayıf performans gösteriyor. Optimizasyon gerekli!")
 
 
+def compare_adaptive_k():
+    """Sabit top_k ile adaptive top_k'yı test setinde karşılaştır"""
+    from rag_pipeline_hybrid import HybridRAGPipeline
+    
+    rag = HybridRAGPipeline()
+    summary = {}
+    
+    for label, adaptive in [("fixed", False), ("adaptive", True)]:
+        evaluator = RAGEvaluator(rag)
+        evaluator.run_evaluation(query_kwargs={"adaptive_k": adaptive})
+        
+        results = evaluator.results
+        prompt_tokens = [r['prompt_tokens'] for r in results if r.get('prompt_tokens') is not None]
+        summary[label] = {
+            "answer_quality": sum(r['answer_quality'] for r in results) / len(results),
+            "k": sum(r['k_used'] for r in results) / len(results),
+            "prompt_tokens": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0,
+        }
+    
+    print("\n" + "="*60)
+    print("FIXED vs ADAPTIVE TOP-K")
+    print("="*60)
+    for label, stats in summary.items():
+        print(f"{label:>10}: quality={stats['answer_quality']:.2%}  "
+              f"k={stats['k']:.1f}  prompt_tokens={stats['prompt_tokens']:.0f}")
+
+
 def main():
     """Evaluation test scripti"""
     
@@ -183,4 +226,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import sys
+    
+    # python evaluate_rag.py adaptive -> sabit/adaptive top-k karşılaştırması
+    if len(sys.argv) > 1 and sys.argv[1] == "adaptive":
+        compare_adaptive_k()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Generation budget modülü
+Soru tipine göre (tanım, sayısal değer, karşılaştırma, adım adım) Llama num_predict,
+stop sequence'leri ve Claude max_tokens seçer. "Fireball'un menzili ne?" gibi sorularda
+CPU Llama'nın 512 token'a kadar uzatması engellenir.
+Gerçekleşen/bütçelenen token'lar sınıf başına tutulur ki limitler ayarlanabilsin.
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Dict, Optional
+import numpy as np # type: ignore
+from config import config
+
+
+QUESTION_CLASSES = ("numeric", "definition", "comparison", "procedural", "general")
+
+# Sırayla denenir, ilk eşleşen sınıf seçilir ("how many" -> numeric, "how do" -> procedural)
+CLASS_PATTERNS = [
+    ("comparison", re.compile(
+        r"\b(difference|differ|compare|comparison|versus|vs\.?|better|worse)\b|\bfark", re.IGNORECASE)),
+    ("numeric", re.compile(
+        r"\bhow (many|much|far|long|often)\b|\bwhat(?:'s| is) (?:the )?"
+        r"(range|damage|dc|cost|speed|duration|radius|weight|price|bonus|modifier|level|"
+        r"hit points|hp|ac|armor class)\b|\bkaç\b", re.IGNORECASE)),
+    ("procedural", re.compile(
+        r"\bhow (do|does|can|should|to)\b|\bwhat happens\b|\bsteps?\b|\bnasıl\b", re.IGNORECASE)),
+    ("definition", re.compile(
+        r"^\s*(what (is|are|does)|what's|define|explain|describe)\b|\bnedir\b|\bne demek\b",
+        re.IGNORECASE)),
+]
+
+# Yeni bir "Question:"/"Context:" bloğu uydurmaya başlarsa dur
+LLAMA_STOP = ["\nQuestion:", "\nContext:"]
+
+# Prompt sonuna eklenen kısa talimat (uzun cevap beklenen sınıflarda yok)
+CLASS_HINTS = {
+    "numeric": "Answer in one or two sentences: state the value first, then cite the source.",
+    "definition": "Answer concisely in one short paragraph.",
+}
+
+DEFAULT_BUDGET = {"llama": 512, "claude": 1024}
+
+
+class GenerationBudgets:
+    """
+    Kural tabanlı soru sınıflandırması + sınıf başına token bütçesi
+
+    GENERATION_BUDGETS kapalıyken sınıflandırma yine yapılır ve gerçekleşen token'lar
+    kaydedilir (bütçeler açılmadan önce sınıf başına uzunluk görülebilsin), ama
+    her soru eski sabit limitlerle (512 / 1024) üretilir.
+    """
+
+    def __init__(self, window: int = 500):
+        """
+        Args:
+            window: Backend ve sınıf başına tutulan son ölçüm sayısı
+        """
+        self._samples = {
+            (backend, question_class): deque(maxlen=window)
+            for backend in DEFAULT_BUDGET for question_class in QUESTION_CLASSES
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify_question(question: str) -> str:
+        """Soru tipi (QUESTION_CLASSES'tan biri)"""
+        for question_class, pattern in CLASS_PATTERNS:
+            if pattern.search(question):
+                return question_class
+        return "general"
+
+    def budget(self, question: str) -> Dict:
+        """
+        Soru için generation ayarları
+
+        Returns:
+            {"class": ..., "llama": num_predict, "claude": max_tokens,
+             "stop": Llama stop sequence'leri, "hint": prompt'a eklenecek talimat ya da None}
+        """
+        question_class = self.classify_question(question)
+        if not config.GENERATION_BUDGETS:
+            return dict(DEFAULT_BUDGET, **{"class": question_class, "stop": [], "hint": None})
+
+        limits = config.GENERATION_BUDGET_TOKENS.get(question_class, DEFAULT_BUDGET)
+        stop = LLAMA_STOP + (["\n\n"] if question_class == "numeric" else [])
+        return {
+            "class": question_class,
+            "llama": limits["llama"],
+            "claude": limits["claude"],
+            "stop": stop,
+            "hint": CLASS_HINTS.get(question_class),
+        }
+
+    def record(self, backend: str, budget: Dict, tokens: Optional[int], truncated: bool,
+               ms: Optional[float] = None) -> Dict:
+        """
+        Tamamlanan generation'ı kaydet
+
+        Args:
+            backend: "llama" ya da "claude"
+            budget: budget() sonucu
+            tokens: Üretilen token sayısı (Ollama eval_count / Claude output_tokens)
+            truncated: Limit yüzünden kesildi mi (done_reason "length" / stop_reason "max_tokens")
+            ms: Generation süresi
+
+        Returns:
+            diagnostics'e yazılacak özet
+        """
+        with self._lock:
+            self._samples[(backend, budget['class'])].append((tokens, budget[backend], truncated, ms))
+        return {
+            "class": budget['class'],
+            "budget": budget[backend],
+            "tokens": tokens,
+            "truncated": truncated,
+        }
+
+    def stats(self) -> Dict:
+        """Backend ve sınıf başına sayı, bütçe, gerçekleşen token (mean/p95), kesilme oranı, süre"""
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+
+        result = {backend: {} for backend in DEFAULT_BUDGET}
+        for (backend, question_class), values in samples.items():
+            if not values:
+                continue
+            tokens = [t for t, _, _, _ in values if t is not None]
+            timings = [ms for _, _, _, ms in values if ms is not None]
+            result[backend][question_class] = {
+                "count": len(values),
+                "budget": values[-1][1],
+                "tokens_mean": round(float(np.mean(tokens)), 1) if tokens else None,
+                "tokens_p95": round(float(np.percentile(tokens, 95)), 1) if tokens else None,
+                "budget_used": round(float(np.mean([t / b for t, b, _, _ in values if t is not None])), 3)
+                if tokens else None,
+                "truncated_rate": round(sum(tr for _, _, tr, _ in values) / len(values), 3),
+                "ms_mean": round(float(np.mean(timings)), 1) if timings else None,
+            }
+        return result
+
+
+def main():
+    """Generation budget test scripti"""
+    budgets = GenerationBudgets()
+    for question in [
+        "What is the range of Fireball?",
+        "How many spell slots does a 3rd level wizard have?",
+        "What does Prone do?",
+        "What is the difference between a spell attack and a saving throw spell?",
+        "How do I calculate armor class?",
+        "Tell me about dwarves",
+    ]:
+        budget = budgets.budget(question)
+        print(f"{budget['class']:>10} llama={budget['llama']:<4} claude={budget['claude']:<5} {question}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Generation cache modülü
+LLM cevaplarını (model, ayarlar, normalize soru, context chunk id'leri) parmak izine göre saklar.
+Farklı yazılmış ama aynı chunk'ları getiren sorular tekrar generation yapmaz.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from config import config
+
+
+class GenerationCache:
+    """
+    Bellek içi LLM cevap cache'i (LRU + TTL, thread-safe)
+
+    CacheManager'dan farkı: soru string'ine değil, LLM'e giden prompt'un
+    parmak izine bakar; hem Llama hem Claude cevapları için kullanılır.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        """
+        Args:
+            max_size: En fazla kaç cevap tutulsun (None = config)
+            ttl: Cevabın geçerlilik süresi, saniye (None = config)
+        """
+        self.max_size = max_size or config.GENERATION_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else config.GENERATION_CACHE_TTL
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Küçük harf, noktalama yok, tek boşluk ("What is Prone?" == "what is prone")"""
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    def make_key(self, model: str, options: Dict, query: str, chunk_ids: List[str]) -> str:
+        """
+        Generation parmak izi
+
+        Args:
+            model: Model adı
+            options: Cevabı etkileyen diğer her şey (sampling ayarları, system prompt, web context)
+            query: Kullanıcı sorusu (normalize edilir)
+            chunk_ids: Context'teki chunk id'leri (sırası önemli)
+        """
+        payload = json.dumps(
+            [model, options, self.normalize_query(query), list(chunk_ids)],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """Geçerli cevap varsa döndür (None key = cache bypass)"""
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Optional[str], answer: str):
+        """Cevabı kaydet, boyut aşıldıysa en eski kullanılanı at"""
+        if key is None:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Tüm cevapları sil"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """Boyut ve hit oranı"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def main():
+    """Generation cache test scripti"""
+    cache = GenerationCache(max_size=2, ttl=60)
+    options = {"temperature": 0.7}
+
+    key = cache.make_key("llama", options, "What does Prone do?", ["phb_12", "phb_13"])
+    same = cache.make_key("llama", options, "what does prone do", ["phb_12", "phb_13"])
+    other = cache.make_key("llama", options, "What does Prone do?", ["phb_13", "phb_12"])
+
+    cache.set(key, "A prone creature's only movement option is to crawl...")
+    print(f"Aynı soru, farklı yazım: {'✅ hit' if cache.get(same) else '❌ miss'}")
+    print(f"Farklı chunk sırası:     {'✅ hit' if cache.get(other) else '❌ miss'}")
+    print(f"Stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
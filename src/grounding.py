@@ -0,0 +1,163 @@
+"""
+Grounding modülü
+Cevabın retrieval chunk'larıyla ne kadar desteklendiğini ölçen hızlı confidence skoru.
+LLM ya da embedding çağrısı yok: kelime örtüşmesi, sayı kontrolü ve (Source X) doğrulaması.
+"""
+
+import re
+import time
+from typing import List, Dict, Set
+from config import config
+
+
+# Her yerde geçen kelimeler desteğe sayılmaz
+STOPWORDS = {
+    "the", "and", "for", "that", "this", "with", "you", "your", "are", "can", "but",
+    "not", "was", "were", "has", "have", "had", "its", "it's", "from", "into", "when",
+    "which", "what", "who", "how", "they", "them", "their", "there", "then", "than",
+    "also", "only", "any", "all", "each", "some", "such", "may", "will", "would", "could",
+    "should", "does", "did", "doing", "been", "being", "about", "based", "provided",
+    "context", "source", "sources", "answer", "question", "according", "however", "other",
+}
+
+REFUSAL_PHRASES = [
+    "i don't know",
+    "i don't have",
+    "i'm not sure",
+    "cannot find",
+    "not enough information",
+    "no information",
+    "i cannot answer",
+    "does not mention",
+    "doesn't mention",
+]
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+CITATION = re.compile(r"source\s*(\d+)", re.IGNORECASE)
+WORD = re.compile(r"[a-z][a-z']+")
+NUMBER = re.compile(r"\d+")
+STEM_LENGTH = 6  # "grappled"/"grappling" -> "grappl" (ucuz stemming)
+MIN_CLAIM_TERMS = 3  # Daha az içerik kelimesi olan cümleler ("Here is the answer:") sayılmaz
+
+
+def terms(text: str) -> Set[str]:
+    """İçerik kelimeleri (küçük harf, stopword yok, ilk STEM_LENGTH harf)"""
+    return {
+        word[:STEM_LENGTH] for word in WORD.findall(text.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    }
+
+
+class GroundingScorer:
+    """
+    Cevap cümlelerinin chunk'larda desteklenme oranı -> 0-1 confidence
+
+    Her cümlenin içerik kelimelerinin ne kadarı tek bir chunk'ta geçiyor; cümle
+    (Source X) gösteriyorsa sadece gösterilen chunk'lara bakılır (yanlış atıf desteği düşürür).
+    Chunk'larda olmayan sayılar (mesafe, hasar, DC) ve var olmayan Source numaraları ceza alır.
+    """
+
+    def __init__(self, min_support: float = None, full_support: float = None):
+        """
+        Args:
+            min_support: Bu örtüşmenin altı 0 confidence (None = config)
+            full_support: Bu örtüşme ve üstü 1.0 confidence (None = config)
+        """
+        self.min_support = min_support if min_support is not None else config.GROUNDING_MIN_SUPPORT
+        self.full_support = full_support if full_support is not None else config.GROUNDING_FULL_SUPPORT
+
+    def score(self, answer: str, source_texts: List[str]) -> Dict:
+        """
+        Args:
+            answer: LLM cevabı
+            source_texts: Prompt'taki sırasıyla chunk metinleri (Source 1 = ilk)
+
+        Returns:
+            confidence ve ayrıntılar (support, claims, numbers, citations, ms)
+        """
+        start = time.perf_counter()
+        answer_lower = answer.lower()
+
+        if not source_texts or any(phrase in answer_lower for phrase in REFUSAL_PHRASES):
+            return self._result(0.0, 0.0, 0, 0, 0, 0, 0, start)
+
+        chunk_terms = [terms(text) for text in source_texts]
+        chunk_numbers = set(NUMBER.findall(" ".join(source_texts)))
+
+        supported_weight = 0.0
+        total_weight = 0
+        claims = 0
+        cited, invalid = 0, 0
+
+        for sentence in SENTENCE_SPLIT.split(answer):
+            indices = [int(n) for n in CITATION.findall(sentence)]
+            valid = [i for i in indices if 1 <= i <= len(source_texts)]
+            cited += len(indices)
+            invalid += len(indices) - len(valid)
+
+            sentence_terms = terms(CITATION.sub(" ", sentence))
+            if len(sentence_terms) < MIN_CLAIM_TERMS:
+                continue
+
+            candidates = [chunk_terms[i - 1] for i in valid] if valid else chunk_terms
+            overlap = max(len(sentence_terms & chunk) for chunk in candidates)
+            supported_weight += overlap
+            total_weight += len(sentence_terms)
+            claims += 1
+
+        # Atıf numaraları sayı kontrolüne girmez
+        numbers = set(NUMBER.findall(CITATION.sub(" ", answer)))
+        unsupported_numbers = len(numbers - chunk_numbers)
+
+        support = supported_weight / total_weight if total_weight else 0.0
+        confidence = (support - self.min_support) / (self.full_support - self.min_support)
+        if numbers:
+            confidence -= 0.3 * unsupported_numbers / len(numbers)
+        if cited:
+            confidence -= 0.2 * invalid / cited
+        else:
+            confidence -= 0.1
+
+        return self._result(confidence, support, claims, len(numbers), unsupported_numbers,
+                            cited, invalid, start)
+
+    @staticmethod
+    def _result(confidence: float, support: float, claims: int, numbers: int,
+                unsupported_numbers: int, citations: int, invalid_citations: int, start: float) -> Dict:
+        return {
+            "confidence": round(max(0.0, min(1.0, confidence)), 3),
+            "support": round(support, 3),
+            "claims": claims,
+            "numbers": numbers,
+            "unsupported_numbers": unsupported_numbers,
+            "citations": citations,
+            "invalid_citations": invalid_citations,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+
+def main():
+    """Grounding test scripti"""
+    scorer = GroundingScorer()
+    sources = [
+        "A grappled creature's speed becomes 0, and it can't benefit from any bonus to its speed. "
+        "The condition ends if the grappler is incapacitated.",
+        "Prone: A prone creature's only movement option is to crawl. The creature has disadvantage "
+        "on attack rolls. An attack roll against the creature has advantage if the attacker is within 5 feet.",
+    ]
+    answers = {
+        "destekli": "A grappled creature's speed becomes 0 and it can't benefit from bonuses to speed "
+                    "(Source 1). Attacks against a prone creature within 5 feet have advantage (Source 2).",
+        "uydurma": "A grappled creature takes 2d6 bludgeoning damage each round and must make a "
+                   "DC 15 Strength saving throw to escape (Source 3).",
+        "kaçamak": "I don't have enough information to answer that.",
+    }
+    for label, answer in answers.items():
+        result = scorer.score(answer, sources)
+        print(f"{label:>9}: confidence={result['confidence']:.2f} support={result['support']:.2f} "
+              f"sayı={result['unsupported_numbers']}/{result['numbers']} "
+              f"geçersiz atıf={result['invalid_citations']}/{result['citations']} ({result['ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Lokal Claude Messages API mock'u
+Prompt caching davranışını (cache_control breakpoint'leri, 5 dk TTL) ve
+token sayısına bağlı gecikmeyi taklit eder; gerçek API'ye para ödemeden ölçüm için.
+
+Sadece stream olmayan POST /v1/messages desteklenir.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Tuple
+
+
+# Gecikme modeli (saniye): sabit + cache'siz input token + cache'ten okunan token + cevap
+BASE_LATENCY = 0.15
+UNCACHED_TOKEN_LATENCY = 0.0004
+CACHED_TOKEN_LATENCY = 0.00004
+OUTPUT_LATENCY = 0.3
+OUTPUT_TOKENS = 120
+
+CACHE_TTL = 300  # Anthropic ephemeral cache: 5 dakika (her okumada yenilenir)
+MIN_CACHE_TOKENS = 1024  # Bu uzunluğun altındaki prefix'ler cache'lenmez
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 karakter/token (mock için yeterli)"""
+    return max(1, len(text) // 4)
+
+
+def flatten_blocks(request: Dict) -> List[Tuple[str, bool]]:
+    """
+    Request'i API'nin cache prefix sırasına göre düz bloklara çevir
+
+    Returns:
+        (text, cache_control var mı) listesi: system blokları, sonra mesaj blokları
+    """
+    blocks = []
+
+    system = request.get('system') or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    for item in system:
+        blocks.append((item.get('text', ''), 'cache_control' in item))
+
+    for message in request.get('messages', []):
+        content = message.get('content', '')
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        for item in content:
+            blocks.append((f"{message['role']}:{item.get('text', '')}", 'cache_control' in item))
+
+    return blocks
+
+
+class PromptCache:
+    """Breakpoint'e kadar olan prefix'in hash'i -> son kullanım zamanı"""
+
+    def __init__(self, ttl: float = CACHE_TTL, min_tokens: int = MIN_CACHE_TOKENS):
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def usage(self, model: str, blocks: List[Tuple[str, bool]]) -> Dict[str, int]:
+        """
+        Request'in input token'larını cache read / cache write / normal olarak böl
+
+        En uzun geçerli cache'li prefix okunur; ondan sonraki son breakpoint'e
+        kadar olan kısım cache'e yazılır, kalanı normal input sayılır.
+        """
+        total = 0
+        breakpoints = []  # (prefix token sayısı, prefix hash'i)
+        digest = hashlib.sha256(model.encode('utf-8'))
+
+        for text, cached in blocks:
+            total += estimate_tokens(text)
+            digest.update(text.encode('utf-8'))
+            if cached and total >= self.min_tokens:
+                breakpoints.append((total, digest.copy().hexdigest()))
+
+        now = time.time()
+        with self._lock:
+            read = 0
+            for tokens, key in breakpoints:
+                if now - self.entries.get(key, 0) < self.ttl:
+                    read = tokens
+                    self.entries[key] = now
+
+            write = 0
+            if breakpoints and breakpoints[-1][0] > read:
+                write = breakpoints[-1][0] - read
+                for tokens, key in breakpoints:
+                    if tokens > read:
+                        self.entries[key] = now
+
+        return {
+            "input_tokens": total - read - write,
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": write,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+class MockMessagesHandler(BaseHTTPRequestHandler):
+    """POST /v1/messages"""
+
+    cache = PromptCache()
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/messages"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length))
+
+        if request.get('stream'):
+            self.send_error(400, "Mock sadece stream olmayan istekleri destekler")
+            return
+
+        usage = self.cache.usage(request.get('model', ''), flatten_blocks(request))
+        output_tokens = min(OUTPUT_TOKENS, request.get('max_tokens', OUTPUT_TOKENS))
+
+        time.sleep(
+            BASE_LATENCY
+            + (usage['input_tokens'] + usage['cache_creation_input_tokens']) * UNCACHED_TOKEN_LATENCY
+            + usage['cache_read_input_tokens'] * CACHED_TOKEN_LATENCY
+            + OUTPUT_LATENCY
+        )
+
+        body = json.dumps({
+            "id": f"msg_mock_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get('model'),
+            "content": [{"type": "text", "text": "Mock answer based on the context (Source 1)."}],
+            "stop_reason": "max_tokens" if output_tokens < OUTPUT_TOKENS else "end_turn",
+            "stop_sequence": None,
+            "usage": dict(usage, output_tokens=output_tokens),
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Her istek için log basma"""
+        pass
+
+
+def start_mock_server(port: int = 0) -> ThreadingHTTPServer:
+    """
+    Mock'u arka plan thread'inde başlat
+
+    Args:
+        port: 0 = boş bir port seç
+
+    Returns:
+        Server (adres: server.server_address, durdurmak için server.shutdown())
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockMessagesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-claude").start()
+    return server
+
+
+def main():
+    """Mock'u ön planda çalıştır (ANTHROPIC_BASE_URL=http://127.0.0.1:8765)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 8765), MockMessagesHandler)
+    print("🧪 Mock Claude API: http://127.0.0.1:8765/v1/messages")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Lokal Ollama API mock'u
+CPU'daki Ollama gibi aynı anda tek generation yapar (diğer istekler sırada bekler);
+birden fazla Ollama sunucusu (fleet) ile pool/yük dağıtımı ölçümü için.
+
+Sunucu başına tek KV cache slot'u vardır: son işlenen token dizisiyle ortak prefix
+tekrar prefill edilmez. `context` alanı (önceki turun token'ları) kabul edilir ve
+cevapta döndürülür; chat oturumu ölçümü için.
+
+POST /api/generate (stream ve stream olmayan) ve GET /api/tags desteklenir.
+"""
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+# Gecikme modeli (saniye): sabit + cache'te olmayan prompt token'ı başına prefill + token başına decode
+PREFILL_LATENCY = 0.1
+PREFILL_TOKEN_LATENCY = 0.0002
+TOKEN_LATENCY = 0.01
+OUTPUT_TOKENS = 30
+
+
+def tokenize(text: str) -> list:
+    """Kelime başına sabit bir token id (mock için yeterli)"""
+    return [zlib.crc32(word.encode('utf-8')) % 32000 for word in text.split()]
+
+
+def common_prefix(a: list, b: list) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Sunucu başına durum self.server üzerinde (generation_lock, failing, kv_cache)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.server.failing:
+            self.send_error(503)
+            return
+        if self.path != "/api/tags":
+            self.send_error(404)
+            return
+        self._send_json({"models": [{"name": "mock"}]})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length))
+
+        if self.server.failing:
+            self.send_error(503)
+            return
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+
+        num_predict = request.get('options', {}).get('num_predict', OUTPUT_TOKENS)
+        tokens = min(OUTPUT_TOKENS, num_predict)
+        # Ollama gibi: önceki context + (varsa) system + yeni prompt
+        sequence = (list(request.get('context') or [])
+                    + tokenize(request.get('system', '')) + tokenize(request.get('prompt', '')))
+        output = tokenize(" ".join(f"token{i}" for i in range(tokens)))
+
+        # CPU'da tek generation: sıradaki istekler burada bekler
+        with self.server.generation_lock:
+            start = time.perf_counter()
+            # Son isteğin token'larıyla ortak prefix KV cache'ten gelir
+            prompt_tokens = max(1, len(sequence) - common_prefix(self.server.kv_cache, sequence))
+            time.sleep(PREFILL_LATENCY + prompt_tokens * PREFILL_TOKEN_LATENCY)
+            prefill_ns = int((time.perf_counter() - start) * 1e9)
+            self.server.kv_cache = sequence + output
+            context = sequence + output
+
+            if request.get('stream', True):
+                self._stream(tokens, prompt_tokens, prefill_ns, start, context)
+            else:
+                time.sleep(tokens * TOKEN_LATENCY)
+                self._send_json(dict(
+                    self._final(tokens, prompt_tokens, prefill_ns, start, context),
+                    response=" ".join(f"token{i}" for i in range(tokens)) + " (Source 1)",
+                ))
+
+    def _final(self, tokens: int, prompt_tokens: int, prefill_ns: int, start: float,
+               context: list) -> dict:
+        """Ollama'nın son satırındaki sayaçlar ve context"""
+        total_ns = int((time.perf_counter() - start) * 1e9)
+        return {
+            "model": "mock",
+            "response": "",
+            "done": True,
+            "context": context,
+            "total_duration": total_ns,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": prefill_ns,
+            "eval_count": tokens,
+            "eval_duration": total_ns - prefill_ns,
+            "done_reason": "length" if tokens < OUTPUT_TOKENS else "stop",
+        }
+
+    def _stream(self, tokens: int, prompt_tokens: int, prefill_ns: int, start: float, context: list):
+        """Satır başına bir JSON (chunked); client bağlantıyı kapatırsa generation durur"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            for i in range(tokens):
+                time.sleep(TOKEN_LATENCY)
+                self._write_chunk({"model": "mock", "response": f"token{i} ", "done": False})
+            self._write_chunk(self._final(tokens, prompt_tokens, prefill_ns, start, context))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, payload: dict):
+        line = json.dumps(payload).encode('utf-8') + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Her istek için log basma"""
+        pass
+
+
+def start_mock_server(port: int = 0) -> ThreadingHTTPServer:
+    """
+    Tek mock Ollama sunucusunu arka plan thread'inde başlat
+
+    Args:
+        port: 0 = boş bir port seç
+
+    Returns:
+        Server (server.failing = True ile hata verdirilir, server.shutdown() ile durur)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOllamaHandler)
+    server.generation_lock = threading.Lock()
+    server.failing = False
+    server.kv_cache = []
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-ollama").start()
+    return server
+
+
+def start_mock_fleet(count: int) -> List[ThreadingHTTPServer]:
+    """count adet mock Ollama sunucusu başlat"""
+    return [start_mock_server() for _ in range(count)]
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address
+    return f"http://{host}:{port}"
+
+
+def main():
+    """Mock'u ön planda çalıştır (OLLAMA_BASE_URL=http://127.0.0.1:11500)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 11500), MockOllamaHandler)
+    server.generation_lock = threading.Lock()
+    server.failing = False
+    server.kv_cache = []
+    print("🧪 Mock Ollama: http://127.0.0.1:11500/api/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Model router modülü
+Llama generation'ı için küçük/büyük model seçimi: kolay sorular (kısa, tek entity,
+güçlü retrieval) küçük modele, diğerleri 8B modele gider.
+Her tier için latency ve confidence istatistikleri eşikleri ayarlamak için tutulur.
+"""
+
+import threading
+from collections import deque
+from typing import List, Dict, Optional
+import numpy as np # type: ignore
+from query_router import retrieval_features
+from config import config
+
+
+TIERS = ("small", "large")
+
+
+class ModelRouter:
+    """
+    Kural tabanlı zorluk sınıflandırması
+
+    Kolay soru: kelime sayısı SMALL_MODEL_MAX_WORDS'ü geçmez, en fazla bir entity
+    içerir (birden fazla entity genelde karşılaştırma sorusudur) ve ya en iyi chunk'ın
+    similarity'si SMALL_MODEL_MIN_SIMILARITY'nin üstündedir ya da tek bir entity eşleşmiştir.
+
+    MODEL_ROUTING kapalıyken sınıflandırma yine yapılır (loglanır) ama her soru büyük modele gider.
+    """
+
+    def __init__(self, min_similarity: float = None, max_words: int = None, window: int = 500):
+        """
+        Args:
+            min_similarity: Küçük model için en iyi chunk similarity eşiği (None = config)
+            max_words: Küçük model için en fazla kelime (None = config)
+            window: Tier başına tutulan son ölçüm sayısı
+        """
+        self.min_similarity = (min_similarity if min_similarity is not None
+                               else config.SMALL_MODEL_MIN_SIMILARITY)
+        self.max_words = max_words or config.SMALL_MODEL_MAX_WORDS
+        self.models = {"small": config.OLLAMA_SMALL_MODEL, "large": config.OLLAMA_MODEL}
+
+        self._samples = {tier: deque(maxlen=window) for tier in TIERS}
+        self._lock = threading.Lock()
+
+    def classify(self, docs: List, question: str, entity_hits: List[Dict]) -> Dict:
+        """
+        Soru için model seç
+
+        Args:
+            docs: Retrieved chunk'lar
+            question: Kullanıcı sorusu
+            entity_hits: EntityIndex eşleşmeleri
+
+        Returns:
+            {"tier": "small" | "large", "model": ..., "easy": ..., "sim_max": ...,
+             "question_words": ..., "entity_hits": ...}
+        """
+        features = retrieval_features(docs, question)
+        n_entities = len(entity_hits)
+        easy = (
+            features['question_words'] <= self.max_words
+            and n_entities <= 1
+            and (features['sim_max'] >= self.min_similarity or n_entities == 1)
+        )
+        tier = "small" if config.MODEL_ROUTING and easy else "large"
+
+        return {
+            "tier": tier,
+            "model": self.models[tier],
+            "easy": easy,
+            "sim_max": round(features['sim_max'], 4),
+            "question_words": int(features['question_words']),
+            "entity_hits": n_entities,
+        }
+
+    def record(self, tier: str, llama_ms: Optional[float], confidence: Optional[float]):
+        """
+        Tier sonucu
+
+        Args:
+            llama_ms: Generation süresi (cache hit'te None)
+            confidence: Llama cevabının confidence'ı (cevap yoksa None)
+        """
+        with self._lock:
+            self._samples[tier].append((llama_ms, confidence))
+
+    def stats(self) -> Dict:
+        """Tier başına sayı, latency (mean/p50/p95), ortalama confidence ve fallback oranı"""
+        with self._lock:
+            samples = {tier: list(values) for tier, values in self._samples.items()}
+
+        result = {}
+        for tier, values in samples.items():
+            latencies = [ms for ms, _ in values if ms is not None]
+            confidences = [c for _, c in values if c is not None]
+            result[tier] = {
+                "model": self.models[tier],
+                "count": len(values),
+                "latency_ms_mean": round(float(np.mean(latencies)), 1) if latencies else None,
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+                "confidence_mean": round(float(np.mean(confidences)), 3) if confidences else None,
+                # Cevapsız (hata/hedge) ya da eşik altı -> Claude'a düştü
+                "fallback_rate": round(
+                    sum(c is None or c < config.CONFIDENCE_THRESHOLD for _, c in values) / len(values), 3
+                ) if values else None,
+            }
+        return result
+
+
+def main():
+    """Model router test scripti"""
+    router = ModelRouter()
+    examples = [
+        ("What does Prone do?", [{"key": "prone"}], 0.82),
+        ("How does grappling interact with the Prone condition and opportunity attacks?", [], 0.55),
+        ("Compare Fireball and Lightning Bolt", [{"key": "fireball"}, {"key": "lightning bolt"}], 0.75),
+    ]
+    for question, entities, similarity in examples:
+        decision = router.classify([{"similarity": similarity}], question, entities)
+        print(f"{'🟢' if decision['easy'] else '🔴'} {decision['tier']:<5} {question}")
+
+
+if __name__ == "__main__":
+    main()
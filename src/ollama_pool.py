@@ -0,0 +1,208 @@
+"""
+Ollama pool modülü
+Birden fazla Ollama sunucusu arasında yük dağıtımı: en az bekleyen istek,
+sağlık kontrolü, hatalı sunucuyu çıkarma ve iyileşince geri alma
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterator
+import requests
+from resilience import Deadline, DeadlineExceeded, BackendUnavailable
+from config import config
+
+
+class OllamaEndpoint:
+    """Pool'daki tek Ollama sunucusu (alanlar OllamaPool lock'u altında değişir)"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0  # Bu process'ten gönderilip bitmemiş istekler (sunucudaki kuyruk)
+        self.ejected_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_at is None
+
+    def snapshot(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class OllamaPool:
+    """
+    Ollama sunucu pool'u (thread-safe; sync ve async pipeline ortak kullanır)
+
+    Ollama CPU'da aynı anda tek generation'ı iyi yapar, fazlası sunucuda kuyrukta
+    bekler. Bu yüzden her istek en az bekleyen isteği olan sunucuya gider; eşitlikte
+    sırayla dağıtılır.
+
+    Art arda eject_failures hata veren sunucu çıkarılır. Arka plandaki sağlık kontrolü
+    (/api/tags) cevap veren sunucuyu geri alır, cevap vermeyeni trafik beklemeden çıkarır.
+    Sağlık kontrolü kapalıysa çıkarılan sunucu eject_seconds sonra tekrar denenir.
+    """
+
+    def __init__(self, urls: List[str] = None, eject_failures: int = None,
+                 eject_seconds: float = None, health_interval: float = None):
+        """
+        Args:
+            urls: Sunucu URL'leri (None = config.OLLAMA_BASE_URLS)
+            eject_failures: Çıkarmak için art arda hata sayısı (None = config)
+            eject_seconds: Çıkarılan sunucunun tekrar denenmesi için süre (None = config)
+            health_interval: Sağlık kontrolü aralığı, saniye (None = config, 0 = kapalı)
+        """
+        self.endpoints = [OllamaEndpoint(url) for url in (urls or config.OLLAMA_BASE_URLS)]
+        self.eject_failures = eject_failures or config.OLLAMA_EJECT_FAILURES
+        self.eject_seconds = eject_seconds if eject_seconds is not None else config.OLLAMA_EJECT_SECONDS
+        self.health_interval = (health_interval if health_interval is not None
+                                else config.OLLAMA_HEALTH_INTERVAL)
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def acquire(self, prefer: str = None) -> OllamaEndpoint:
+        """
+        İstek için sunucu seç ve bekleyen sayısını artır
+        
+        Args:
+            prefer: Tercih edilen sunucu URL'i (chat oturumunun KV cache'i orada); sağlıklıysa
+                ve en boş sunucudan en fazla bir istek fazlası bekliyorsa o seçilir
+
+        Raises:
+            BackendUnavailable: Sağlıklı (ya da tekrar denenebilir) sunucu yok
+        """
+        now = time.monotonic()
+        with self._lock:
+            count = len(self.endpoints)
+            # Eşitlikte sırayla dağıtmak için her seferinde farklı yerden başla
+            ordered = [self.endpoints[(self._next + i) % count] for i in range(count)]
+            self._next = (self._next + 1) % count
+
+            candidates = [
+                e for e in ordered
+                if e.healthy or now - e.ejected_at >= self.eject_seconds
+            ]
+            if not candidates:
+                raise BackendUnavailable("Sağlıklı Ollama sunucusu yok")
+
+            endpoint = min(candidates, key=lambda e: e.outstanding)
+            preferred = next((e for e in candidates if e.url == prefer and e.healthy), None)
+            if preferred is not None and preferred.outstanding <= endpoint.outstanding + 1:
+                endpoint = preferred
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: OllamaEndpoint, ok: Optional[bool]):
+        """
+        İstek bitti
+
+        Args:
+            ok: True başarılı, False sunucu hatası, None sonuç belirsiz (iptal/deadline)
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                self._mark_healthy(endpoint)
+            elif ok is False:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_failures:
+                    self._eject(endpoint)
+
+    @contextmanager
+    def lease(self, deadline: Deadline = None, prefer: str = None) -> Iterator[OllamaEndpoint]:
+        """
+        acquire/release'i tek blokta yap
+
+        Blok içinde fırlayan hata sunucu hatası sayılır; deadline ve iptal
+        (GeneratorExit, CancelledError) sayılmaz.
+
+        Args:
+            deadline: Verilirse süre dolduktan sonra gelen hata (kısaltılmış timeout) sunucuya yazılmaz
+            prefer: acquire() ile aynı
+        """
+        endpoint = self.acquire(prefer)
+        ok = None
+        try:
+            yield endpoint
+            ok = True
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            if deadline is None or not deadline.expired():
+                ok = False
+            raise
+        finally:
+            self.release(endpoint, ok)
+
+    def _eject(self, endpoint: OllamaEndpoint):
+        """Sunucuyu pool'dan çıkar (lock altında çağrılır)"""
+        if endpoint.healthy:
+            print(f"🔌 Ollama sunucusu pool'dan çıkarıldı: {endpoint.url}")
+        endpoint.ejected_at = time.monotonic()
+
+    def _mark_healthy(self, endpoint: OllamaEndpoint):
+        """Sunucuyu geri al (lock altında çağrılır)"""
+        if not endpoint.healthy:
+            print(f"✅ Ollama sunucusu pool'a geri alındı: {endpoint.url}")
+        endpoint.ejected_at = None
+        endpoint.consecutive_failures = 0
+
+    def check_health(self):
+        """Tüm sunuculara /api/tags gönder; cevap vereni geri al, vermeyeni çıkar"""
+        for endpoint in self.endpoints:
+            try:
+                ok = requests.get(f"{endpoint.url}/api/tags", timeout=3).status_code == 200
+            except Exception:
+                ok = False
+            with self._lock:
+                if ok:
+                    self._mark_healthy(endpoint)
+                else:
+                    self._eject(endpoint)
+
+    def start_health_checks(self):
+        """Sağlık kontrolünü arka plan thread'inde başlat (health_interval 0 ise hiçbir şey yapmaz)"""
+        if self.health_interval <= 0 or self._health_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(self.health_interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, daemon=True, name="ollama-health")
+        self._health_thread.start()
+
+    def stop(self):
+        """Sağlık kontrolünü durdur"""
+        self._stop.set()
+
+    def snapshot(self) -> List[Dict]:
+        """Sunucu durumları (/stats için)"""
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
+
+
+def main():
+    """Pool test scripti: sunucuların durumunu göster"""
+    pool = OllamaPool()
+    pool.check_health()
+    for endpoint in pool.snapshot():
+        status = "✅" if endpoint['healthy'] else "❌"
+        print(f"{status} {endpoint['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Ollama oturum modülü
+Chat oturumu başına Ollama'nın döndürdüğü context'i (konuşmanın token id'leri) saklar.
+Takip sorusu bu context ile gönderilir; Ollama aynı prefix'i KV cache'ten kullanır
+ve sadece yeni token'lar için prefill yapar.
+"""
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from config import config
+
+
+class OllamaSession:
+    """
+    Bir oturumun Llama durumu (store'dan alınan kopya)
+
+    context None ise oturumun ilk turu (ya da sıfırlanmış oturum): system prompt
+    gönderilir ve Ollama'nın döndürdüğü context kaydedilir.
+    """
+
+    __slots__ = ('session_id', 'model', 'context', 'endpoint', 'turns')
+
+    def __init__(self, session_id: str, model: str, context: Optional[List[int]] = None,
+                 endpoint: Optional[str] = None, turns: int = 0):
+        self.session_id = session_id
+        self.model = model
+        self.context = context
+        self.endpoint = endpoint  # KV cache bu sunucuda; pool aynı sunucuyu tercih eder
+        self.turns = turns
+
+
+class OllamaSessionStore:
+    """
+    Oturum context'leri (LRU + TTL, thread-safe)
+
+    Bellek sınırlı: en fazla max_sessions oturum, oturum başına max_context_tokens
+    token (int32 array, token başına 4 byte). Sınırı aşan oturum sıfırdan başlar.
+    """
+
+    def __init__(self, max_sessions: int = None, max_context_tokens: int = None, ttl: float = None):
+        """
+        Args:
+            max_sessions: En fazla oturum sayısı (None = config)
+            max_context_tokens: Oturum başına en fazla context token'ı (None = config)
+            ttl: Kullanılmayan oturumun silinme süresi, saniye (None = config)
+        """
+        self.max_sessions = max_sessions or config.SESSION_MAX
+        self.max_context_tokens = max_context_tokens or config.SESSION_MAX_CONTEXT_TOKENS
+        self.ttl = ttl if ttl is not None else config.SESSION_TTL
+
+        # session_id -> (son kullanım, model, context, endpoint, tur sayısı)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.resets = 0
+
+    def get(self, session_id: str, model: str) -> OllamaSession:
+        """
+        Oturumun durumu; yoksa, süresi dolduysa ya da farklı modelle başladıysa boş oturum
+
+        Context token id'leri modele özgü olduğu için model değişince context kullanılamaz.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return OllamaSession(session_id, model)
+            if time.time() - entry[0] > self.ttl:
+                del self._sessions[session_id]
+                return OllamaSession(session_id, model)
+
+            _, session_model, context, endpoint, turns = entry
+            self._sessions.move_to_end(session_id)
+            if session_model != model:
+                return OllamaSession(session_id, model, turns=turns)
+            return OllamaSession(session_id, model, context.tolist(), endpoint, turns)
+
+    def update(self, session: OllamaSession, context: Optional[List[int]], endpoint: Optional[str]):
+        """
+        Turun sonunda Ollama'nın döndürdüğü context'i kaydet
+
+        Args:
+            session: get() ile alınan oturum
+            context: Son stream satırındaki / cevaptaki context (None = kaydetme)
+            endpoint: Cevabı üreten Ollama sunucusu
+        """
+        if not context:
+            return
+
+        with self._lock:
+            if len(context) > self.max_context_tokens:
+                # num_ctx'e sığmayacak; bir sonraki tur sıfırdan (system prompt ile) başlar
+                self._sessions.pop(session.session_id, None)
+                self.resets += 1
+                return
+
+            self._sessions[session.session_id] = (
+                time.time(), session.model, array('i', context), endpoint, session.turns + 1
+            )
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, session_id: str):
+        """Oturumu sil (kullanıcı sohbeti temizledi)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        """Oturum sayısı, toplam context token'ı ve atılan oturumlar"""
+        with self._lock:
+            tokens = sum(len(entry[2]) for entry in self._sessions.values())
+            return {
+                "sessions": len(self._sessions),
+                "context_tokens": tokens,
+                "context_bytes": tokens * array('i').itemsize,
+                "evictions": self.evictions,
+                "resets": self.resets,
+            }
+
+
+def main():
+    """Session store test scripti"""
+    store = OllamaSessionStore(max_sessions=2, max_context_tokens=10)
+
+    session = store.get("a", "llama")
+    store.update(session, [1, 2, 3], "http://localhost:11434")
+    session = store.get("a", "llama")
+    print(f"Tur {session.turns}: context={session.context} @ {session.endpoint}")
+
+    store.update(store.get("b", "llama"), [4], None)
+    store.update(store.get("c", "llama"), [5], None)
+    print(f"LRU sonrası 'a' context: {store.get('a', 'llama').context}")
+    print(f"Stats: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
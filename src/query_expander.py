@@ -0,0 +1,160 @@
+"""
+Query expansion modülü
+Bileşik soruları alt sorgulara böler, kısaltmaları açar ve sıralamaları birleştirir
+"""
+
+import re
+from typing import List, Dict
+
+
+class QueryExpander:
+    """Kural tabanlı (LLM'siz) query genişletme"""
+
+    # D&D kısaltmaları -> açık hali (paraphrase için)
+    ABBREVIATIONS = {
+        "ac": "armor class",
+        "hp": "hit points",
+        "dc": "difficulty class",
+        "xp": "experience points",
+        "aoo": "opportunity attack",
+        "dm": "dungeon master",
+        "pc": "player character",
+        "npc": "non-player character",
+        "str": "strength",
+        "dex": "dexterity",
+        "con": "constitution",
+        "int": "intelligence",
+        "wis": "wisdom",
+        "cha": "charisma",
+        "adv": "advantage",
+        "disadv": "disadvantage",
+    }
+
+    LEAD_PHRASE = re.compile(
+        r"^(?:compare|contrast|explain|describe|"
+        r"what(?:'s| is| are) the differences? between|differences? between)\s+",
+        re.IGNORECASE
+    )
+    SPLIT = re.compile(r"\s*(?:,|;|\band\b|\bvs\.?\b|\bversus\b|\bor\b)\s*", re.IGNORECASE)
+    RELATION = re.compile(
+        r"^(?:how|what|when)\s+(?:do|does|did|can)?\s*(?:they|it|these|those|both|each)\s+"
+        r"(?:interact|work|relate|combine|apply|stack)\s+(?:with|to)\s+(.+)$",
+        re.IGNORECASE
+    )
+    WORD = re.compile(r"\b\w+\b")
+
+    def __init__(self, max_queries: int = 5):
+        """
+        Args:
+            max_queries: Orijinal soru dahil en fazla kaç sorgu üretilsin
+        """
+        self.max_queries = max_queries
+
+    def expand_abbreviations(self, query: str) -> str:
+        """Kısaltmaları açık haliyle değiştir (AC -> armor class)"""
+        return self.WORD.sub(
+            lambda m: self.ABBREVIATIONS.get(m.group(0).lower(), m.group(0)),
+            query
+        )
+
+    def decompose(self, query: str) -> List[str]:
+        """
+        Bileşik soruyu alt sorgulara böl
+
+        "compare grapple and shove and how they interact with prone"
+        -> ["grapple", "shove", "grapple prone", "shove prone"]
+        """
+        text = self.LEAD_PHRASE.sub("", query.strip().rstrip("?.! "))
+        parts = [p.strip() for p in self.SPLIT.split(text) if p and len(p.strip()) >= 3]
+
+        if len(parts) < 2:
+            return []
+
+        entities = []
+        targets = []
+        for part in parts:
+            relation = self.RELATION.match(part)
+            if relation:
+                targets.append(relation.group(1).strip())
+            else:
+                entities.append(part)
+
+        sub_queries = list(entities)
+        for target in targets:
+            sub_queries.extend(f"{entity} {target}" for entity in entities)
+            if not entities:
+                sub_queries.append(target)
+
+        return sub_queries
+
+    def expand(self, query: str) -> List[str]:
+        """
+        Query'den arama sorguları üret
+
+        Returns:
+            İlk eleman her zaman orijinal soru; tekrarlar atılır
+        """
+        candidates = [query, self.expand_abbreviations(query)]
+        candidates.extend(self.decompose(query))
+
+        queries = []
+        seen = set()
+        for candidate in candidates:
+            key = candidate.lower().strip()
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(candidate)
+
+        return queries[:self.max_queries]
+
+
+def fuse_rankings(result_lists: List[List[Dict]], rrf_k: int = 60) -> List[Dict]:
+    """
+    Birden fazla sorgunun sonuçlarını Reciprocal Rank Fusion ile birleştir
+
+    Aynı chunk birden fazla listede varsa en yüksek similarity'si korunur.
+
+    Args:
+        result_lists: Her sorgu için sıralı document listesi
+        rrf_k: RRF sabiti (büyük = alt sıralara daha çok ağırlık)
+
+    Returns:
+        'fusion_score'a göre sıralı tekil document'lar
+    """
+    fused: Dict[str, Dict] = {}
+
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            entry = fused.get(doc['id'])
+            if entry is None:
+                entry = doc.copy()
+                entry['fusion_score'] = 0.0
+                fused[doc['id']] = entry
+            elif (doc.get('similarity') or 0.0) > (entry.get('similarity') or 0.0):
+                entry['similarity'] = doc.get('similarity')
+                entry['distance'] = doc.get('distance')
+
+            entry['fusion_score'] += 1.0 / (rrf_k + rank + 1)
+
+    return sorted(fused.values(), key=lambda d: d['fusion_score'], reverse=True)
+
+
+def main():
+    """Query expansion test scripti"""
+    expander = QueryExpander()
+
+    test_queries = [
+        "compare grapple and shove and how they interact with prone",
+        "How do I calculate my AC?",
+        "What is the difference between a spell attack and a saving throw spell?",
+        "What is a saving throw?",
+    ]
+
+    for query in test_queries:
+        print(f"\n🔍 {query}")
+        for sub_query in expander.expand(query):
+            print(f"   -> {sub_query}")
+
+
+if __name__ == "__main__":
+    main()
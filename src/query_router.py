@@ -0,0 +1,333 @@
+"""
+Query router modülü
+Llama cevap üretmeden önce, retrieval skorlarından fallback olasılığını tahmin eder.
+Olasılık yüksekse Llama atlanır, direkt Claude + web yoluna gidilir.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Optional
+import numpy as np # type: ignore
+from config import config
+
+
+FEATURE_NAMES = [
+    "sim_max", "sim_mean", "sim_min", "sim_std", "sim_gap", "frac_above_05",
+    "n_docs", "question_words",
+]
+
+
+def retrieval_features(docs: List, question: str) -> Dict[str, float]:
+    """
+    Context'e giren chunk'ların similarity istatistikleri
+
+    Args:
+        docs: Retrieved chunk'lar (similarity alanı olan)
+        question: Kullanıcı sorusu
+
+    Returns:
+        FEATURE_NAMES sırasıyla feature dict'i
+    """
+    sims = sorted((d.get('similarity', 0.0) for d in docs), reverse=True)
+    if not sims:
+        sims = [0.0]
+
+    return {
+        "sim_max": sims[0],
+        "sim_mean": float(np.mean(sims)),
+        "sim_min": sims[-1],
+        "sim_std": float(np.std(sims)),
+        "sim_gap": sims[0] - sims[1] if len(sims) > 1 else 0.0,
+        "frac_above_05": sum(1 for s in sims if s > 0.5) / len(sims),
+        "n_docs": float(len(docs)),
+        "question_words": float(len(question.split())),
+    }
+
+
+class QueryRouter:
+    """
+    Logistic regression: P(Llama cevabı confidence eşiğinin altında kalır | retrieval)
+
+    Model query log'undan eğitilir (label: Llama çalıştı ve confidence < CONFIDENCE_THRESHOLD).
+    Eğitilmiş model yoksa router pasiftir, her soru Llama'ya gider.
+    """
+
+    def __init__(self, model_path: Optional[Path] = None, threshold: float = None):
+        """
+        Args:
+            model_path: Model JSON dosyası (varsayılan: config.ROUTER_MODEL_PATH)
+            threshold: Bu olasılığın üstünde Llama atlanır (varsayılan: config)
+        """
+        self.model_path = Path(model_path or config.ROUTER_MODEL_PATH)
+        self.threshold = threshold if threshold is not None else config.ROUTER_THRESHOLD
+        self.model: Optional[Dict] = None
+        self._load()
+
+    def _load(self):
+        """Eğitilmiş modeli yükle"""
+        if self.model_path.exists():
+            with open(self.model_path, 'r', encoding='utf-8') as f:
+                self.model = json.load(f)
+
+    @property
+    def trained(self) -> bool:
+        return self.model is not None
+
+    def save(self):
+        """Modeli diske kaydet"""
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.model_path, 'w', encoding='utf-8') as f:
+            json.dump(self.model, f, indent=2)
+
+    def predict(self, features: Dict[str, float]) -> Optional[float]:
+        """
+        Fallback olasılığı
+
+        Returns:
+            0-1 arası olasılık, model yoksa None
+        """
+        if self.model is None:
+            return None
+        x = np.array([features[name] for name in FEATURE_NAMES])
+        z = (x - np.array(self.model['mean'])) / np.array(self.model['std'])
+        logit = float(z @ np.array(self.model['weights']) + self.model['bias'])
+        return 1.0 / (1.0 + np.exp(-logit))
+
+    def route(self, docs: List, question: str) -> Dict:
+        """
+        Generation öncesi yol kararı
+
+        Returns:
+            {"decision": "llama" | "claude", "fallback_probability": ..., "features": ...}
+        """
+        features = retrieval_features(docs, question)
+        probability = self.predict(features)
+        decision = "claude" if probability is not None and probability >= self.threshold else "llama"
+        return {
+            "decision": decision,
+            "fallback_probability": round(probability, 4) if probability is not None else None,
+            "features": features,
+        }
+
+    def fit(self, entries: List[Dict], l2: float = 0.01, epochs: int = 2000, lr: float = 0.1) -> "QueryRouter":
+        """
+        Query log kayıtlarından logistic regression eğit (batch gradient descent)
+
+        Sadece Llama'nın çalıştığı kayıtlar label taşır; router'ın Claude'a
+        yönlendirdiği sorular eğitimde kullanılamaz.
+
+        Args:
+            entries: labeled_entries() çıktısı
+            l2: L2 regularization katsayısı
+        """
+        X = np.array([[e['features'][name] for name in FEATURE_NAMES] for e in entries])
+        y = np.array([1.0 if e['fell_back'] else 0.0 for e in entries])
+
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        std[std == 0] = 1.0
+        Z = (X - mean) / std
+
+        weights = np.zeros(Z.shape[1])
+        bias = 0.0
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(Z @ weights + bias)))
+            weights -= lr * (Z.T @ (p - y) / len(y) + l2 * weights)
+            bias -= lr * float(np.mean(p - y))
+
+        self.model = {
+            "features": FEATURE_NAMES,
+            "mean": mean.tolist(),
+            "std": std.tolist(),
+            "weights": weights.tolist(),
+            "bias": bias,
+            "trained_on": len(entries),
+            "confidence_threshold": config.CONFIDENCE_THRESHOLD,
+        }
+        return self
+
+
+class QueryLog:
+    """
+    Her query'nin route kararı, retrieval feature'ları ve sonucu (JSONL)
+
+    Router eğitimi ve replay raporu bu dosyadan yapılır. Dosya max_bytes'ı geçince
+    '<ad>.1'e taşınır (tek yedek), yani disk kullanımı en fazla ~2 x max_bytes.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = None):
+        """
+        Args:
+            path: Log dosyası (None = config)
+            max_bytes: Döndürme sınırı (None = config.QUERY_LOG_MAX_MB)
+        """
+        self.path = Path(path or config.QUERY_LOG_PATH)
+        self.rotated_path = self.path.with_name(self.path.name + ".1")
+        self.max_bytes = max_bytes or int(config.QUERY_LOG_MAX_MB * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def record(self, result: Dict):
+        """
+        query() sonucunu logla
+
+        Route kararı olmayan sonuçlar (entity fast path, USE_OLLAMA=false) da yazılır;
+        features/route None olur ve Llama çalışmadığı için eğitime girmezler.
+        """
+        diagnostics = result.get('diagnostics') or {}
+        route = diagnostics.get('route') or {}
+
+        entry = {
+            "ts": time.time(),
+            "question": result['question'],
+            "features": route.get('features'),
+            "route": route.get('decision'),
+            "fallback_probability": route.get('fallback_probability'),
+            "method_used": result['method_used'],
+            "llama_confidence": diagnostics.get('llama_confidence'),
+            "llama_ms": diagnostics.get('llama_ms'),
+            "llama_eval_count": diagnostics.get('llama_eval_count'),
+            "claude_ms": diagnostics.get('claude_ms'),
+            # Model tier eşiklerini ayarlamak için (tier, kolay mı, feature'lar model_tier'da)
+            "model_tier": diagnostics.get('model_tier'),
+        }
+
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+                os.replace(self.path, self.rotated_path)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def load(self) -> List[Dict]:
+        """Tüm kayıtlar, döndürülmüş dosya dahil (eski sırayla)"""
+        entries = []
+        for path in (self.rotated_path, self.path):
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries.extend(json.loads(line) for line in f if line.strip())
+        return entries
+
+    def labeled_entries(self) -> List[Dict]:
+        """Llama'nın çalıştığı kayıtlar + fell_back label'ı"""
+        entries = []
+        for entry in self.load():
+            if entry.get('llama_confidence') is None or entry.get('features') is None:
+                continue
+            entries.append(dict(entry, fell_back=entry['llama_confidence'] < config.CONFIDENCE_THRESHOLD))
+        return entries
+
+
+def replay_report(log: QueryLog, threshold: float = None, train_fraction: float = 0.7) -> Optional[Dict]:
+    """
+    Query log'u üzerinde router'ı tekrar oynat
+
+    Kayıtlar zaman sırasıyla bölünür: ilk kısım ile eğitilir, kalan kısımda
+    router'ın kararları gerçek sonuçlarla karşılaştırılır.
+
+    Kazanç: doğru yönlendirilen sorularda atlanan Llama süresi ve üretilen token'lar.
+    Maliyet: Llama cevabı yeterli olduğu halde Claude'a giden sorular
+    (Claude süresi, log'daki fallback'lerin medyan Claude süresiyle tahmin edilir).
+
+    Returns:
+        Rapor dict'i, yeterli kayıt yoksa None
+    """
+    entries = log.labeled_entries()
+    split = int(len(entries) * train_fraction)
+    train, test = entries[:split], entries[split:]
+
+    if len(train) < 10 or not test or len({e['fell_back'] for e in train}) < 2:
+        print(f"❌ Yeterli kayıt yok ({len(entries)} labeled, iki sınıf da gerekli)")
+        return None
+
+    router = QueryRouter(model_path=log.path.with_suffix(".replay.json"), threshold=threshold).fit(train)
+
+    claude_times = [e['claude_ms'] for e in entries if e['fell_back'] and e.get('claude_ms')]
+    claude_ms_est = float(np.median(claude_times)) if claude_times else 0.0
+
+    saved_ms, saved_tokens, extra_ms = 0.0, 0, 0.0
+    routed_correct, routed_wrong, missed = 0, 0, 0
+    brier = []
+
+    for entry in test:
+        probability = router.predict(entry['features'])
+        brier.append((probability - float(entry['fell_back'])) ** 2)
+
+        if probability < router.threshold:
+            missed += int(entry['fell_back'])
+            continue
+
+        if entry['fell_back']:
+            routed_correct += 1
+            saved_ms += entry.get('llama_ms') or 0.0
+            saved_tokens += entry.get('llama_eval_count') or 0
+        else:
+            routed_wrong += 1
+            extra_ms += claude_ms_est - (entry.get('llama_ms') or 0.0)
+
+    fallbacks = sum(1 for e in test if e['fell_back'])
+    return {
+        "train": len(train),
+        "test": len(test),
+        "threshold": router.threshold,
+        "fallback_rate": fallbacks / len(test),
+        "routed": routed_correct + routed_wrong,
+        "routed_correct": routed_correct,
+        "routed_wrong": routed_wrong,
+        "missed_fallbacks": missed,
+        "brier": float(np.mean(brier)),
+        "llama_ms_saved": saved_ms,
+        "llama_tokens_saved": saved_tokens,
+        "extra_claude_ms": extra_ms,
+        "net_ms_saved_per_query": (saved_ms - extra_ms) / len(test),
+    }
+
+
+def main():
+    """
+    Router eğitimi ve replay raporu
+
+    python query_router.py train  -> tüm log ile eğit, modeli kaydet
+    python query_router.py report -> zaman sıralı replay raporu
+    """
+    import sys
+
+    log = QueryLog()
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+
+    if command == "train":
+        entries = log.labeled_entries()
+        if len(entries) < 10 or len({e['fell_back'] for e in entries}) < 2:
+            print(f"❌ Yeterli kayıt yok ({len(entries)} labeled, iki sınıf da gerekli)")
+            return
+        router = QueryRouter().fit(entries)
+        router.save()
+        print(f"✅ Router {len(entries)} kayıtla eğitildi: {router.model_path}")
+        for name, weight in zip(FEATURE_NAMES, router.model['weights']):
+            print(f"   {name:<16} {weight:+.3f}")
+        return
+
+    report = replay_report(log)
+    if report is None:
+        return
+
+    print("\n" + "="*60)
+    print(f"ROUTER REPLAY (train={report['train']}, test={report['test']}, "
+          f"eşik={report['threshold']:.2f})")
+    print("="*60)
+    print(f"Fallback oranı:           {report['fallback_rate']:.1%}")
+    print(f"Claude'a yönlendirilen:   {report['routed']} "
+          f"(doğru {report['routed_correct']}, gereksiz {report['routed_wrong']})")
+    print(f"Kaçırılan fallback:       {report['missed_fallbacks']}")
+    print(f"Brier skoru:              {report['brier']:.3f}")
+    print(f"Atlanan Llama süresi:     {report['llama_ms_saved'] / 1000:.1f} s "
+          f"({report['llama_tokens_saved']} token)")
+    print(f"Gereksiz Claude maliyeti: {report['extra_claude_ms'] / 1000:.1f} s")
+    print(f"Net kazanç / soru:        {report['net_ms_saved_per_query']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from vector_db import VectorDB
 from embedder import Embedder
 import requests
 from anthropic import Anthropic
+from grounding import GroundingScorer
 from config import config
 
 
@@ -28,6 +29,9 @@ class RAGPipeline:
         if not use_local_llm:
             self.claude_client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
         
+        # GROUNDING_CONFIDENCE açıksa confidence buradan
+        self.grounding_scorer = GroundingScorer()
+        
         print(f"✅ RAG Pipeline hazır! LLM: {'Llama (Local)' if use_local_llm else 'Claude API'}")
     
     def retrieve_context(self, query: str, top_k: int = 5) -> List[Dict]:
@@ -160,7 +164,7 @@ Provide a clear, accurate answer with source citations in the format (Source X:
             top_k: Kaç context chunk kullanılsın (✅ Default 5'e çıkarıldı)
             
         Returns:
-            Dict with 'answer', 'sources', 'context'
+            Dict with 'answer', 'sources', 'context', 'confidence'
         """
         print("\n" + "="*60)
         print(f"📝 Soru: {user_question}")
@@ -193,7 +197,9 @@ Provide a clear, accurate answer with source citations in the format (Source X:
                 }
                 for doc in retrieved_docs
             ],
-            "context_used": context
+            "context_used": context,
+            # Grounding confidence cevabı chunk'ların tamamıyla karşılaştırır (sources'ta sadece önizleme var)
+            "confidence": self.calculate_confidence(answer, retrieved_docs)
         }
         
         return result
@@ -204,11 +210,17 @@ Provide a clear, accurate answer with source citations in the format (Source X:
         
         Args:
             answer: LLM'in cevabı
-            sources: Kullanılan kaynaklar (similarity skorları için)
+            sources: Kullanılan chunk'lar (similarity skorları için; GROUNDING_CONFIDENCE açıksa
+                cevap 'text' ya da yoksa 'text_preview' ile karşılaştırılır - query() retrieval
+                sonuçlarını tam metinleriyle verir)
         
         Returns:
             0.0 - 1.0 arası confidence score
         """
+        if config.GROUNDING_CONFIDENCE and sources:
+            texts = [s.get('text') or s.get('text_preview', '') for s in sources]
+            return self.grounding_scorer.score(answer, texts)['confidence']
+        
         confidence = 1.0  # Başlangıç: yüksek confidence
         
         # 1. Düşük confidence ifadeleri (ağırlık: -0.6)
@@ -299,7 +311,7 @@ def main():
             print(f"   Önizleme: {source['text_preview']}...")
         
         # ✅ İyileştirilmiş confidence calculation
-        confidence = rag.calculate_confidence(result['answer'], result['sources'])
+        confidence = result['confidence']
         print(f"\n📊 Confidence Score: {confidence:.2f}")
         
         if confidence < config.CONFIDENCE_THRESHOLD:
@@ -0,0 +1,532 @@
+"""
+Async RAG Pipeline
+HybridRAGPipeline ile aynı akış; event loop'u bloklamadan çalışır (FastAPI için)
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Optional, AsyncIterator
+import httpx # type: ignore
+from anthropic import AsyncAnthropic
+from rag_pipeline_hybrid import HybridRAGPipeline
+from ollama_sessions import OllamaSession
+from single_flight import AsyncSingleFlight
+from resilience import (Deadline, DeadlineExceeded, BackendUnavailable, CircuitBreaker, call_timeout,
+                        make_deadline, check_deadline, deadline_expired, wait_timeout)
+from config import config
+
+
+class AsyncHybridRAGPipeline(HybridRAGPipeline):
+    """
+    HybridRAGPipeline'ın async hali
+
+    - Ollama ve web scraping: paylaşılan httpx.AsyncClient (connection pool)
+    - Claude: AsyncAnthropic
+    - Embedding, Chroma araması, context packing: boyutu sınırlı thread pool
+
+    Retrieval/prompt/sonuç formatı parent sınıftaki metodlarla ortaktır.
+    """
+
+    def __init__(self, cpu_workers: int = None):
+        """
+        Args:
+            cpu_workers: CPU işleri için thread sayısı (None = config)
+        """
+        super().__init__()
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=cpu_workers or config.ASYNC_CPU_WORKERS,
+            thread_name_prefix="rag-cpu"
+        )
+
+        # API istekleri aynı event loop'ta; aynı anda gelen aynı sorgular tek task'ı bekler
+        self.async_single_flight = AsyncSingleFlight()
+
+        # Client'lar event loop'a bağlı olduğu için ilk kullanımda oluşturulur
+        self._http: Optional[httpx.AsyncClient] = None
+        self._claude: Optional[AsyncAnthropic] = None
+
+        print("⚡ Async pipeline hazır")
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Ollama ve web için paylaşılan async HTTP client"""
+        if self._http is None:
+            limits = httpx.Limits(
+                max_connections=config.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.ASYNC_HTTP_MAX_CONNECTIONS
+            )
+            self._http = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(300.0))
+        return self._http
+
+    @property
+    def async_claude(self) -> AsyncAnthropic:
+        """Async Claude client"""
+        if self._claude is None:
+            self._claude = AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+        return self._claude
+
+    def log_query(self, result: Dict) -> Dict:
+        """Query log'u executor'da arka planda yaz (dosya I/O event loop'u bloklamasın)"""
+        if config.LOG_QUERIES:
+            self.executor.submit(super().log_query, result)
+        return result
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        """Bloklayan/CPU ağırlıklı fonksiyonu thread pool'da çalıştır"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def agenerate_with_llama(self, query: str, context: str, stats: Dict = None,
+                                   chunk_ids: List[str] = None, deadline: Deadline = None,
+                                   model: str = None, session: OllamaSession = None) -> str:
+        """
+        generate_with_llama'nın async hali
+
+        Ollama'dan stream olarak okunur: istek iptal edilirse (client gitti) bağlantı
+        hemen kapanır, Ollama generation'ı durdurur ve o ana kadarki token'lar
+        wasted_compute'a yazılır.
+        """
+        parts = []
+        async for token in self.astream_with_llama(query, context, stats=stats, chunk_ids=chunk_ids,
+                                                    deadline=deadline, model=model, session=session):
+            parts.append(token)
+        return "".join(parts)
+
+    async def astream_with_llama(self, query: str, context: str, stats: Dict = None,
+                                 chunk_ids: List[str] = None, deadline: Deadline = None,
+                                 model: str = None, session: OllamaSession = None) -> AsyncIterator[str]:
+        """stream_with_llama'nın async hali (httpx stream)"""
+        budget = self.generation_budgets.budget(query)
+        prompt = self.build_llama_prompt(query, context, budget['hint'])
+        request = self.build_llama_request(prompt, stream=True, model=model,
+                                           context=session.context if session else None, budget=budget)
+        cache_key = self.llama_cache_key(query, request, None if session else chunk_ids)
+
+        cached = self.cached_generation(cache_key, "llama", stats)
+        if cached is not None:
+            yield cached
+            return
+
+        print("🦙 Llama ile cevap stream ediliyor (async)...")
+        start = time.perf_counter()
+        parts = []
+        timeout = call_timeout(deadline, config.LLAMA_TIMEOUT, "llama")
+        prefer = session.endpoint if session else None
+        try:
+            # lease sadece sayaç günceller, event loop'u bloklamaz
+            with self.ollama_pool.lease(deadline, prefer) as endpoint:
+                self.record_llama_endpoint(endpoint.url, stats)
+                async with self.http.stream("POST", f"{endpoint.url}/api/generate",
+                                            json=request, timeout=timeout) as response:
+                    if response.status_code != 200:
+                        raise Exception(f"Ollama hatası: {response.status_code}")
+
+                    async for line in response.aiter_lines():
+                        if deadline is not None:
+                            deadline.check("llama")
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get('error'):
+                            raise Exception(f"Ollama hatası: {chunk['error']}")
+                        if chunk.get('response'):
+                            if not parts:
+                                self.observe_llama_ttft((time.perf_counter() - start) * 1000, stats)
+                            parts.append(chunk['response'])
+                            yield chunk['response']
+                        if chunk.get('done'):
+                            self.record_llama_stats(prompt, chunk, stats, session, budget)
+                            self.generation_cache.set(cache_key, "".join(parts))
+                            break
+        except (asyncio.CancelledError, GeneratorExit):
+            # Task iptal edildi ya da tüketici vazgeçti: httpx bağlantıyı kapatır
+            self.record_discarded_generation("llama", parts, start)
+            raise
+
+    async def agenerate_llama_hedged(self, user_question: str, context: str, diagnostics: Dict,
+                                     chunk_ids: Optional[List[str]], deadline: Deadline,
+                                     model: str = None, session: OllamaSession = None) -> Optional[str]:
+        """
+        generate_llama_hedged'in async hali
+
+        İlk token cutoff'ta gelmezse Llama task'ı iptal edilir (httpx bağlantıyı kapatır,
+        Ollama generation'ı durdurur).
+        """
+        cutoff_ms = self.hedge_cutoff_ms()
+        first_token = asyncio.Event()
+        llama_stats = {}
+
+        async def collect() -> str:
+            parts = []
+            async for token in self.astream_with_llama(user_question, context, stats=llama_stats,
+                                                        chunk_ids=chunk_ids, deadline=deadline,
+                                                        model=model, session=session):
+                parts.append(token)
+                first_token.set()
+            return "".join(parts)
+
+        task = asyncio.create_task(collect())
+        waiter = asyncio.ensure_future(first_token.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {task, waiter}, timeout=wait_timeout(deadline, cutoff_ms / 1000),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                task.cancel()
+                check_deadline(deadline, "llama")
+                print(f"⏱️ Llama {cutoff_ms:.0f} ms içinde ilk token'ı üretmedi - Claude'a geçiliyor")
+                self.record_decision(diagnostics, type="hedge", backend="llama", triggered=True,
+                                     cutoff_ms=round(cutoff_ms, 1))
+                return None
+
+            self.record_decision(diagnostics, type="hedge", backend="llama", triggered=False,
+                                 cutoff_ms=round(cutoff_ms, 1))
+            try:
+                answer = await asyncio.wait_for(task, timeout=wait_timeout(deadline))
+            except asyncio.TimeoutError:
+                check_deadline(deadline, "llama")
+                raise
+        finally:
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+
+        self.merge_llama_stats(diagnostics, llama_stats)
+        return answer
+
+    async def agenerate_with_claude(self, query: str, context: str, web_context: str = None,
+                                    stats: Dict = None, chunk_ids: List[str] = None,
+                                    deadline: Deadline = None) -> str:
+        """generate_with_claude'un async hali"""
+        budget = self.generation_budgets.budget(query)
+        request = self.build_claude_request(query, context, web_context, budget)
+        cache_key = self.claude_cache_key(query, request, chunk_ids, web_context)
+
+        cached = self.cached_generation(cache_key, "claude", stats)
+        if cached is not None:
+            return cached
+
+        print("☁️ Claude ile cevap üretiliyor (async)...")
+        start = time.perf_counter()
+        try:
+            message = await self.async_claude.messages.create(
+                **request, timeout=call_timeout(deadline, config.CLAUDE_TIMEOUT, "claude")
+            )
+        except asyncio.CancelledError:
+            self.record_discarded_generation("claude", [], start)
+            raise
+
+        self.record_claude_usage(message.usage, stats, start)
+        self.record_claude_budget(budget, message, start, stats)
+        self.generation_cache.set(cache_key, message.content[0].text)
+        return message.content[0].text
+
+    async def asearch_web(self, user_question: str):
+        """
+        Web araması (async)
+
+        Returns:
+            (web sonuçları, formatlı web context'i)
+        """
+        try:
+            web_results = await self.web_scraper.asearch_dnd_content(
+                user_question, self.http, max_results=3, executor=self.executor
+            )
+        except asyncio.CancelledError:
+            self.wasted_compute.add(web_aborted=1)
+            raise
+        return web_results, self.web_scraper.format_web_results(web_results)
+    
+    def astart_web_prefetch(self, user_question: str, retrieved_docs, diagnostics: Dict = None):
+        """
+        start_web_prefetch'in async hali (asyncio task)
+        
+        Returns:
+            Web araması task'ı ya da None (spekülasyon yapılmadı)
+        """
+        if not config.SPECULATIVE_WEB or not self.fallback_likely(retrieved_docs):
+            return None
+        
+        print("🔮 Fallback muhtemel - web araması arka planda başlatıldı")
+        if diagnostics is not None:
+            diagnostics['web_prefetch'] = "started"
+        return asyncio.create_task(self.asearch_web(user_question))
+    
+    async def acollect_web_results(self, user_question: str, prefetch=None, diagnostics: Dict = None,
+                                   deadline: Deadline = None):
+        """collect_web_results'ın async hali (deadline varsa web'e kalan sürenin yarısı)"""
+        start = time.perf_counter()
+        web = None
+        speculative = prefetch is not None and diagnostics is not None \
+            and diagnostics.get('web_prefetch') == "started"
+        
+        if prefetch is None and deadline is not None:
+            prefetch = asyncio.create_task(self.asearch_web(user_question))
+        
+        if prefetch is not None:
+            timeout = max(deadline.remaining() / 2, 0) if deadline is not None else None
+            try:
+                web = await asyncio.wait_for(prefetch, timeout=timeout)
+                if speculative:
+                    diagnostics['web_prefetch'] = "used"
+            except asyncio.TimeoutError:
+                print(f"⏱️ Web araması {timeout:.1f} sn içinde bitmedi - web atlanıyor")
+                web = [], self.web_scraper.format_web_results([])
+                if diagnostics is not None:
+                    self.record_decision(diagnostics, type="deadline", stage="web",
+                                         action="skipped", waited_ms=round(timeout * 1000, 1))
+            except Exception as e:
+                print(f"⚠️ Spekülatif web araması başarısız: {e}")
+        
+        if web is None:
+            web = await self.asearch_web(user_question)
+        
+        if diagnostics is not None:
+            diagnostics['web_wait_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return web
+    
+    def adiscard_web_prefetch(self, prefetch, diagnostics: Dict = None):
+        """
+        Fallback olmadı: spekülatif aramayı iptal et
+        
+        Sync yolun aksine async istek yarıda kesilebilir; bitmişse sonuç zaten cache'te.
+        """
+        if prefetch is None:
+            return
+        cancelled = prefetch.cancel()
+        if diagnostics is not None:
+            diagnostics['web_prefetch'] = "cancelled" if cancelled else "cached"
+
+    async def aguarded_call(self, breaker: CircuitBreaker, coro_fn, diagnostics: Dict,
+                            deadline: Deadline):
+        """guarded_call'ın async hali (coro_fn: coroutine döndüren fonksiyon)"""
+        if not self.backend_allowed(breaker, diagnostics):
+            return None
+        try:
+            result = await coro_fn()
+        except (DeadlineExceeded, asyncio.CancelledError):
+            breaker.release()
+            raise
+        except Exception as e:
+            if deadline_expired(deadline):
+                breaker.release()
+                raise DeadlineExceeded(f"Deadline ({deadline.seconds:.0f} sn) '{breaker.name}' adımında doldu") from e
+            self.backend_failed(breaker, e, diagnostics)
+            return None
+
+        if result is None:
+            breaker.release()
+        else:
+            breaker.record_success()
+        return result
+
+    async def acall_llama(self, user_question: str, context: str, diagnostics: Dict,
+                          chunk_ids: Optional[List[str]], deadline: Deadline,
+                          model: str = None, session: OllamaSession = None) -> Optional[str]:
+        """call_llama'nın async hali"""
+        if config.HEDGE_TO_CLAUDE and self.claude_breaker.state == "closed":
+            coro_fn = lambda: self.agenerate_llama_hedged(user_question, context, diagnostics,
+                                                          chunk_ids, deadline, model, session)
+        else:
+            coro_fn = lambda: self.agenerate_with_llama(user_question, context, stats=diagnostics,
+                                                        chunk_ids=chunk_ids, deadline=deadline,
+                                                        model=model, session=session)
+        return await self.aguarded_call(self.llama_breaker, coro_fn, diagnostics, deadline)
+
+    async def acall_claude(self, user_question: str, context: str, web_context: str, diagnostics: Dict,
+                           chunk_ids: Optional[List[str]], deadline: Deadline) -> Optional[str]:
+        """call_claude'un async hali"""
+        return await self.aguarded_call(
+            self.claude_breaker,
+            lambda: self.agenerate_with_claude(user_question, context, web_context, stats=diagnostics,
+                                               chunk_ids=chunk_ids, deadline=deadline),
+            diagnostics, deadline
+        )
+
+    async def afallback_to_claude(self, user_question: str, context: str, retrieved_docs,
+                                  diagnostics: Dict, chunk_ids: Optional[List[str]], deadline: Deadline,
+                                  web_prefetch=None, llama_answer: str = None,
+                                  llama_confidence: float = None) -> Dict:
+        """fallback_to_claude'un async hali"""
+        web_results, web_context = await self.acollect_web_results(
+            user_question, web_prefetch, diagnostics, deadline
+        )
+
+        try:
+            claude_answer = await self.acall_claude(
+                user_question, context, web_context, diagnostics, chunk_ids, deadline
+            )
+        except DeadlineExceeded:
+            if llama_answer is None:
+                raise
+            self.record_decision(diagnostics, type="deadline", stage="claude", action="skipped")
+            claude_answer = None
+
+        if claude_answer is None:
+            if llama_answer is None:
+                raise BackendUnavailable("Llama ve Claude cevap üretemedi")
+            print("⚠️ Claude kullanılamadı - Llama cevabı döndürülüyor")
+            self.record_decision(diagnostics, type="fallback", backend="claude", action="kept_llama")
+            return self.build_result(
+                user_question, llama_answer, llama_confidence, retrieved_docs,
+                "llama", diagnostics
+            )
+
+        if llama_confidence is None:
+            llama_confidence = self.calculate_confidence(claude_answer, retrieved_docs)
+
+        return self.build_result(
+            user_question, claude_answer, min(llama_confidence + 0.3, 1.0), retrieved_docs,
+            "claude+web", diagnostics, web_results
+        )
+
+    async def aquery(self, user_question: str, top_k: int = 5, expand_neighbors: int = None,
+                     adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+                     use_cache: bool = True, deadline: float = None, session_id: str = None) -> Dict:
+        """
+        query()'nin async hali: arun_query() + single-flight (aynı parametreler ve sonuç formatı)
+        """
+        if not config.SINGLE_FLIGHT:
+            return await self.arun_query(user_question, top_k, expand_neighbors, adaptive_k,
+                                         mode, books, use_cache, deadline, session_id)
+
+        key = self.query_key(user_question, top_k, expand_neighbors, adaptive_k, mode, books, use_cache,
+                             session_id)
+        result, shared = await self.async_single_flight.do(
+            key,
+            lambda: self.arun_query(user_question, top_k, expand_neighbors, adaptive_k,
+                                    mode, books, use_cache, deadline, session_id)
+        )
+        if shared:
+            print(f"🔗 Devam eden aynı sorgunun sonucu paylaşıldı: {user_question}")
+        return self.share_result(result, shared)
+
+    async def arun_query(self, user_question: str, top_k: int = 5, expand_neighbors: int = None,
+                         adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+                         use_cache: bool = True, deadline: float = None, session_id: str = None) -> Dict:
+        """
+        run_query()'nin async hali
+        """
+        print("\n" + "="*60)
+        print(f"📝 Soru (async): {user_question}")
+        print("="*60)
+
+        deadline = make_deadline(config.REQUEST_DEADLINE if deadline is None else deadline)
+
+        entity_hits, direct_result = await self.run_cpu(self.check_entity_fast_path, user_question)
+        if direct_result is not None:
+            return self.log_query(direct_result)
+
+        # 1. RETRIEVAL (embedding + Chroma + packing) - thread pool'da
+        # Ollama kapalıysa web her zaman gerekir, retrieval ile paralel başlar
+        diagnostics = {} if config.USE_OLLAMA else {'web_prefetch': "parallel"}
+        web_task = None if config.USE_OLLAMA else asyncio.create_task(self.asearch_web(user_question))
+        try:
+            retrieved_docs, context = await self.run_cpu(
+                self.prepare_context,
+                user_question, entity_hits, top_k, expand_neighbors,
+                adaptive_k, mode, books, diagnostics
+            )
+            check_deadline(deadline, "retrieval")
+        except BaseException:
+            # Deadline ya da iptal (client gitti): paralel web araması da dursun
+            self.adiscard_web_prefetch(web_task)
+            raise
+        chunk_ids = self.generation_chunk_ids(retrieved_docs, use_cache)
+
+        # Ollama kapalıysa direkt Claude + web
+        if not config.USE_OLLAMA:
+            return self.log_query(await self.afallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline, web_task
+            ))
+
+        # Retrieval çok zayıfsa Llama hiç çalışmaz
+        if self.route_before_generation(user_question, retrieved_docs, diagnostics):
+            return self.log_query(await self.afallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline
+            ))
+
+        # Retrieval zayıfsa web araması Llama ile paralel başlar
+        web_prefetch = self.astart_web_prefetch(user_question, retrieved_docs, diagnostics)
+        
+        # 2. LLAMA GENERATION (breaker açık, hata ya da hedge -> None)
+        model = self.choose_model(user_question, retrieved_docs, entity_hits, diagnostics)
+        session = self.start_session_turn(session_id, model, diagnostics)
+        try:
+            llama_answer = await self.acall_llama(user_question, context, diagnostics, chunk_ids,
+                                                  deadline, model, session)
+        except BaseException:
+            self.adiscard_web_prefetch(web_prefetch)
+            raise
+
+        if llama_answer is None:
+            self.record_model_tier(diagnostics, None)
+            print("⚠️ Llama cevabı yok - Web araması + Claude fallback")
+            return self.log_query(self.finish_session_turn(session, await self.afallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline, web_prefetch
+            )))
+
+        # 3. CONFIDENCE CHECK
+        confidence = self.calculate_confidence(llama_answer, retrieved_docs, diagnostics)
+        diagnostics['llama_confidence'] = confidence
+        self.record_model_tier(diagnostics, confidence)
+        print(f"📊 Confidence: {confidence:.2f}")
+
+        if confidence >= config.CONFIDENCE_THRESHOLD:
+            print("✅ Yüksek confidence - Llama cevabı kullanılıyor")
+            self.adiscard_web_prefetch(web_prefetch, diagnostics)
+            return self.log_query(self.finish_session_turn(session, self.build_result(
+                user_question, llama_answer, confidence, retrieved_docs,
+                "llama", diagnostics
+            )))
+
+        # 4. FALLBACK - Web + Claude (Claude kullanılamazsa Llama cevabı döner)
+        print("⚠️ Düşük confidence - Web araması + Claude fallback")
+        return self.log_query(self.finish_session_turn(session, await self.afallback_to_claude(
+            user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline,
+            web_prefetch, llama_answer, confidence
+        )))
+
+    async def aclose(self):
+        """HTTP bağlantılarını ve thread pool'u kapat"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._claude is not None:
+            await self._claude.close()
+            self._claude = None
+        self.executor.shutdown(wait=False)
+        self.web_executor.shutdown(wait=False)
+        self.ollama_pool.stop()
+
+
+async def _demo():
+    """Aynı anda birkaç soru sor"""
+    rag = AsyncHybridRAGPipeline()
+    questions = [
+        "What are the six ability scores?",
+        "How does initiative work in combat?",
+        "What is a saving throw?",
+    ]
+
+    try:
+        results = await asyncio.gather(*(rag.aquery(q) for q in questions))
+        for result in results:
+            print(f"\n❓ {result['question']}")
+            print(f"   {result['method_used']} ({result['confidence']:.2f}): {result['answer'][:150]}...")
+    finally:
+        await rag.aclose()
+
+
+def main():
+    """Async pipeline test scripti"""
+    asyncio.run(_demo())
+
+
+if __name__ == "__main__":
+    main()
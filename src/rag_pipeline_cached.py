@@ -3,6 +3,7 @@ Cache'li RAG Pipeline
 """
 from rag_pipeline_hybrid import HybridRAGPipeline
 from cache_manager import CacheManager
+from retrieval_types import result_to_json
 from typing import Dict
 
 class CachedRAGPipeline(HybridRAGPipeline):
@@ -26,7 +27,7 @@ class CachedRAGPipeline(HybridRAGPipeline):
         # Cache'de yok, normal RAG
         result = super().query(user_question, top_k)
         
-        # Cache'e kaydet
-        self.cache.set(user_question, result)
+        # Cache'e kaydet (JSON'a sadece burada çevrilir)
+        self.cache.set(user_question, result_to_json(result))
         
         return result
\ No newline at end of file
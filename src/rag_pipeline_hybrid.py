@@ -1,126 +1,1014 @@
-from typing import List, Dict
-from vector_db import VectorDB
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from typing import List, Dict, Iterator, Optional
+from vector_db import VectorDB, ShardedVectorDB
 from embedder import Embedder
 from web_scraper import WebScraper
+from context_optimizer import mmr_select, merge_adjacent_chunks, choose_adaptive_k
+from context_packer import TokenCounter, ContextPacker
+from query_expander import QueryExpander, fuse_rankings
+from entity_index import EntityIndex
+from section_index import SectionIndex
+from query_router import QueryRouter, QueryLog
+from generation_cache import GenerationCache
+from single_flight import SingleFlight
+from ollama_pool import OllamaPool
+from model_router import ModelRouter
+from ollama_sessions import OllamaSession, OllamaSessionStore
+from grounding import GroundingScorer
+from generation_budget import GenerationBudgets
+from resilience import (Deadline, DeadlineExceeded, BackendUnavailable, CircuitBreaker,
+                        LatencyTracker, WastedCompute, call_timeout, make_deadline,
+                        check_deadline, deadline_expired, wait_timeout)
+from retrieval_types import RetrievedChunk, build_sources, format_context
+import numpy as np # type: ignore
 import requests
 from anthropic import Anthropic
 from config import config
 
+
+# Her istekte aynı kalan talimat bloğu. Ollama'ya "system" olarak gönderilir;
+# template'te prompt'un başına geldiği için KV cache'ten tekrar kullanılır
+# (sadece context + soru prefill edilir). Değiştirilirse ilk istek tekrar prefill eder.
+LLAMA_SYSTEM_PROMPT = """You are a D&D 5th Edition expert. Answer ONLY based on the provided context.
+
+Rules:
+- Use only the rules text given in the context blocks. Do not rely on memory of other editions or homebrew.
+- Each context block starts with a header like [Source 2: PlayerHandbook.pdf, Chunk 14, ...].
+  Cite the blocks you used as (Source X).
+- If the context does not contain the answer, say that there is not enough information in the provided context.
+- Quote numbers (damage dice, ranges, DCs, durations) exactly as written in the context.
+- Keep the answer focused on the question; use short paragraphs or bullet points."""
+
+# Claude fallback talimatları; system bloğu olarak gönderilir ve prompt cache'in
+# ilk (en stabil) parçasıdır
+CLAUDE_SYSTEM_PROMPT = """You are a D&D expert answering rules questions for D&D 5th Edition players.
+The user message contains rules excerpts from the official books as [Source i: book, Chunk n, ...] blocks,
+followed by the question. Answer based on the context and cite the sources you used."""
+
+CLAUDE_WEB_INSTRUCTIONS = """Web search results follow the PDF context. Answer using BOTH the PDF context \
+and the web search results."""
+
+
 class HybridRAGPipeline:
     """Geliştirilmiş RAG pipeline - fallback mekanizmalı"""
     
+    # Warm-up süreç başına bir kez (API startup'ı ve pipeline __init__ ikisi de çağırır)
+    _warm_up_started = False
+    _warm_up_lock = threading.Lock()
+    
     def __init__(self):
         """Pipeline'ı initialize et"""
         print("🚀 Hybrid RAG Pipeline başlatılıyor...")
         
         # Vector DB ve Embedder
-        self.vector_db = VectorDB(collection_name="dnd_knowledge")
+        if config.USE_SHARDS:
+            self.vector_db = ShardedVectorDB(base_name="dnd_knowledge")
+        else:
+            self.vector_db = VectorDB(collection_name="dnd_knowledge")
         self.embedder = Embedder(model_name="all-mpnet-base-v2")
         
-        # Web Scraper
+        # Web Scraper (spekülatif arama Llama ile paralel, ayrı thread'de çalışır)
         self.web_scraper = WebScraper()
+        self.web_executor = ThreadPoolExecutor(
+            max_workers=config.WEB_PREFETCH_WORKERS, thread_name_prefix="web-prefetch"
+        )
         
         # Claude client
         self.claude_client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
         
+        # Spell/condition/feature isimleri -> canonical chunk (ingest'te oluşturulur)
+        self.entity_index = EntityIndex(self.vector_db.index_dir / "entity_index.json")
+        
+        # Hierarchical retrieval için section centroid'leri (ingest'te oluşturulur)
+        self.section_index = SectionIndex(self.vector_db.index_dir)
+        
+        # LLM cevap cache'i (prompt parmak izine göre, Llama ve Claude ortak)
+        self.generation_cache = GenerationCache()
+        
+        # Aynı anda gelen aynı sorgular tek hesaplamayı paylaşır
+        self.single_flight = SingleFlight()
+        
+        # Art arda hata veren backend bir süre hiç çağrılmaz
+        self.llama_breaker = CircuitBreaker(
+            "llama", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT
+        )
+        self.claude_breaker = CircuitBreaker(
+            "claude", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT
+        )
+        
+        # Hedge cutoff'u için Llama time-to-first-token ölçümleri
+        self.llama_ttft = LatencyTracker()
+        
+        # İptal edilen (client gitti, hedge, deadline) generation'ların harcadığı iş
+        self.wasted_compute = WastedCompute()
+        
+        # Generation öncesi routing (query log'undan eğitilir)
+        self.router = QueryRouter()
+        self.query_log = QueryLog()
+        
+        # Llama için küçük/büyük model seçimi
+        self.model_router = ModelRouter()
+        
+        # Cevap-chunk örtüşmesine dayalı confidence (GROUNDING_CONFIDENCE açıksa)
+        self.grounding_scorer = GroundingScorer()
+        
+        # Soru tipine göre token limitleri (GENERATION_BUDGETS açıksa) ve gerçekleşen token'lar
+        self.generation_budgets = GenerationBudgets()
+        
+        # Multi-query retrieval için kural tabanlı expander
+        self.query_expander = QueryExpander(max_queries=config.MULTI_QUERY_MAX)
+        
+        # Token bütçeli context packing
+        self.token_counter = TokenCounter()
+        self.context_packer = ContextPacker(
+            self.token_counter,
+            embed_fn=lambda texts: self.embedder.embed_batch(texts, show_progress=False)
+        )
+        
+        # Llama istekleri en az meşgul Ollama sunucusuna gider
+        self.ollama_pool = OllamaPool()
+        if config.USE_OLLAMA:
+            self.ollama_pool.start_health_checks()
+        
+        # Chat oturumu başına Ollama context'i (takip sorusu sadece yeni token'ları prefill eder)
+        self.ollama_sessions = OllamaSessionStore()
+        
+        # Model yükleme embedder/Chroma kurulumu ile paralel olsun diye arka planda
+        if config.USE_OLLAMA and config.OLLAMA_WARMUP:
+            self.start_warm_up()
+        
         print("✅ Hybrid RAG hazır!")
     
-    def retrieve_context(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Vector DB'den context al"""
+    @staticmethod
+    def warm_up_llama(base_url: str = None, model: str = None) -> Optional[Dict]:
+        """
+        Ollama modelini belleğe yükle ve sabit system prefix'ini KV cache'e al
+        
+        İlk gerçek sorgu model yükleme süresini (birkaç saniye) ödemez.
+        Pipeline'a ihtiyaç duymaz; API startup'ında da çağrılabilir.
+        
+        Args:
+            base_url: Ollama sunucusu (None = config.OLLAMA_BASE_URL)
+            model: Yüklenecek model (None = config.OLLAMA_MODEL)
+        
+        Returns:
+            Yükleme ve prefill süreleri (ms), Ollama'ya ulaşılamazsa None
+        """
+        url = f"{base_url or config.OLLAMA_BASE_URL}/api/generate"
+        model = model or config.OLLAMA_MODEL
+        payload = {
+            "model": model,
+            "system": LLAMA_SYSTEM_PROMPT,
+            "prompt": "Ready?",
+            "stream": False,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE,
+            "options": {"num_predict": 1}
+        }
+        if config.OLLAMA_NUM_CTX:
+            payload['options']['num_ctx'] = config.OLLAMA_NUM_CTX
+        
+        try:
+            print(f"🔥 Ollama warm-up: {model} @ {base_url or config.OLLAMA_BASE_URL} "
+                  f"(keep_alive={config.OLLAMA_KEEP_ALIVE})")
+            response = requests.post(url, json=payload, timeout=300)
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            print(f"⚠️ Ollama warm-up başarısız: {e}")
+            return None
+        
+        timings = {
+            "load_ms": round(result.get('load_duration', 0) / 1e6, 1),
+            "prompt_eval_ms": round(result.get('prompt_eval_duration', 0) / 1e6, 1),
+            "prompt_eval_count": result.get('prompt_eval_count'),
+        }
+        print(f"✅ Ollama hazır (yükleme {timings['load_ms']:.0f} ms, "
+              f"prefix prefill {timings['prompt_eval_ms']:.0f} ms)")
+        return timings
+    
+    @staticmethod
+    def start_warm_up() -> bool:
+        """
+        Pool'daki her Ollama sunucusunu (model routing açıksa küçük model dahil) arka planda warm-up et
+        
+        Returns:
+            Warm-up bu çağrıda başladıysa True, daha önce başlatıldıysa False
+        """
+        with HybridRAGPipeline._warm_up_lock:
+            if HybridRAGPipeline._warm_up_started:
+                return False
+            HybridRAGPipeline._warm_up_started = True
+        
+        models = [config.OLLAMA_MODEL] + ([config.OLLAMA_SMALL_MODEL] if config.MODEL_ROUTING else [])
+        for url in config.OLLAMA_BASE_URLS:
+            # Aynı sunucuda modeller sırayla yüklensin (CPU/RAM'i aynı anda zorlamasın)
+            threading.Thread(
+                target=lambda url=url: [HybridRAGPipeline.warm_up_llama(url, model) for model in models],
+                daemon=True, name="ollama-warmup"
+            ).start()
+        return True
+    
+    def retrieve_context(self, query: str, top_k: int = 5, expand_neighbors: int = None,
+                         adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+                         query_embedding=None, diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        Vector DB'den context al
+        
+        Args:
+            query: Kullanıcı sorusu
+            top_k: Kaç chunk döndürülsün
+            expand_neighbors: En iyi hit'lere her yönden eklenecek komşu chunk sayısı
+                (None ise config.NEIGHBOR_WINDOW)
+            adaptive_k: True ise top_k yerine similarity dağılımına göre k seçilir
+                (None ise config.ADAPTIVE_K)
+            mode: "flat" (tek sorgu), "multi_query" (alt sorgular + rank fusion)
+                veya "hierarchical" (section -> chunk) (None ise config.RETRIEVAL_MODE)
+            books: Sadece bu kitaplarda ara (None = hepsi)
+            query_embedding: Önceden hesaplanmış query embedding'i (opsiyonel)
+            diagnostics: Verilirse retrieval istatistikleri buraya yazılır
+        """
+        if expand_neighbors is None:
+            expand_neighbors = config.NEIGHBOR_WINDOW
+        if adaptive_k is None:
+            adaptive_k = config.ADAPTIVE_K
+        if mode is None:
+            mode = config.RETRIEVAL_MODE
+        
         print(f"🔍 Retrieval: '{query}'")
         
-        query_embedding = self.embedder.embed_text(query)
-        results = self.vector_db.search(
-            query, 
-            n_results=top_k, 
-            query_embedding=query_embedding
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_text(query)
+        
+        if mode == "flat" and not config.USE_MMR and not expand_neighbors and not adaptive_k:
+            results = self.vector_db.search(
+                query, 
+                n_results=top_k, 
+                query_embedding=query_embedding,
+                sources=books,
+                stats=diagnostics
+            )
+            if diagnostics is not None:
+                diagnostics['k_used'] = len(results)
+            print(f"✅ {len(results)} chunk bulundu")
+            return results
+        
+        # Adaptive modda max_k kadar aday üzerinden k seçilir
+        base_k = config.ADAPTIVE_K_MAX if adaptive_k else top_k
+        
+        # MMR için fazladan aday çek, embedding'leriyle birlikte
+        fetch_k = base_k * config.MMR_FETCH_MULTIPLIER if config.USE_MMR else base_k
+        
+        if mode == "multi_query":
+            candidates, relevance_embedding = self.fetch_multi_query(
+                query, query_embedding, fetch_k, books, diagnostics
+            )
+        elif mode == "hierarchical" and self.section_index.sections:
+            candidates = self.fetch_hierarchical(query_embedding, fetch_k, books, diagnostics)
+            relevance_embedding = query_embedding
+        else:
+            candidates = self.vector_db.search(
+                query,
+                n_results=fetch_k,
+                query_embedding=query_embedding,
+                include_embeddings=True,
+                sources=books,
+                stats=diagnostics,
+                lazy_text=True
+            )
+            relevance_embedding = query_embedding
+        
+        if adaptive_k:
+            top_k, k_method = choose_adaptive_k(
+                [doc['similarity'] for doc in candidates],
+                min_k=config.ADAPTIVE_K_MIN,
+                max_k=config.ADAPTIVE_K_MAX,
+                gap_threshold=config.ADAPTIVE_K_GAP,
+                knee_threshold=config.ADAPTIVE_K_KNEE,
+                cumulative_threshold=config.ADAPTIVE_K_CUMULATIVE
+            )
+            print(f"🎯 Adaptive k: {top_k} ({k_method})")
+            if diagnostics is not None:
+                diagnostics['k_method'] = k_method
+        
+        if diagnostics is not None:
+            diagnostics['k_used'] = top_k
+        
+        results = self.postprocess_results(
+            relevance_embedding, candidates, top_k,
+            expand_neighbors=expand_neighbors,
+            diagnostics=diagnostics
         )
         
-        print(f"✅ {len(results)} chunk bulundu")
+        print(f"✅ {len(results)} chunk bulundu ({len(candidates)} aday içinden)")
         return results
     
-    def format_context(self, retrieved_docs: List[Dict]) -> str:
-        """Context'i formatlı string'e çevir"""
-        context_parts = []
+    def fetch_multi_query(self, query: str, query_embedding, fetch_k: int,
+                          books: List[str] = None, diagnostics: Dict = None):
+        """
+        Alt sorgular üret, tek batch'te embed et, tek çağrıda ara, RRF ile birleştir
         
-        for i, doc in enumerate(retrieved_docs, 1):
-            source = doc['metadata'].get('source', 'Unknown')
-            chunk_id = doc['metadata'].get('chunk_id', 'N/A')
-            similarity = doc.get('similarity', 0.0)
-            
-            context_parts.append(
-                f"[Source {i}: {source}, Chunk {chunk_id}, Similarity: {similarity:.2f}]\n{doc['text']}"
+        Returns:
+            (birleştirilmiş adaylar, MMR için ortalama query embedding'i)
+        """
+        queries = self.query_expander.expand(query)
+        
+        if len(queries) > 1:
+            # Orijinal sorunun embedding'i zaten var, sadece ekler encode edilir
+            extra_embeddings = self.embedder.embed_batch(queries[1:], show_progress=False)
+            embeddings = [query_embedding] + list(extra_embeddings)
+        else:
+            embeddings = [query_embedding]
+        
+        result_lists = self.vector_db.search_batch(
+            embeddings,
+            n_results=fetch_k,
+            include_embeddings=True,
+            sources=books,
+            stats=diagnostics,
+            lazy_text=True
+        )
+        candidates = fuse_rankings(result_lists)[:fetch_k]
+        
+        if diagnostics is not None:
+            diagnostics['sub_queries'] = queries
+        
+        print(f"🔀 Multi-query: {len(queries)} sorgu birleştirildi")
+        return candidates, np.mean(np.asarray(embeddings), axis=0)
+    
+    def fetch_hierarchical(self, query_embedding, fetch_k: int, books: List[str] = None,
+                           diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        İki seviyeli arama: en yakın section'ları bul, sadece onların chunk'larını skorla
+        
+        Section'ların chunk'ları tek bir bulk lookup ile çekilir ve
+        search() ile aynı similarity formülüyle skorlanır.
+        
+        Returns:
+            Similarity'ye göre sıralı en iyi fetch_k aday
+        """
+        start = time.perf_counter()
+        sections = self.section_index.top_sections(
+            query_embedding,
+            n_sections=config.HIERARCHICAL_TOP_SECTIONS,
+            sources=books
+        )
+        
+        chunk_ids = [chunk_id for section in sections for chunk_id in section['ids']]
+        candidates = self.vector_db.get_by_ids(chunk_ids, include_embeddings=True, lazy_text=True)
+        self.vector_db.score_documents(query_embedding, candidates)
+        candidates.sort(key=lambda doc: doc.get('distance', float('inf')))
+        
+        if diagnostics is not None:
+            diagnostics['sections_searched'] = [
+                f"{section['source']}:{section['first_chunk']}-{section['last_chunk']}"
+                for section in sections
+            ]
+            diagnostics['chunks_scored'] = len(candidates)
+            diagnostics['search_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        print(f"📑 Hierarchical: {len(sections)} section, {len(candidates)} chunk skorlandı")
+        return candidates[:fetch_k]
+    
+    def postprocess_results(self, query_embedding, candidates: List[RetrievedChunk], top_k: int,
+                            expand_neighbors: int = 0, diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        MMR ile çeşitlendir, komşularla genişlet, aynı kaynaktaki ardışık chunk'ları birleştir
+        
+        Aday'lar text'siz (lazy) gelebilir; text sadece seçilen chunk'lar için
+        chunk store'dan okunur. Kazanılan karakter sayısı düz top-k metinlerine göre
+        hesaplanır; uzunluklar chunk store index'inden gelir (blok açılmaz).
+        """
+        if config.USE_MMR:
+            selected = mmr_select(
+                query_embedding,
+                candidates,
+                k=top_k,
+                lambda_mult=config.MMR_LAMBDA,
+                duplicate_threshold=config.MMR_DUPLICATE_THRESHOLD
+            )
+        else:
+            selected = candidates[:top_k]
+        
+        if expand_neighbors:
+            selected = self.expand_with_neighbors(query_embedding, selected, expand_neighbors, diagnostics)
+        
+        materialized = self.vector_db.materialize(selected)
+        
+        merged = merge_adjacent_chunks(selected, max_overlap=config.CHUNK_OVERLAP * 2)
+        
+        if diagnostics is not None:
+            baseline_chars = self.stored_text_chars(candidates[:top_k])
+            merged_chars = sum(len(doc.text or "") for doc in merged)
+            diagnostics['candidates'] = len(candidates)
+            diagnostics['texts_materialized'] = materialized
+            diagnostics['chunks_selected'] = len(selected)
+            diagnostics['spans_after_merge'] = len(merged)
+            diagnostics['context_chars'] = len(self.format_context(merged))
+            # Uzunluğu bilinmeyen aday varsa (store yok / eski store) ölçülmez
+            diagnostics['context_chars_saved'] = (
+                max(0, baseline_chars - merged_chars) if baseline_chars is not None else None
             )
         
-        return "\n\n---\n\n".join(context_parts)
+        return merged
     
-    def generate_with_llama(self, query: str, context: str) -> str:
-        """Llama ile cevap üret"""
-        prompt = f"""You are a D&D 5th Edition expert. Answer ONLY based on the provided context.
-
-Context:
+    def stored_text_chars(self, docs: List[RetrievedChunk]) -> Optional[int]:
+        """
+        Document metinlerinin toplam karakter sayısı, text'leri okumadan
+        
+        Returns:
+            Toplam uzunluk; text'i okunmamış ve store'da uzunluğu olmayan doc varsa None
+        """
+        chunk_store = getattr(self.vector_db, 'chunk_store', None)
+        total = 0
+        for doc in docs:
+            if doc.text is not None:
+                total += len(doc.text)
+                continue
+            length = chunk_store.text_length(doc['id']) if chunk_store is not None else None
+            if length is None:
+                return None
+            total += length
+        return total
+    
+    def expand_with_neighbors(self, query_embedding, docs: List[RetrievedChunk], window: int,
+                              diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        En iyi hit'leri komşu chunk'larıyla genişlet
+        
+        Komşu id'leri ingest'te oluşturulan chunk index'inden gelir ve
+        tek bir bulk lookup ile çekilir (ekstra similarity search yok).
+        """
+        present = {doc['id'] for doc in docs}
+        wanted = []
+        
+        for doc in docs[:config.NEIGHBOR_EXPAND_TOP]:
+            neighbor_ids = self.vector_db.chunk_index.neighbor_ids(
+                doc['metadata']['source'],
+                doc['metadata']['chunk_id'],
+                window=window
+            )
+            for neighbor_id in neighbor_ids:
+                if neighbor_id not in present:
+                    present.add(neighbor_id)
+                    wanted.append(neighbor_id)
+        
+        neighbors = self.vector_db.get_by_ids(wanted, include_embeddings=True, lazy_text=True)
+        self.vector_db.score_documents(query_embedding, neighbors)
+        
+        if diagnostics is not None:
+            diagnostics['neighbors_added'] = len(neighbors)
+        
+        return docs + neighbors
+    
+    def pack_context(self, query_embedding, docs: List[RetrievedChunk], diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        Context'i CONTEXT_TOKEN_BUDGET'a sığdır (0 ise kapalı)
+        
+        Bütçeyi aşan chunk'lardan sadece query'ye en benzer cümleler alınır.
+        """
+        if not config.CONTEXT_TOKEN_BUDGET:
+            return docs
+        
+        packed, stats = self.context_packer.pack(
+            query_embedding,
+            docs,
+            budget=config.CONTEXT_TOKEN_BUDGET,
+            format_fn=self.format_context
+        )
+        
+        if diagnostics is not None:
+            diagnostics.update(stats)
+        
+        return packed
+    
+    def pin_entity_chunks(self, entity_hits: List[Dict], docs: List[RetrievedChunk], query_embedding,
+                          diagnostics: Dict = None) -> List[RetrievedChunk]:
+        """
+        Sorudaki entity'lerin canonical chunk'larını context'in başına sabitle
+        
+        Zaten retrieve edilmiş chunk'lar tekrar çekilmez; eksikler tek bulk lookup ile gelir.
+        """
+        if not entity_hits:
+            return docs
+        
+        wanted = []
+        for hit in entity_hits:
+            for doc_id in hit['ids']:
+                if doc_id not in wanted:
+                    wanted.append(doc_id)
+        wanted = wanted[:config.ENTITY_MAX_PINNED]
+        
+        # Birleştirilmiş span'ler de içerdikleri chunk id'leriyle eşleşir
+        present = {}
+        for doc in docs:
+            for doc_id in doc.get('merged_ids', [doc['id']]):
+                present[doc_id] = doc
+        
+        pinned = []
+        missing = []
+        for doc_id in wanted:
+            if doc_id in present:
+                if not any(doc is present[doc_id] for doc in pinned):
+                    pinned.append(present[doc_id])
+            else:
+                missing.append(doc_id)
+        
+        fetched = self.vector_db.get_by_ids(missing, include_embeddings=True)
+        self.vector_db.score_documents(query_embedding, fetched)
+        pinned.extend(fetched)
+        
+        for doc in pinned:
+            doc.pinned = True
+        
+        if diagnostics is not None:
+            diagnostics['entity_hits'] = [hit['name'] for hit in entity_hits]
+            diagnostics['pinned_chunks'] = len(pinned)
+        
+        print(f"📌 Entity: {', '.join(hit['name'] for hit in entity_hits)} ({len(pinned)} chunk sabitlendi)")
+        return pinned + [doc for doc in docs if not doc.pinned]
+    
+    def answer_from_entity(self, user_question: str, entity: Dict) -> Dict:
+        """
+        Tam eşleşen lookup için canonical kitap metnini LLM'siz döndür
+        
+        Returns:
+            query() formatında sonuç ya da canonical chunk bulunamazsa None
+        """
+        docs = self.vector_db.get_by_ids(entity['ids'][:config.ENTITY_MAX_PINNED])
+        if not docs:
+            return None
+        
+        print(f"⚡ Entity fast path: {entity['name']} ({entity['type']}) - LLM atlandı")
+        
+        answer = f"{entity['name']} ({entity['type']}):\n\n" + "\n\n".join(doc.text for doc in docs)
+        
+        # Kitaptan birebir metin
+        for doc in docs:
+            doc.similarity = 1.0
+        
+        return {
+            "question": user_question,
+            "answer": answer,
+            "confidence": 1.0,
+            "sources": build_sources(docs),
+            "method_used": "entity",
+            "web_enhanced": False,
+            "diagnostics": {
+                "entity_hits": [entity['name']],
+                "llm_skipped": True
+            }
+        }
+    
+    def format_context(self, retrieved_docs: List[RetrievedChunk]) -> str:
+        """Context'i formatlı string'e çevir"""
+        return format_context(retrieved_docs)
+    
+    def prepare_context(self, user_question: str, entity_hits: List[Dict], top_k: int = 5,
+                        expand_neighbors: int = None, adaptive_k: bool = None, mode: str = None,
+                        books: List[str] = None, diagnostics: Dict = None):
+        """
+        Retrieval -> entity chunk'larını sabitle -> token bütçesi -> formatlı context
+        
+        Returns:
+            (context'e giren chunk'lar, formatlı context string'i)
+        """
+        query_embedding = self.embedder.embed_text(user_question)
+        retrieved_docs = self.retrieve_context(
+            user_question,
+            top_k=top_k,
+            expand_neighbors=expand_neighbors,
+            adaptive_k=adaptive_k,
+            mode=mode,
+            books=books,
+            query_embedding=query_embedding,
+            diagnostics=diagnostics
+        )
+        retrieved_docs = self.pin_entity_chunks(entity_hits, retrieved_docs, query_embedding, diagnostics)
+        retrieved_docs = self.pack_context(query_embedding, retrieved_docs, diagnostics)
+        return retrieved_docs, self.format_context(retrieved_docs)
+    
+    def build_llama_prompt(self, query: str, context: str, hint: str = None) -> str:
+        """
+        Llama prompt'unun değişen kısmı (sabit talimatlar LLAMA_SYSTEM_PROMPT'ta)
+        
+        Args:
+            hint: Soru tipine göre uzunluk talimatı (generation budget), soru ile cevap arasına girer
+        """
+        hint = f"{hint}\n" if hint else ""
+        return f"""Context:
 {context}
 
 Question: {query}
 
-Answer with source citations (Source X):"""
+{hint}Answer with source citations (Source X):"""
+    
+    def build_llama_request(self, prompt: str, stream: bool = False, model: str = None,
+                            context: List[int] = None, budget: Dict = None) -> Dict:
+        """
+        Ollama /api/generate request body'si (model None = config.OLLAMA_MODEL)
         
-        url = f"{config.OLLAMA_BASE_URL}/api/generate"
-        data = {
-            "model": config.OLLAMA_MODEL,
+        Args:
+            context: Oturumun önceki turlarından Ollama context'i; verilirse system prompt
+                gönderilmez (context'in başında zaten var), sadece yeni soru eklenir
+            budget: GenerationBudgets.budget() sonucu; num_predict ve stop buradan (None = 512, stop yok)
+        """
+        request = {
+            "model": model or config.OLLAMA_MODEL,
+            "system": LLAMA_SYSTEM_PROMPT,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE,
             "options": {
                 "temperature": 0.7,
                 "top_p": 0.9,
-                "num_predict": 512
+                "num_predict": budget['llama'] if budget else 512,
             }
         }
+        if config.OLLAMA_NUM_CTX:
+            # Warm-up ile aynı olmalı, yoksa Ollama modeli yeniden yükler
+            request['options']['num_ctx'] = config.OLLAMA_NUM_CTX
+        if budget and budget['stop']:
+            request['options']['stop'] = budget['stop']
+        if context:
+            del request['system']
+            request['context'] = context
+        return request
+    
+    def record_llama_stats(self, prompt: str, result: Dict, stats: Dict = None,
+                           session: OllamaSession = None, budget: Dict = None):
+        """
+        Ollama cevabındaki (ya da son stream satırındaki) sayaçları stats'a yaz
+        
+        Args:
+            session: Verilirse cevaptaki context de stats['llama_context']'e yazılır
+                (finish_session_turn oturuma kaydeder)
+            budget: Verilirse üretilen token'lar bütçe ile birlikte kaydedilir
+        """
+        self.wasted_compute.add(llama_generations=1, llama_tokens=result.get('eval_count', 0))
+        if budget is not None:
+            self.record_generation_budget(
+                "llama", budget, result.get('eval_count'), result.get('done_reason') == "length",
+                result['total_duration'] / 1e6 if 'total_duration' in result else None, stats
+            )
+        if stats is None:
+            return
+        if session is not None and result.get('context'):
+            stats['llama_context'] = result['context']
+        prompt_tokens = self.token_counter.count(LLAMA_SYSTEM_PROMPT) + self.token_counter.count(prompt)
+        stats['llama_prompt_tokens'] = prompt_tokens
+        stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + prompt_tokens
+        # KV cache'ten gelen prefix prompt_eval_count'a dahil değildir;
+        # llama_prompt_tokens ile farkı tekrar kullanılan kısmı gösterir
+        if 'prompt_eval_count' in result:
+            stats['llama_prompt_eval_count'] = result['prompt_eval_count']
+        if 'eval_count' in result:
+            stats['llama_eval_count'] = result['eval_count']
+        # Ollama süreleri nanosaniye
+        if 'total_duration' in result:
+            stats['llama_ms'] = round(result['total_duration'] / 1e6, 1)
+        if 'prompt_eval_duration' in result:
+            stats['llama_prompt_eval_ms'] = round(result['prompt_eval_duration'] / 1e6, 1)
+        if result.get('load_duration'):
+            stats['llama_load_ms'] = round(result['load_duration'] / 1e6, 1)
+    
+    def record_generation_budget(self, backend: str, budget: Dict, tokens: Optional[int],
+                                 truncated: bool, ms: Optional[float], stats: Dict = None):
+        """Üretilen/bütçelenen token'ları kaydet, özeti stats['<backend>_budget']'e yaz"""
+        summary = self.generation_budgets.record(backend, budget, tokens, truncated, ms)
+        if stats is not None:
+            stats[f'{backend}_budget'] = summary
+    
+    def record_llama_endpoint(self, url: str, stats: Dict = None):
+        """Cevabı üreten Ollama sunucusunu stats'a yaz"""
+        if stats is not None:
+            stats['llama_endpoint'] = url
+    
+    def record_discarded_generation(self, model: str, parts: List[str], start: float):
+        """
+        Yarıda kesilen generation'ı wasted_compute'a yaz
+        
+        Args:
+            model: "llama" ya da "claude"
+            parts: O ana kadar gelen parçalar (Ollama'da her parça bir token)
+            start: Generation başlangıcı (time.perf_counter)
+        """
+        self.wasted_compute.add(**{
+            f"{model}_aborted": 1,
+            f"{model}_tokens_discarded": len(parts),
+            f"{model}_ms_discarded": (time.perf_counter() - start) * 1000,
+        })
+        print(f"🛑 {model} generation iptal edildi ({len(parts)} parça sonra)")
+    
+    def observe_llama_ttft(self, ttft_ms: float, stats: Dict = None):
+        """Llama ilk token süresini hedge cutoff'u için kaydet"""
+        self.llama_ttft.record(ttft_ms)
+        if stats is not None:
+            stats['llama_ttft_ms'] = round(ttft_ms, 1)
+    
+    def generate_with_llama(self, query: str, context: str, stats: Dict = None,
+                            chunk_ids: List[str] = None, deadline: Deadline = None,
+                            model: str = None, session: OllamaSession = None) -> str:
+        """
+        Llama ile cevap üret
+        
+        Args:
+            stats: Verilirse gönderilen prompt token sayısı buraya yazılır
+            chunk_ids: Context'teki chunk id'leri; verilirse generation cache kullanılır
+            deadline: İsteğin deadline'ı; HTTP timeout kalan süreyi aşmaz
+            model: Ollama modeli (None = config.OLLAMA_MODEL, model router'ın seçimi)
+            session: Chat oturumu; önceki turların context'i ile devam edilir
+                (cevap konuşmaya bağlı olduğu için generation cache kullanılmaz)
+        """
+        budget = self.generation_budgets.budget(query)
+        prompt = self.build_llama_prompt(query, context, budget['hint'])
+        request = self.build_llama_request(prompt, model=model,
+                                           context=session.context if session else None, budget=budget)
+        cache_key = self.llama_cache_key(query, request, None if session else chunk_ids)
+        
+        cached = self.cached_generation(cache_key, "llama", stats)
+        if cached is not None:
+            return cached
         
         print("🦙 Llama ile cevap üretiliyor...")
-        response = requests.post(url, json=data, timeout=300)
+        start = time.perf_counter()
+        # Oturumun KV cache'i önceki turu üreten sunucuda
+        prefer = session.endpoint if session else None
+        with self.ollama_pool.lease(deadline, prefer) as endpoint:
+            self.record_llama_endpoint(endpoint.url, stats)
+            response = requests.post(
+                f"{endpoint.url}/api/generate", json=request,
+                timeout=call_timeout(deadline, config.LLAMA_TIMEOUT, "llama")
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama hatası: {response.status_code}")
+            result = response.json()
         
-        if response.status_code == 200:
-            return response.json()['response']
-        else:
-            raise Exception(f"Ollama hatası: {response.status_code}")
+        self.record_llama_stats(prompt, result, stats, session, budget)
+        # Stream olmadan ilk token anı: toplam süreden decode süresi çıkarılır
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.observe_llama_ttft(elapsed_ms - result.get('eval_duration', 0) / 1e6, stats)
+        self.generation_cache.set(cache_key, result['response'])
+        return result['response']
     
-    def generate_with_claude(self, query: str, context: str, web_context: str = None) -> str:
-        """Claude ile cevap üret (fallback)"""
+    def stream_with_llama(self, query: str, context: str, stats: Dict = None,
+                          chunk_ids: List[str] = None, deadline: Deadline = None,
+                          model: str = None, session: OllamaSession = None) -> Iterator[str]:
+        """
+        Llama cevabını token token üret (Ollama stream=True, satır başına bir JSON)
+        
+        Args:
+            stats: Verilirse prompt token sayısı ve eval sayaçları buraya yazılır
+            chunk_ids: Verilirse generation cache kullanılır (hit'te cevap tek parça gelir)
+            deadline: İsteğin deadline'ı; her satırda kontrol edilir
+            model: Ollama modeli (None = config.OLLAMA_MODEL)
+            session: Chat oturumu (generate_with_llama ile aynı)
+        """
+        budget = self.generation_budgets.budget(query)
+        prompt = self.build_llama_prompt(query, context, budget['hint'])
+        request = self.build_llama_request(prompt, stream=True, model=model,
+                                           context=session.context if session else None, budget=budget)
+        cache_key = self.llama_cache_key(query, request, None if session else chunk_ids)
         
+        cached = self.cached_generation(cache_key, "llama", stats)
+        if cached is not None:
+            yield cached
+            return
+        
+        print("🦙 Llama ile cevap stream ediliyor...")
+        start = time.perf_counter()
+        parts = []
+        timeout = call_timeout(deadline, config.LLAMA_TIMEOUT, "llama")
+        prefer = session.endpoint if session else None
+        try:
+            with self.ollama_pool.lease(deadline, prefer) as endpoint, \
+                    requests.post(f"{endpoint.url}/api/generate", json=request,
+                                  stream=True, timeout=timeout) as response:
+                self.record_llama_endpoint(endpoint.url, stats)
+                if response.status_code != 200:
+                    raise Exception(f"Ollama hatası: {response.status_code}")
+                
+                for line in response.iter_lines():
+                    if deadline is not None:
+                        deadline.check("llama")
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise Exception(f"Ollama hatası: {chunk['error']}")
+                    if chunk.get('response'):
+                        if not parts:
+                            self.observe_llama_ttft((time.perf_counter() - start) * 1000, stats)
+                        parts.append(chunk['response'])
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        self.record_llama_stats(prompt, chunk, stats, session, budget)
+                        # Sadece tamamlanan cevaplar cache'lenir
+                        self.generation_cache.set(cache_key, "".join(parts))
+                        break
+        except GeneratorExit:
+            # Tüketici vazgeçti (client gitti / hedge): bağlantı kapanınca Ollama generation'ı durdurur
+            self.record_discarded_generation("llama", parts, start)
+            raise
+    
+    def build_claude_request(self, query: str, context: str, web_context: str = None,
+                             budget: Dict = None) -> Dict:
+        """
+        Claude messages.create parametreleri (web sonuçları varsa onlar da eklenir)
+        
+        budget verilirse max_tokens ve uzunluk talimatı soru tipine göre seçilir (None = 1024).
+        
+        Prompt en stabilden en değişkene sıralı bloklara bölünür:
+        system talimatları -> PDF context -> web sonuçları -> soru.
+        CLAUDE_PROMPT_CACHE açıksa system ve PDF context bloklarına cache_control
+        konur; aynı chunk'ları getiren sorular prefix'i cache'ten okur.
+        Modelin minimum cache uzunluğunun altındaki prefix'ler API tarafından
+        sessizce cache'lenmez (hata vermez).
+        """
+        def block(text: str, cache: bool = False) -> Dict:
+            content = {"type": "text", "text": text}
+            if cache and config.CLAUDE_PROMPT_CACHE:
+                content["cache_control"] = {"type": "ephemeral"}
+            return content
+        
+        hint = f" {budget['hint']}" if budget and budget['hint'] else ""
         if web_context:
-            prompt = f"""You are a D&D expert. Answer using BOTH the PDF context and web search results.
-
-PDF Context:
-{context}
-
-Web Search Results:
-{web_context}
-
-Question: {query}
-
-Provide a comprehensive answer citing sources."""
+            system = CLAUDE_SYSTEM_PROMPT + "\n" + CLAUDE_WEB_INSTRUCTIONS
+            user_blocks = [
+                block(f"PDF Context:\n{context}", cache=True),
+                block(f"Web Search Results:\n{web_context}"),
+                block(f"Question: {query}\n\nProvide a comprehensive answer citing sources.{hint}"),
+            ]
         else:
-            prompt = f"""You are a D&D expert. Answer based on the context.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer with citations."""
+            system = CLAUDE_SYSTEM_PROMPT
+            user_blocks = [
+                block(f"Context:\n{context}", cache=True),
+                block(f"Question: {query}\n\nAnswer with citations.{hint}"),
+            ]
+        
+        return {
+            "model": config.CLAUDE_MODEL,
+            "max_tokens": budget['claude'] if budget else 1024,
+            "system": [block(system, cache=True)],
+            "messages": [{"role": "user", "content": user_blocks}],
+        }
+    
+    def record_claude_usage(self, usage, stats: Dict = None, start: float = None):
+        """Claude usage bilgisini (ve start verildiyse süreyi) stats'a yaz"""
+        if stats is None:
+            return
+        if start is not None:
+            stats['claude_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        # Claude kendi tokenizer'ı ile sayar; input_tokens cache'ten okunan/yazılan
+        # kısmı içermez, toplam prompt üçünün toplamıdır
+        cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        prompt_tokens = usage.input_tokens + cache_read + cache_write
+        stats['claude_prompt_tokens'] = prompt_tokens
+        stats['claude_cache_read_tokens'] = cache_read
+        stats['claude_cache_write_tokens'] = cache_write
+        stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + prompt_tokens
+    
+    def record_claude_budget(self, budget: Dict, message, start: float, stats: Dict = None):
+        """Claude cevabının output token'larını bütçe ile birlikte kaydet"""
+        self.record_generation_budget(
+            "claude", budget, message.usage.output_tokens, message.stop_reason == "max_tokens",
+            (time.perf_counter() - start) * 1000, stats
+        )
+    
+    def generate_with_claude(self, query: str, context: str, web_context: str = None,
+                             stats: Dict = None, chunk_ids: List[str] = None,
+                             deadline: Deadline = None) -> str:
+        """
+        Claude ile cevap üret (fallback)
+        
+        Args:
+            stats: Verilirse prompt token sayısı ve cache read/write token'ları buraya yazılır
+            chunk_ids: Context'teki chunk id'leri; verilirse generation cache kullanılır
+            deadline: İsteğin deadline'ı; API timeout'u kalan süreyi aşmaz
+        """
+        budget = self.generation_budgets.budget(query)
+        request = self.build_claude_request(query, context, web_context, budget)
+        cache_key = self.claude_cache_key(query, request, chunk_ids, web_context)
+        
+        cached = self.cached_generation(cache_key, "claude", stats)
+        if cached is not None:
+            return cached
         
         print("☁️ Claude ile cevap üretiliyor...")
+        start = time.perf_counter()
         message = self.claude_client.messages.create(
-            model=config.CLAUDE_MODEL,
-            max_tokens=1024,
-            messages=[{"role": "user", "content": prompt}]
+            **request, timeout=call_timeout(deadline, config.CLAUDE_TIMEOUT, "claude")
         )
         
+        self.record_claude_usage(message.usage, stats, start)
+        self.record_claude_budget(budget, message, start, stats)
+        self.generation_cache.set(cache_key, message.content[0].text)
         return message.content[0].text
     
-    def calculate_confidence(self, answer: str, sources: List[Dict]) -> float:
-
+    def stream_with_claude(self, query: str, context: str, web_context: str = None,
+                           stats: Dict = None, chunk_ids: List[str] = None,
+                           deadline: Deadline = None) -> Iterator[str]:
+        """
+        Claude cevabını parça parça üret (messages.stream)
+        
+        Args:
+            stats: Verilirse gönderilen prompt token sayısı buraya yazılır
+            chunk_ids: Verilirse generation cache kullanılır (hit'te cevap tek parça gelir)
+            deadline: İsteğin deadline'ı; her parçada kontrol edilir
+        """
+        budget = self.generation_budgets.budget(query)
+        request = self.build_claude_request(query, context, web_context, budget)
+        cache_key = self.claude_cache_key(query, request, chunk_ids, web_context)
+        
+        cached = self.cached_generation(cache_key, "claude", stats)
+        if cached is not None:
+            yield cached
+            return
+        
+        print("☁️ Claude ile cevap stream ediliyor...")
+        start = time.perf_counter()
+        parts = []
+        timeout = call_timeout(deadline, config.CLAUDE_TIMEOUT, "claude")
+        try:
+            with self.claude_client.messages.stream(**request, timeout=timeout) as stream:
+                for text in stream.text_stream:
+                    if deadline is not None:
+                        deadline.check("claude")
+                    parts.append(text)
+                    yield text
+                message = stream.get_final_message()
+                self.record_claude_usage(message.usage, stats, start)
+                self.record_claude_budget(budget, message, start, stats)
+        except GeneratorExit:
+            self.record_discarded_generation("claude", parts, start)
+            raise
+        self.generation_cache.set(cache_key, "".join(parts))
+    
+    def generation_chunk_ids(self, retrieved_docs: List[RetrievedChunk],
+                             use_cache: bool = True) -> Optional[List[str]]:
+        """
+        Generation cache anahtarı için context'teki chunk'lar (sırasıyla)
+        
+        Birleştirilmiş chunk'lar tüm parçalarıyla yazılır.
+        
+        Returns:
+            Chunk id listesi, cache kapalıysa/bypass ediliyorsa None
+        """
+        if not (use_cache and config.GENERATION_CACHE):
+            return None
+        return ["+".join(doc.merged_ids) if doc.merged_ids else doc.id for doc in retrieved_docs]
+    
+    def llama_cache_key(self, query: str, request: Dict, chunk_ids: Optional[List[str]]) -> Optional[str]:
+        """Ollama request'i için generation cache anahtarı (chunk_ids None = bypass)"""
+        if chunk_ids is None:
+            return None
+        options = {"system": request['system'], "options": request['options']}
+        return self.generation_cache.make_key(request['model'], options, query, chunk_ids)
+    
+    def claude_cache_key(self, query: str, request: Dict, chunk_ids: Optional[List[str]],
+                         web_context: str = None) -> Optional[str]:
+        """Claude request'i için generation cache anahtarı (web context'i de dahil)"""
+        if chunk_ids is None:
+            return None
+        options = {
+            "system": [block['text'] for block in request['system']],
+            "max_tokens": request['max_tokens'],
+            "web_context": web_context or "",
+        }
+        return self.generation_cache.make_key(request['model'], options, query, chunk_ids)
+    
+    def cached_generation(self, cache_key: Optional[str], model: str, stats: Dict = None) -> Optional[str]:
+        """Cache'te cevap varsa döndür ve diagnostics'e hit yaz"""
+        cached = self.generation_cache.get(cache_key)
+        if cached is not None:
+            print(f"📦 Generation cache hit ({model})")
+            if stats is not None:
+                stats[f'{model}_cache_hit'] = True
+        return cached
+    
+    def calculate_confidence(self, answer: str, sources: List[RetrievedChunk],
+                             diagnostics: Dict = None) -> float:
+        """
+        Cevabın confidence skoru (0-1); CONFIDENCE_THRESHOLD altı Claude fallback'ine gider
+        
+        GROUNDING_CONFIDENCE açıksa cevabın chunk'larla desteklenme oranı, değilse kural tabanlı skor.
+        
+        Args:
+            diagnostics: Verilirse grounding ayrıntıları diagnostics['grounding']'e yazılır
+        """
+        if config.GROUNDING_CONFIDENCE:
+            result = self.grounding_scorer.score(answer, [doc.text or "" for doc in sources])
+            if diagnostics is not None:
+                diagnostics['grounding'] = result
+            return result['confidence']
+        return self.heuristic_confidence(answer, sources)
+    
+    def heuristic_confidence(self, answer: str, sources: List[RetrievedChunk]) -> float:
+        """Kural tabanlı confidence: belirsizlik ifadeleri, uzunluk, "source" kelimesi, similarity"""
         confidence = 0.5  # 1.0 yerine 0.5'ten başla (daha temkinli)
         
         # 1. Düşük confidence ifadeleri (ağırlık: -0.6)
@@ -157,7 +1045,7 @@ Answer with citations."""
         
         # 4. Retrieved sources'ların avg similarity (ÇOK ÖNEMLİ!)
         if sources:
-            avg_similarity = sum(s.get('similarity', 0.0) for s in sources) / len(sources)
+            avg_similarity = sum(s.similarity or 0.0 for s in sources) / len(sources)
             
             # Yüksek similarity = yüksek confidence
             if avg_similarity > 0.7:
@@ -174,126 +1062,734 @@ Answer with citations."""
         
         return confidence
     
-    def query(self, user_question: str, top_k: int = 5) -> Dict:
+    def build_result(self, user_question: str, answer: str, confidence: float,
+                     retrieved_docs: List[RetrievedChunk], method_used: str,
+                     diagnostics: Dict, web_results: List[Dict] = None) -> Dict:
+        """query() sonuç formatı (web sonuçları varsa web_sources da eklenir)"""
+        result = {
+            "question": user_question,
+            "answer": answer,
+            "confidence": confidence,
+            "sources": build_sources(retrieved_docs),
+            "method_used": method_used,
+            "web_enhanced": web_results is not None,
+            "diagnostics": diagnostics
+        }
+        if web_results is not None:
+            result["web_sources"] = [
+                {"url": r['url'], "preview": r['text'][:200]}
+                for r in web_results
+            ]
+        return result
+    
+    def fallback_likely(self, retrieved_docs: List[RetrievedChunk]) -> bool:
+        """
+        Retrieval skorlarına bakarak Claude fallback'i muhtemel mi?
+        
+        heuristic_confidence'taki similarity kısmıyla aynı ortalama kullanılır;
+        cevap henüz yokken bilinen tek sinyal bu.
+        """
+        if not retrieved_docs:
+            return True
+        avg_similarity = sum(d.similarity or 0.0 for d in retrieved_docs) / len(retrieved_docs)
+        return avg_similarity < config.SPECULATIVE_WEB_SIMILARITY
+    
+    def start_web_prefetch(self, user_question: str, retrieved_docs: List[RetrievedChunk],
+                           diagnostics: Dict = None) -> Optional[Future]:
+        """
+        Fallback muhtemelse web aramasını arka planda başlat
+        
+        Fallback olmazsa future iptal edilir; istek zaten başladıysa tamamlanır ve
+        sonuç web_scraper cache'inde kalır (aynı soru tekrar gelirse kullanılır).
+        
+        Returns:
+            Web araması future'ı ya da None (spekülasyon yapılmadı)
+        """
+        if not config.SPECULATIVE_WEB or not self.fallback_likely(retrieved_docs):
+            return None
+        
+        print("🔮 Fallback muhtemel - web araması arka planda başlatıldı")
+        if diagnostics is not None:
+            diagnostics['web_prefetch'] = "started"
+        return self.web_executor.submit(self.web_scraper.search_dnd_content, user_question, 3)
+    
+    def collect_web_results(self, user_question: str, prefetch: Optional[Future] = None,
+                            diagnostics: Dict = None, deadline: Deadline = None):
+        """
+        Fallback için web sonuçlarını al (spekülatif arama varsa onu bekle)
+        
+        Args:
+            deadline: Verilirse web'e kalan sürenin en fazla yarısı ayrılır (diğer yarısı
+                Claude'un); süre yetmezse web atlanır ve Claude sadece PDF context'i ile çalışır
+        
+        Returns:
+            (web sonuçları, formatlı web context'i)
+        """
+        start = time.perf_counter()
+        web_results = None
+        # Ollama kapalıyken başlatılan paralel arama spekülatif değil ("parallel" etiketli)
+        speculative = prefetch is not None and diagnostics is not None \
+            and diagnostics.get('web_prefetch') == "started"
+        
+        if prefetch is None and deadline is not None:
+            # Timeout ile beklenebilsin diye arama executor'da çalışır
+            prefetch = self.web_executor.submit(self.web_scraper.search_dnd_content, user_question, 3)
+        
+        if prefetch is not None:
+            timeout = max(deadline.remaining() / 2, 0) if deadline is not None else None
+            try:
+                web_results = prefetch.result(timeout=timeout)
+                if speculative:
+                    diagnostics['web_prefetch'] = "used"
+            except FutureTimeout:
+                print(f"⏱️ Web araması {timeout:.1f} sn içinde bitmedi - web atlanıyor")
+                web_results = []
+                if diagnostics is not None:
+                    self.record_decision(diagnostics, type="deadline", stage="web",
+                                         action="skipped", waited_ms=round(timeout * 1000, 1))
+            except Exception as e:
+                print(f"⚠️ Spekülatif web araması başarısız: {e}")
+        
+        if web_results is None:
+            web_results = self.web_scraper.search_dnd_content(user_question, max_results=3)
+        
+        if diagnostics is not None:
+            # Spekülasyon işe yaradıysa bu süre ~0 olur
+            diagnostics['web_wait_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return web_results, self.web_scraper.format_web_results(web_results)
+    
+    def discard_web_prefetch(self, prefetch: Optional[Future], diagnostics: Dict = None):
+        """Fallback olmadı: başlamamış spekülatif aramayı iptal et"""
+        if prefetch is None:
+            return
+        cancelled = prefetch.cancel()
+        if diagnostics is not None:
+            diagnostics['web_prefetch'] = "cancelled" if cancelled else "cached"
+    
+    def route_before_generation(self, user_question: str, retrieved_docs: List[RetrievedChunk],
+                                diagnostics: Dict) -> bool:
+        """
+        Llama çalışmadan önce fallback olasılığına bak
+        
+        Karar her zaman diagnostics['route']'a yazılır (query log'u router eğitimi için
+        feature'ları buradan alır); USE_ROUTER kapalıysa sadece loglanır.
+        
+        Returns:
+            True ise Llama atlanıp direkt Claude + web kullanılmalı
+        """
+        route = self.router.route(retrieved_docs, user_question)
+        diagnostics['route'] = route
+        
+        if config.USE_ROUTER and route['decision'] == "claude":
+            print(f"🔀 Router: fallback olasılığı {route['fallback_probability']:.2f} - Llama atlanıyor")
+            return True
+        return False
+    
+    def log_query(self, result: Dict) -> Dict:
+        """Sonucu query log'una yaz (router eğitimi/replay için) ve aynen döndür"""
+        if config.LOG_QUERIES:
+            try:
+                self.query_log.record(result)
+            except Exception as e:
+                print(f"⚠️ Query log yazılamadı: {e}")
+        return result
+    
+    def record_decision(self, diagnostics: Dict, **decision):
+        """Breaker/hedge/deadline kararını cevap metadata'sına ekle (diagnostics['resilience'])"""
+        diagnostics.setdefault('resilience', []).append(decision)
+    
+    def backend_allowed(self, breaker: CircuitBreaker, diagnostics: Dict) -> bool:
+        """Breaker açıksa backend'i atla ve kararı kaydet"""
+        if breaker.allow():
+            return True
+        print(f"🔌 {breaker.name} circuit breaker açık - atlanıyor")
+        self.record_decision(diagnostics, type="breaker", backend=breaker.name,
+                             state="open", action="skipped")
+        return False
+    
+    def backend_failed(self, breaker: CircuitBreaker, error: Exception, diagnostics: Dict):
+        """Backend hatasını breaker'a yaz ve kararı kaydet"""
+        print(f"⚠️ {breaker.name} hatası: {error}")
+        breaker.record_failure()
+        self.record_decision(diagnostics, type="breaker", backend=breaker.name,
+                             state=breaker.state, action="failed", error=str(error)[:200])
+    
+    def guarded_call(self, breaker: CircuitBreaker, fn, diagnostics: Dict, deadline: Deadline):
+        """
+        Backend çağrısını breaker ve deadline kurallarıyla yap
+        
+        Args:
+            fn: Çağrı; None döndürürse sonuç belirsiz sayılır (hedge) ve breaker'a yazılmaz
+        
+        Returns:
+            fn() sonucu; breaker açıksa ya da çağrı hata verdiyse None
+        
+        Raises:
+            DeadlineExceeded: Süre doldu (breaker'a hata olarak yazılmaz)
+        """
+        if not self.backend_allowed(breaker, diagnostics):
+            return None
+        try:
+            result = fn()
+        except DeadlineExceeded:
+            breaker.release()
+            raise
+        except Exception as e:
+            # Timeout'u deadline kısalttıysa backend'in suçu değil
+            if deadline_expired(deadline):
+                breaker.release()
+                raise DeadlineExceeded(f"Deadline ({deadline.seconds:.0f} sn) '{breaker.name}' adımında doldu") from e
+            self.backend_failed(breaker, e, diagnostics)
+            return None
+        
+        if result is None:
+            breaker.release()
+        else:
+            breaker.record_success()
+        return result
+    
+    def guarded_stream(self, breaker: CircuitBreaker, tokens: Iterator[str], diagnostics: Dict,
+                       deadline: Deadline) -> Iterator[str]:
+        """guarded_call'ın stream hali: hata breaker'a yazılır ve tekrar fırlatılır"""
+        try:
+            yield from tokens
+        except GeneratorExit:
+            breaker.release()
+            raise
+        except DeadlineExceeded:
+            breaker.release()
+            raise
+        except Exception as e:
+            if deadline_expired(deadline):
+                breaker.release()
+                raise DeadlineExceeded(f"Deadline ({deadline.seconds:.0f} sn) '{breaker.name}' adımında doldu") from e
+            self.backend_failed(breaker, e, diagnostics)
+            raise
+        breaker.record_success()
+    
+    def hedge_cutoff_ms(self) -> float:
+        """Llama ilk token'ı için beklenecek süre: son TTFT'lerin p95'i (az ölçüm varsa config)"""
+        cutoff = self.llama_ttft.percentile(config.HEDGE_PERCENTILE, config.HEDGE_MIN_SAMPLES)
+        return cutoff if cutoff is not None else config.HEDGE_DEFAULT_CUTOFF_MS
+    
+    def generate_llama_hedged(self, user_question: str, context: str, diagnostics: Dict,
+                              chunk_ids: Optional[List[str]], deadline: Deadline,
+                              model: str = None, session: OllamaSession = None) -> Optional[str]:
+        """
+        Llama'yı stream et; ilk token hedge cutoff'unda gelmezse vazgeç
+        
+        Llama arka plan thread'inde çalışır. Vazgeçilirse thread ilk token geldiğinde
+        stream'i kapatır (Ollama bağlantı kapanınca generation'ı durdurur).
+        
+        Returns:
+            Llama cevabı ya da None (hedge tetiklendi, Claude'a geçilmeli)
+        """
+        cutoff_ms = self.hedge_cutoff_ms()
+        events = queue.Queue()
+        abandoned = threading.Event()
+        # Vazgeçilen thread diagnostics'e yazmasın diye ayrı stats
+        llama_stats = {}
+        
+        def worker():
+            tokens = self.stream_with_llama(user_question, context, stats=llama_stats,
+                                            chunk_ids=chunk_ids, deadline=deadline, model=model,
+                                            session=session)
+            try:
+                for token in tokens:
+                    if abandoned.is_set():
+                        break
+                    events.put(("token", token))
+                events.put(("done", None))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                tokens.close()
+        
+        threading.Thread(target=worker, daemon=True, name="llama-hedge").start()
+        
+        try:
+            kind, value = events.get(timeout=wait_timeout(deadline, cutoff_ms / 1000))
+        except queue.Empty:
+            abandoned.set()
+            check_deadline(deadline, "llama")
+            print(f"⏱️ Llama {cutoff_ms:.0f} ms içinde ilk token'ı üretmedi - Claude'a geçiliyor")
+            self.record_decision(diagnostics, type="hedge", backend="llama", triggered=True,
+                                 cutoff_ms=round(cutoff_ms, 1))
+            return None
+        
+        self.record_decision(diagnostics, type="hedge", backend="llama", triggered=False,
+                             cutoff_ms=round(cutoff_ms, 1))
+        parts = []
+        while kind != "done":
+            if kind == "error":
+                raise value
+            parts.append(value)
+            try:
+                kind, value = events.get(timeout=wait_timeout(deadline, config.LLAMA_TIMEOUT))
+            except queue.Empty:
+                abandoned.set()
+                check_deadline(deadline, "llama")
+                raise TimeoutError("Llama stream'i zamanında bitmedi")
+        
+        self.merge_llama_stats(diagnostics, llama_stats)
+        return "".join(parts)
+    
+    @staticmethod
+    def merge_llama_stats(diagnostics: Dict, llama_stats: Dict):
+        """
+        Hedge'li çağrının ayrı stats'ını diagnostics'e ekle
+        
+        Çağıranın yazdığı anahtarlar (llama_ms, *_budget, *_cache_hit, ...) ezilmez;
+        prompt_tokens ise iki taraf toplanır.
+        """
+        for key, value in llama_stats.items():
+            if key == 'prompt_tokens':
+                diagnostics[key] = diagnostics.get(key, 0) + value
+            else:
+                diagnostics.setdefault(key, value)
+    
+    def call_llama(self, user_question: str, context: str, diagnostics: Dict,
+                   chunk_ids: Optional[List[str]], deadline: Deadline, model: str = None,
+                   session: OllamaSession = None) -> Optional[str]:
+        """
+        Llama cevabı (breaker, deadline ve HEDGE_TO_CLAUDE açıksa hedge ile)
+        
+        Returns:
+            Cevap ya da None (breaker açık, hata ya da hedge - Claude fallback'e geçilir)
+        """
+        if config.HEDGE_TO_CLAUDE and self.claude_breaker.state == "closed":
+            fn = lambda: self.generate_llama_hedged(user_question, context, diagnostics, chunk_ids,
+                                                    deadline, model, session)
+        else:
+            fn = lambda: self.generate_with_llama(user_question, context, stats=diagnostics,
+                                                  chunk_ids=chunk_ids, deadline=deadline, model=model,
+                                                  session=session)
+        return self.guarded_call(self.llama_breaker, fn, diagnostics, deadline)
+    
+    def call_claude(self, user_question: str, context: str, web_context: str, diagnostics: Dict,
+                    chunk_ids: Optional[List[str]], deadline: Deadline) -> Optional[str]:
+        """
+        Claude cevabı (breaker ve deadline ile)
+        
+        Returns:
+            Cevap ya da None (breaker açık ya da hata)
+        """
+        return self.guarded_call(
+            self.claude_breaker,
+            lambda: self.generate_with_claude(user_question, context, web_context, stats=diagnostics,
+                                              chunk_ids=chunk_ids, deadline=deadline),
+            diagnostics, deadline
+        )
+    
+    def fallback_to_claude(self, user_question: str, context: str, retrieved_docs: List[RetrievedChunk],
+                           diagnostics: Dict, chunk_ids: Optional[List[str]], deadline: Deadline,
+                           web_prefetch: Optional[Future] = None, llama_answer: str = None,
+                           llama_confidence: float = None) -> Dict:
+        """
+        Web + Claude fallback; Claude kullanılamazsa eldeki Llama cevabı döner
+        
+        Args:
+            llama_answer: Düşük confidence'lı Llama cevabı (Llama atlandıysa None)
+            llama_confidence: Llama cevabının confidence'ı (None = Claude cevabından hesapla)
+        
+        Raises:
+            BackendUnavailable: Ne Claude ne Llama cevabı var
+            DeadlineExceeded: Süre doldu ve Llama cevabı yok
+        """
+        web_results, web_context = self.collect_web_results(user_question, web_prefetch, diagnostics, deadline)
+        
+        try:
+            claude_answer = self.call_claude(user_question, context, web_context, diagnostics, chunk_ids, deadline)
+        except DeadlineExceeded:
+            if llama_answer is None:
+                raise
+            self.record_decision(diagnostics, type="deadline", stage="claude", action="skipped")
+            claude_answer = None
+        
+        if claude_answer is None:
+            if llama_answer is None:
+                raise BackendUnavailable("Llama ve Claude cevap üretemedi")
+            print("⚠️ Claude kullanılamadı - Llama cevabı döndürülüyor")
+            self.record_decision(diagnostics, type="fallback", backend="claude", action="kept_llama")
+            return self.build_result(
+                user_question, llama_answer, llama_confidence, retrieved_docs,
+                "llama", diagnostics
+            )
+        
+        if llama_confidence is None:
+            llama_confidence = self.calculate_confidence(claude_answer, retrieved_docs)
+        
+        return self.build_result(
+            user_question, claude_answer, min(llama_confidence + 0.3, 1.0), retrieved_docs,
+            "claude+web", diagnostics, web_results
+        )
+    
+    def choose_model(self, user_question: str, retrieved_docs: List[RetrievedChunk],
+                     entity_hits: List[Dict], diagnostics: Dict) -> str:
+        """Llama için küçük/büyük model seç, kararı diagnostics['model_tier']'a yaz"""
+        decision = self.model_router.classify(retrieved_docs, user_question, entity_hits)
+        diagnostics['model_tier'] = decision
+        print(f"🧠 Model: {decision['model']} ({decision['tier']})")
+        return decision['model']
+    
+    def record_model_tier(self, diagnostics: Dict, confidence: Optional[float]):
+        """Llama sonucunu tier istatistiklerine ekle (cache hit'ler latency'ye girmez)"""
+        decision = diagnostics.get('model_tier')
+        if decision is None:
+            return
+        llama_ms = None if diagnostics.get('llama_cache_hit') else diagnostics.get('llama_ms')
+        self.model_router.record(decision['tier'], llama_ms, confidence)
+    
+    def start_session_turn(self, session_id: Optional[str], model: str, diagnostics: Dict) -> Optional[OllamaSession]:
+        """
+        Oturumun Llama context'ini al (session_id None = oturumsuz, tek seferlik soru)
+        
+        OLLAMA_NUM_CTX verilmemişse modelin varsayılan penceresine bir tur bile sığmaz;
+        oturum tutulmaz, soru tek seferlik cevaplanır.
+        """
+        if not session_id:
+            return None
+        if not config.SESSION_MAX_CONTEXT_TOKENS:
+            diagnostics['session'] = {"id": session_id, "enabled": False}
+            return None
+        session = self.ollama_sessions.get(session_id, model)
+        diagnostics['session'] = {
+            "id": session_id,
+            "turn": session.turns + 1,
+            "context_tokens": len(session.context or []),
+        }
+        return session
+    
+    def finish_session_turn(self, session: Optional[OllamaSession], result: Dict) -> Dict:
+        """
+        Llama cevabı kullanıcıya gittiyse yeni context'i oturuma kaydet
+        
+        Claude'a düşülen turda Llama context'i kullanıcının görmediği cevabı içerir;
+        oturum önceki turdaki haliyle kalır. Per-turn prefill maliyeti
+        diagnostics['llama_prompt_eval_count'] / ['llama_prompt_eval_ms']'de.
+        """
+        diagnostics = result.get('diagnostics') or {}
+        context = diagnostics.pop('llama_context', None)
+        if session is None:
+            return result
+        
+        stored = result.get('method_used') == "llama" and context is not None
+        if stored:
+            self.ollama_sessions.update(session, context, diagnostics.get('llama_endpoint'))
+        diagnostics['session']['stored'] = stored
+        return result
+    
+    def check_entity_fast_path(self, user_question: str):
+        """
+        Sorudaki entity'leri bul; tam eşleşen lookup ise LLM'siz cevabı da hazırla
+        
+        Returns:
+            (entity hit'leri, direkt cevap ya da None)
+        """
+        entity_hits = self.entity_index.match(user_question) if config.USE_ENTITY_FAST_PATH else []
+        if (config.ENTITY_DIRECT_ANSWER and len(entity_hits) == 1
+                and self.entity_index.is_exact_lookup(user_question, entity_hits[0])):
+            return entity_hits, self.answer_from_entity(user_question, entity_hits[0])
+        return entity_hits, None
+    
+    def query_key(self, user_question: str, top_k: int, expand_neighbors: int = None,
+                  adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+                  use_cache: bool = True, session_id: str = None) -> str:
+        """Single-flight anahtarı: normalize soru + sonucu etkileyen parametreler (default'lar çözülmüş)"""
+        return json.dumps([
+            GenerationCache.normalize_query(user_question),
+            top_k,
+            config.NEIGHBOR_WINDOW if expand_neighbors is None else expand_neighbors,
+            config.ADAPTIVE_K if adaptive_k is None else adaptive_k,
+            mode or config.RETRIEVAL_MODE,
+            sorted(books) if books else None,
+            bool(use_cache),
+            session_id,
+        ])
+    
+    def share_result(self, result: Dict, shared: bool) -> Dict:
+        """Paylaşılan sonucu bekleyen isteğe kendi kopyası olarak ver (diagnostics'te coalesced)"""
+        if not shared:
+            return result
+        diagnostics = dict(result.get('diagnostics') or {}, coalesced=True)
+        return dict(result, diagnostics=diagnostics)
+    
+    def query(self, user_question: str, top_k: int = 5, expand_neighbors: int = None,
+              adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+              use_cache: bool = True, deadline: float = None, session_id: str = None) -> Dict:
+        """
+        run_query() + single-flight: aynı anda gelen aynı sorgular tek hesaplamayı bekler
+        
+        Args:
+            run_query() ile aynı (deadline key'e dahil değil; bekleyenler leader'ın deadline'ını paylaşır)
+        """
+        if not config.SINGLE_FLIGHT:
+            return self.run_query(user_question, top_k, expand_neighbors, adaptive_k, mode, books,
+                                  use_cache, deadline, session_id)
+        
+        key = self.query_key(user_question, top_k, expand_neighbors, adaptive_k, mode, books, use_cache,
+                             session_id)
+        result, shared = self.single_flight.do(
+            key,
+            lambda: self.run_query(user_question, top_k, expand_neighbors, adaptive_k, mode, books,
+                                   use_cache, deadline, session_id)
+        )
+        if shared:
+            print(f"🔗 Devam eden aynı sorgunun sonucu paylaşıldı: {user_question}")
+        return self.share_result(result, shared)
+    
+    def run_query(self, user_question: str, top_k: int = 5, expand_neighbors: int = None,
+                  adaptive_k: bool = None, mode: str = None, books: List[str] = None,
+                  use_cache: bool = True, deadline: float = None, session_id: str = None) -> Dict:
         """
         Hybrid RAG query - Llama -> Confidence Check -> Claude + Web Fallback
         
+        Args:
+            user_question: Kullanıcı sorusu
+            top_k: Kaç chunk alınsın
+            expand_neighbors: Hit'lere eklenecek komşu chunk sayısı (None = config)
+            adaptive_k: Similarity dağılımına göre k seç (None = config)
+            mode: Retrieval modu, "flat", "multi_query" veya "hierarchical" (None = config)
+            books: Sadece bu kitaplarda ara (None = hepsi)
+            use_cache: False ise generation cache atlanır (cevap her zaman yeniden üretilir)
+            deadline: Uçtan uca süre, saniye (None = config.REQUEST_DEADLINE, 0 = deadline yok)
+            session_id: Chat oturumu; verilirse Llama önceki turların context'i ile devam eder
+        
         Returns:
             Dict with answer, sources, confidence, method_used
+            (breaker/hedge/deadline kararları diagnostics['resilience']'ta)
+        
+        Raises:
+            DeadlineExceeded: Süre doldu ve döndürülebilecek cevap yok
+            BackendUnavailable: Hiçbir backend cevap üretemedi
         """
         print("\n" + "="*60)
         print(f"📝 Soru: {user_question}")
         print("="*60)
         
+        deadline = make_deadline(config.REQUEST_DEADLINE if deadline is None else deadline)
+        
+        # Entity fast path: "what does Prone do" gibi direkt lookup'lar
+        entity_hits, direct_result = self.check_entity_fast_path(user_question)
+        if direct_result is not None:
+            return self.log_query(direct_result)
+        
          # 0. Eğer Ollama devre dışı ise direkt Claude kullan
         if not config.USE_OLLAMA:
-            # 1) PDF context al
-            retrieved_docs = self.retrieve_context(user_question, top_k=top_k)
-            context = self.format_context(retrieved_docs)
-
-            # 2) Web araması
-            web_results = self.web_scraper.search_dnd_content(user_question, max_results=3)
-            web_context = self.web_scraper.format_web_results(web_results)
+            # 1) Web araması retrieval'a bağlı değil, retrieval ile paralel başlar
+            diagnostics = {'web_prefetch': "parallel"}
+            web_future = self.web_executor.submit(self.web_scraper.search_dnd_content, user_question, 3)
 
-            # 3) Claude cevabı
-            claude_answer = self.generate_with_claude(
-                user_question,
-                context,
-                web_context=web_context,
+            # 2) PDF context al
+            retrieved_docs, context = self.prepare_context(
+                user_question, entity_hits, top_k, expand_neighbors,
+                adaptive_k, mode, books, diagnostics
             )
+            check_deadline(deadline, "retrieval")
 
-            confidence = self.calculate_confidence(claude_answer, retrieved_docs)
-            confidence = min(confidence + 0.3, 1.0)  # Claude + web olduğu için biraz boost
-
-            return {
-                "question": user_question,
-                "answer": claude_answer,
-                "confidence": confidence,
-                "sources": [
-                    {
-                        "source": doc["metadata"]["source"],
-                        "chunk_id": doc["metadata"]["chunk_id"],
-                        "text_preview": doc["text"][:200],
-                        "similarity": doc.get("similarity", 0.0),
-                    }
-                    for doc in retrieved_docs
-                ],
-                "web_sources": [
-                    {"url": r["url"], "preview": r["text"][:200]} for r in web_results
-                ],
-                "method_used": "claude+web",
-                "web_enhanced": True,
-            }
+            # 3) Web + Claude cevabı (Claude + web olduğu için confidence'a boost)
+            return self.log_query(self.fallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics,
+                self.generation_chunk_ids(retrieved_docs, use_cache), deadline, web_future
+            ))
 
         
         # 1. RETRIEVAL
-        retrieved_docs = self.retrieve_context(user_question, top_k=top_k)
-        context = self.format_context(retrieved_docs)
+        diagnostics = {}
+        retrieved_docs, context = self.prepare_context(
+            user_question, entity_hits, top_k, expand_neighbors,
+            adaptive_k, mode, books, diagnostics
+        )
+        check_deadline(deadline, "retrieval")
+        chunk_ids = self.generation_chunk_ids(retrieved_docs, use_cache)
+        
+        # Retrieval çok zayıfsa Llama hiç çalışmaz
+        if self.route_before_generation(user_question, retrieved_docs, diagnostics):
+            return self.log_query(self.fallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline
+            ))
+        
+        # Retrieval zayıfsa web araması Llama ile paralel başlar
+        web_prefetch = self.start_web_prefetch(user_question, retrieved_docs, diagnostics)
         
-        # 2. LLAMA GENERATION
-        llama_answer = self.generate_with_llama(user_question, context)
+        # 2. LLAMA GENERATION (breaker açık, hata ya da hedge -> None)
+        model = self.choose_model(user_question, retrieved_docs, entity_hits, diagnostics)
+        session = self.start_session_turn(session_id, model, diagnostics)
+        try:
+            llama_answer = self.call_llama(user_question, context, diagnostics, chunk_ids, deadline,
+                                           model, session)
+        except DeadlineExceeded:
+            self.discard_web_prefetch(web_prefetch)
+            raise
+        
+        if llama_answer is None:
+            self.record_model_tier(diagnostics, None)
+            print("⚠️ Llama cevabı yok - Web araması + Claude fallback")
+            return self.log_query(self.finish_session_turn(session, self.fallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline, web_prefetch
+            )))
         
         # 3. CONFIDENCE CHECK
-        confidence = self.calculate_confidence(llama_answer, retrieved_docs)
+        confidence = self.calculate_confidence(llama_answer, retrieved_docs, diagnostics)
+        diagnostics['llama_confidence'] = confidence
+        self.record_model_tier(diagnostics, confidence)
         print(f"📊 Confidence: {confidence:.2f}")
         
         # 4. FALLBACK DECISION
         if confidence >= config.CONFIDENCE_THRESHOLD:
             # ✅ Yüksek confidence - Llama cevabını kullan
             print("✅ Yüksek confidence - Llama cevabı kullanılıyor")
+            self.discard_web_prefetch(web_prefetch, diagnostics)
             
-            return {
-                "question": user_question,
-                "answer": llama_answer,
-                "confidence": confidence,
-                "sources": [
-                    {
-                        "source": doc['metadata']['source'],
-                        "chunk_id": doc['metadata']['chunk_id'],
-                        "text_preview": doc['text'][:200],
-                        "similarity": doc.get('similarity', 0.0)
-                    }
-                    for doc in retrieved_docs
-                ],
-                "method_used": "llama",
-                "web_enhanced": False
-            }
+            return self.log_query(self.finish_session_turn(session, self.build_result(
+                user_question, llama_answer, confidence, retrieved_docs,
+                "llama", diagnostics
+            )))
         
         else:
             # ⚠️ Düşük confidence - Web + Claude fallback
+            # (spekülatif arama başladıysa sonucu beklenir; Claude kullanılamazsa Llama cevabı döner)
             print("⚠️ Düşük confidence - Web araması + Claude fallback")
+            return self.log_query(self.finish_session_turn(session, self.fallback_to_claude(
+                user_question, context, retrieved_docs, diagnostics, chunk_ids, deadline,
+                web_prefetch, llama_answer, confidence
+            )))
+    
+    def query_stream(self, user_question: str, top_k: int = 5, expand_neighbors: int = None,
+                     adaptive_k: bool = None, mode: str = None,
+                     books: List[str] = None, use_cache: bool = True,
+                     deadline: float = None, session_id: str = None) -> Iterator[Dict]:
+        """
+        query() ile aynı akış, ama cevap üretilirken parça parça event döndürür
+        
+        Event'ler (sırasıyla):
+            {"type": "sources", "sources": [...]}           - retrieval biter bitmez
+            {"type": "token", "text": "...", "model": ...}  - her cevap parçası
+            {"type": "fallback", "confidence": ...,         - Llama cevabı düşük confidence ya da Llama
+             "reason": ...}                                   hata verdi, gösterilen cevap Claude ile değişecek
+            {"type": "done", ...}                            - query() sonucu + type
+        
+        Hedge yok (Llama token'ları zaten kullanıcıya akıyor); breaker ve deadline aynı.
+        
+        Args:
+            query() ile aynı
+        """
+        start = time.perf_counter()
+        deadline = make_deadline(config.REQUEST_DEADLINE if deadline is None else deadline)
+        print("\n" + "="*60)
+        print(f"📝 Soru (stream): {user_question}")
+        print("="*60)
+        
+        entity_hits, direct_result = self.check_entity_fast_path(user_question)
+        if direct_result is not None:
+            yield {"type": "sources", "sources": direct_result['sources']}
+            yield {"type": "token", "text": direct_result['answer'], "model": "entity"}
+            yield dict(self.log_query(direct_result), type="done")
+            return
+        
+        diagnostics = {}
+        retrieved_docs, context = self.prepare_context(
+            user_question, entity_hits, top_k, expand_neighbors,
+            adaptive_k, mode, books, diagnostics
+        )
+        check_deadline(deadline, "retrieval")
+        chunk_ids = self.generation_chunk_ids(retrieved_docs, use_cache)
+        yield {"type": "sources", "sources": build_sources(retrieved_docs)}
+        
+        def timed(tokens: Iterator[str], model: str, key: str) -> Iterator[Dict]:
+            """Token'ları event'e çevir, ilk token süresini diagnostics'e yaz"""
+            for token in tokens:
+                if key not in diagnostics:
+                    diagnostics[key] = round((time.perf_counter() - start) * 1000, 1)
+                yield {"type": "token", "text": token, "model": model}
+        
+        confidence = None
+        llama_answer = None
+        web_prefetch = None
+        session = None
+        if config.USE_OLLAMA and not self.route_before_generation(user_question, retrieved_docs, diagnostics):
+            web_prefetch = self.start_web_prefetch(user_question, retrieved_docs, diagnostics)
+            model = self.choose_model(user_question, retrieved_docs, entity_hits, diagnostics)
+            session = self.start_session_turn(session_id, model, diagnostics)
+            if self.backend_allowed(self.llama_breaker, diagnostics):
+                llama_parts = []
+                tokens = self.guarded_stream(
+                    self.llama_breaker,
+                    self.stream_with_llama(user_question, context, stats=diagnostics,
+                                           chunk_ids=chunk_ids, deadline=deadline, model=model,
+                                           session=session),
+                    diagnostics, deadline
+                )
+                try:
+                    for event in timed(tokens, "llama", "ttft_ms"):
+                        llama_parts.append(event['text'])
+                        yield event
+                    llama_answer = "".join(llama_parts)
+                except DeadlineExceeded:
+                    self.discard_web_prefetch(web_prefetch)
+                    raise
+                except Exception:
+                    print("⚠️ Llama hatası - Web araması + Claude fallback")
+                    if llama_parts:
+                        yield {"type": "fallback", "confidence": None, "reason": "llama_error"}
             
-            # Web search
-            web_results = self.web_scraper.search_dnd_content(user_question, max_results=3)
-            web_context = self.web_scraper.format_web_results(web_results)
-            
-            # Claude with web context
-            claude_answer = self.generate_with_claude(
-                user_question, 
-                context, 
-                web_context
+            if llama_answer is None:
+                self.record_model_tier(diagnostics, None)
+            else:
+                confidence = self.calculate_confidence(llama_answer, retrieved_docs, diagnostics)
+                diagnostics['llama_confidence'] = confidence
+                self.record_model_tier(diagnostics, confidence)
+                print(f"📊 Confidence: {confidence:.2f}")
+                
+                if confidence >= config.CONFIDENCE_THRESHOLD:
+                    self.discard_web_prefetch(web_prefetch, diagnostics)
+                    yield dict(self.log_query(self.finish_session_turn(session, self.build_result(
+                        user_question, llama_answer, confidence, retrieved_docs,
+                        "llama", diagnostics
+                    ))), type="done")
+                    return
+                
+                print("⚠️ Düşük confidence - Web araması + Claude fallback")
+                yield {"type": "fallback", "confidence": confidence, "reason": "low_confidence"}
+        
+        web_results, web_context = self.collect_web_results(user_question, web_prefetch, diagnostics, deadline)
+        
+        # Fallback'te kullanıcının gördüğü yeni cevabın ilk token'ı ayrıca ölçülür
+        ttft_key = "claude_ttft_ms" if "ttft_ms" in diagnostics else "ttft_ms"
+        claude_answer = None
+        if self.backend_allowed(self.claude_breaker, diagnostics):
+            claude_parts = []
+            tokens = self.guarded_stream(
+                self.claude_breaker,
+                self.stream_with_claude(user_question, context, web_context, stats=diagnostics,
+                                        chunk_ids=chunk_ids, deadline=deadline),
+                diagnostics, deadline
             )
-            
-            # Yeni confidence (genellikle daha yüksek)
-            new_confidence = min(confidence + 0.3, 1.0)
-            
-            return {
-                "question": user_question,
-                "answer": claude_answer,
-                "confidence": new_confidence,
-                "sources": [
-                    {
-                        "source": doc['metadata']['source'],
-                        "chunk_id": doc['metadata']['chunk_id'],
-                        "text_preview": doc['text'][:200],
-                        "similarity": doc.get('similarity', 0.0)
-                    }
-                    for doc in retrieved_docs
-                ],
-                "web_sources": [
-                    {"url": r['url'], "preview": r['text'][:200]}
-                    for r in web_results
-                ],
-                "method_used": "claude+web",
-                "web_enhanced": True
-            }
\ No newline at end of file
+            try:
+                for event in timed(tokens, "claude", ttft_key):
+                    claude_parts.append(event['text'])
+                    yield event
+                claude_answer = "".join(claude_parts)
+            except Exception:
+                # Claude cevabının bir kısmı gösterildiyse Llama cevabına dönülemez
+                if claude_parts or llama_answer is None:
+                    raise
+        
+        if claude_answer is None:
+            if llama_answer is None:
+                raise BackendUnavailable("Llama ve Claude cevap üretemedi")
+            print("⚠️ Claude kullanılamadı - Llama cevabı döndürülüyor")
+            self.record_decision(diagnostics, type="fallback", backend="claude", action="kept_llama")
+            yield dict(self.log_query(self.finish_session_turn(session, self.build_result(
+                user_question, llama_answer, confidence, retrieved_docs,
+                "llama", diagnostics
+            ))), type="done")
+            return
+        
+        if confidence is None:
+            confidence = self.calculate_confidence(claude_answer, retrieved_docs)
+        
+        yield dict(self.log_query(self.finish_session_turn(session, self.build_result(
+            user_question, claude_answer, min(confidence + 0.3, 1.0), retrieved_docs,
+            "claude+web", diagnostics, web_results
+        ))), type="done")
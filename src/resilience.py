@@ -0,0 +1,221 @@
+"""
+Resilience modülü
+İstek deadline'ı, backend başına circuit breaker ve hedge kararı için TTFT takibi
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import numpy as np # type: ignore
+
+
+class DeadlineExceeded(Exception):
+    """İstek için ayrılan süre doldu"""
+
+
+class BackendUnavailable(Exception):
+    """Backend'in circuit breaker'ı açık (ya da hiç cevap üretilemedi)"""
+
+
+class Deadline:
+    """
+    Bir isteğin uçtan uca süre bütçesi
+
+    Retrieval, generation ve fallback adımları kalan süreyi buradan alır;
+    HTTP timeout'ları kalan süreyi aşmaz.
+    """
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: Toplam süre (saniye)
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Kalan süre (saniye, negatif olabilir)"""
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        """Süre dolduysa DeadlineExceeded fırlat"""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline ({self.seconds:.0f} sn) '{stage}' adımında doldu")
+
+    def timeout(self, cap: float = None, stage: str = "") -> float:
+        """
+        Bir sonraki çağrı için timeout: kalan süre (ve varsa cap) ile sınırlı
+
+        Raises:
+            DeadlineExceeded: Süre zaten dolmuşsa
+        """
+        self.check(stage)
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
+
+
+def call_timeout(deadline: Optional[Deadline], cap: float, stage: str) -> float:
+    """Tek bir backend çağrısının timeout'u: deadline varsa kalan süre ile sınırlı"""
+    return deadline.timeout(cap, stage) if deadline is not None else cap
+
+
+def make_deadline(seconds: Optional[float]) -> Optional[Deadline]:
+    """
+    İstek deadline'ı; seconds None ya da 0 ise deadline yok (None)
+
+    Deadline yokken her çağrı sadece kendi timeout'u (LLAMA_TIMEOUT, CLAUDE_TIMEOUT) ile sınırlıdır.
+    """
+    return Deadline(seconds) if seconds and seconds > 0 else None
+
+
+def check_deadline(deadline: Optional[Deadline], stage: str):
+    """Deadline varsa ve dolduysa DeadlineExceeded fırlat"""
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def deadline_expired(deadline: Optional[Deadline]) -> bool:
+    """Deadline var ve doldu mu?"""
+    return deadline is not None and deadline.expired()
+
+
+def wait_timeout(deadline: Optional[Deadline], cap: float = None) -> Optional[float]:
+    """
+    Kuyruk/future beklemesi için timeout: kalan süre (>= 0) ile cap'in küçüğü
+
+    Returns:
+        Deadline yoksa cap (None = sınırsız bekle)
+    """
+    if deadline is None:
+        return cap
+    remaining = max(deadline.remaining(), 0)
+    return min(remaining, cap) if cap is not None else remaining
+
+
+class CircuitBreaker:
+    """
+    Backend başına circuit breaker (thread-safe)
+
+    closed: normal. Art arda failure_threshold hata -> open: istekler hiç
+    gönderilmez. reset_timeout sonra half_open: tek deneme isteğine izin verilir,
+    başarılıysa closed, değilse tekrar open.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Backend adı (loglar ve metadata için)
+            failure_threshold: Açılmak için art arda hata sayısı
+            reset_timeout: Açık kalma süresi (saniye)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """İstek gönderilebilir mi? (half_open'da sadece bir deneme)"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state != "closed" or self._failures >= self.failure_threshold:
+                if self._state == "closed":
+                    print(f"🔌 Circuit breaker açıldı: {self.name} ({self._failures} hata)")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """Sonucu belirsiz biten deneme (iptal/hedge): half_open denemesini serbest bırak"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        """Durum bilgisi (/stats için)"""
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+class LatencyTracker:
+    """Son N ölçümün kayan penceresi (Llama time-to-first-token için)"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Returns:
+            q. persentil (ms), yeterli ölçüm yoksa None
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            return float(np.percentile(list(self._samples), q))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class WastedCompute:
+    """
+    Yarıda kesilen işin sayaçları (thread-safe)
+
+    Client bağlantıyı kapattığında, hedge'de ya da deadline'da iptal edilen
+    generation'ların o ana kadar harcadığı token/süre; tamamlanan generation
+    sayaçlarıyla birlikte tutulur ki oran görülebilsin.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, **amounts: float):
+        """Sayaçları artır (ör. add(llama_aborted=1, llama_tokens_discarded=42))"""
+        with self._lock:
+            for name, value in amounts.items():
+                self._counts[name] = self._counts.get(name, 0) + value
+
+    def snapshot(self) -> Dict:
+        """Sayaçlar + boşa giden Llama token oranı (/stats için)"""
+        with self._lock:
+            counts = {name: round(value, 1) for name, value in self._counts.items()}
+        discarded = counts.get('llama_tokens_discarded', 0)
+        total = counts.get('llama_tokens', 0) + discarded
+        counts['llama_discarded_ratio'] = round(discarded / total, 3) if total else 0.0
+        return counts
@@ -0,0 +1,149 @@
+"""
+Retrieval sonuç tipleri
+Pipeline içinde dict yerine __slots__'lı küçük objeler kullanılır;
+JSON'a sadece dış sınırda (API, Streamlit kaydı, cache) çevrilir.
+"""
+
+from typing import List, Dict, Any, Optional
+
+
+class RetrievedChunk:
+    """
+    Vector DB'den gelen tek bir chunk
+
+    Eski dict tabanlı kodla uyum için doc['text'], doc.get('similarity', 0.0)
+    gibi erişimler de desteklenir; yeni kod attribute erişimini kullanır.
+    """
+
+    __slots__ = (
+        'id', 'text', 'metadata', 'distance', 'similarity', 'embedding',
+        'merged_ids', 'pinned', 'compressed', 'fusion_score',
+    )
+
+    def __init__(self, id: str, text: Optional[str], metadata: Dict,
+                 distance: Optional[float] = None, similarity: Optional[float] = None,
+                 embedding: Any = None):
+        self.id = id
+        self.text = text
+        self.metadata = metadata
+        self.distance = distance
+        self.similarity = similarity
+        self.embedding = embedding
+        self.merged_ids: Optional[List[str]] = None
+        self.pinned = False
+        self.compressed = False
+        self.fusion_score: Optional[float] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """dict.get gibi; değer None ise default döner"""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def copy(self, **changes) -> "RetrievedChunk":
+        """Sığ kopya (metadata ve embedding paylaşılır)"""
+        clone = RetrievedChunk(self.id, self.text, self.metadata,
+                               self.distance, self.similarity, self.embedding)
+        clone.merged_ids = list(self.merged_ids) if self.merged_ids is not None else None
+        clone.pinned = self.pinned
+        clone.compressed = self.compressed
+        clone.fusion_score = self.fusion_score
+        for key, value in changes.items():
+            setattr(clone, key, value)
+        return clone
+
+    def __repr__(self) -> str:
+        return (f"RetrievedChunk(id={self.id!r}, source={self.metadata.get('source')!r}, "
+                f"chunk_id={self.metadata.get('chunk_id')!r}, similarity={self.similarity})")
+
+
+class SourceRef:
+    """Cevapta gösterilen kaynak (text_preview ile)"""
+
+    __slots__ = ('source', 'chunk_id', 'text_preview', 'similarity')
+
+    def __init__(self, source: str, chunk_id: Any, text_preview: str, similarity: float):
+        self.source = source
+        self.chunk_id = chunk_id
+        self.text_preview = text_preview
+        self.similarity = similarity
+
+    @classmethod
+    def from_chunk(cls, chunk: RetrievedChunk, preview_chars: int = 200) -> "SourceRef":
+        """Chunk'tan kaynak bilgisi"""
+        return cls(
+            chunk.metadata['source'],
+            chunk.metadata['chunk_id'],
+            (chunk.text or "")[:preview_chars],
+            chunk.similarity or 0.0
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def to_dict(self) -> Dict:
+        """JSON uyumlu dict"""
+        return {
+            "source": self.source,
+            "chunk_id": self.chunk_id,
+            "text_preview": self.text_preview,
+            "similarity": self.similarity,
+        }
+
+
+def format_context(docs: List[RetrievedChunk]) -> str:
+    """Chunk'ları LLM prompt'u için '[Source i: ...]' bloklarına çevir"""
+    context_parts = []
+
+    for i, doc in enumerate(docs, 1):
+        source = doc.metadata.get('source', 'Unknown')
+        chunk_id = doc.metadata.get('chunk_id', 'N/A')
+        similarity = doc.similarity or 0.0
+
+        context_parts.append(
+            f"[Source {i}: {source}, Chunk {chunk_id}, Similarity: {similarity:.2f}]\n{doc.text}"
+        )
+
+    return "\n\n---\n\n".join(context_parts)
+
+
+def build_sources(docs: List[RetrievedChunk], preview_chars: int = 200) -> List[SourceRef]:
+    """Retrieved chunk'lardan cevabın kaynak listesi"""
+    return [SourceRef.from_chunk(doc, preview_chars) for doc in docs]
+
+
+def sources_to_json(sources: List[Any]) -> List[Dict]:
+    """Kaynakları JSON uyumlu dict'lere çevir (cache'ten gelen dict'ler olduğu gibi kalır)"""
+    return [s.to_dict() if isinstance(s, SourceRef) else s for s in sources]
+
+
+def result_to_json(result: Dict) -> Dict:
+    """
+    query() sonucunu JSON uyumlu hale getir
+
+    Sadece 'sources' çevrilir; diğer alanlar zaten JSON uyumlu.
+    """
+    converted = dict(result)
+    converted['sources'] = sources_to_json(result.get('sources', []))
+    return converted
@@ -0,0 +1,127 @@
+"""
+Section index modülü
+İki seviyeli retrieval: önce section centroid'leri, sonra sadece o section'ların chunk'ları
+"""
+
+import json
+from pathlib import Path
+from typing import List, Dict, Optional
+import numpy as np # type: ignore
+from config import config
+
+
+class SectionIndex:
+    """
+    Her kitabı ardışık chunk pencerelerine (section) böler ve
+    her section için normalize edilmiş centroid vektörü tutar.
+
+    PDF text'i temizlik sırasında başlık yapısını kaybettiği için section'lar
+    sabit boyutlu chunk pencereleridir (config.SECTION_SIZE).
+    """
+
+    def __init__(self, index_dir: Optional[Path] = None):
+        """
+        Args:
+            index_dir: Index dosyalarının klasörü (varsayılan: config.index_dir())
+        """
+        index_dir = Path(index_dir or config.index_dir())
+        self.vectors_path = index_dir / "section_vectors.npy"
+        self.meta_path = index_dir / "section_index.json"
+
+        self.sections: List[Dict] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    def _load(self):
+        """Index dosyalarını yükle"""
+        if self.meta_path.exists() and self.vectors_path.exists():
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.sections = json.load(f)
+            self.vectors = np.load(self.vectors_path)
+
+    def save(self):
+        """Index'i diske kaydet"""
+        self.meta_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sections, f)
+        np.save(self.vectors_path, self.vectors)
+
+    def clear(self) -> "SectionIndex":
+        """Tüm section'ları sil (tam rebuild için)"""
+        self.sections = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        return self
+
+    def update(self, documents: List[Dict], section_size: int = None) -> "SectionIndex":
+        """
+        Embedding'li chunk'lardan section'ları oluştur
+
+        Gelen kitapların eski section'ları değiştirilir, diğerleri korunur.
+
+        Args:
+            documents: 'id', 'embedding' ve metadata'lı chunk'lar
+            section_size: Section başına chunk sayısı (None = config)
+        """
+        section_size = section_size or config.SECTION_SIZE
+
+        by_source: Dict[str, List[Dict]] = {}
+        for doc in documents:
+            by_source.setdefault(doc['metadata']['source'], []).append(doc)
+
+        # Yeniden oluşturulan kitapların eski section'larını at
+        keep = [i for i, section in enumerate(self.sections) if section['source'] not in by_source]
+        sections = [self.sections[i] for i in keep]
+        vectors = [self.vectors[i] for i in keep]
+
+        for source, source_docs in by_source.items():
+            source_docs.sort(key=lambda d: d['metadata']['chunk_id'])
+
+            for start in range(0, len(source_docs), section_size):
+                window = source_docs[start:start + section_size]
+                centroid = np.mean([doc['embedding'] for doc in window], axis=0)
+                centroid = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+                sections.append({
+                    "source": source,
+                    "first_chunk": window[0]['metadata']['chunk_id'],
+                    "last_chunk": window[-1]['metadata']['chunk_id'],
+                    "ids": [doc['id'] for doc in window]
+                })
+                vectors.append(centroid.astype(np.float32))
+
+        self.sections = sections
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        print(f"✅ Section index: {len(self.sections)} section")
+        return self
+
+    def top_sections(self, query_embedding: np.ndarray, n_sections: int,
+                     sources: List[str] = None) -> List[Dict]:
+        """
+        Query'ye en yakın section'lar
+
+        Args:
+            query_embedding: Query embedding'i
+            n_sections: Kaç section
+            sources: Sadece bu kitapların section'ları (None = hepsi)
+
+        Returns:
+            Section kayıtları ('score' eklenmiş, yüksekten düşüğe)
+        """
+        if not self.sections:
+            return []
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        query_vec = query_vec / max(np.linalg.norm(query_vec), 1e-12)
+        scores = self.vectors @ query_vec
+
+        if sources:
+            allowed = set(sources)
+            mask = np.array([section['source'] in allowed for section in self.sections])
+            scores = np.where(mask, scores, -np.inf)
+
+        top = np.argsort(-scores)[:n_sections]
+        return [
+            dict(self.sections[i], score=float(scores[i]))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
@@ -0,0 +1,144 @@
+"""
+Single-flight modülü
+Aynı anda gelen aynı sorgular tek bir hesaplamayı bekler, sonucu paylaşır
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    """Devam eden tek bir hesaplama (sync)"""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread'ler arası single-flight
+
+    Aynı key ile gelen ilk çağrı (leader) fonksiyonu çalıştırır; o bitene kadar
+    gelen diğer çağrılar bekler ve aynı sonucu (ya da aynı hatayı) alır.
+    Hesaplama bittiğinde key silinir, sonraki çağrı yeniden hesaplar (cache değil).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Args:
+            key: Sorgu anahtarı
+            fn: Hesaplama (sadece leader çalıştırır)
+
+        Returns:
+            (sonuç, başka bir çağrının sonucu mu paylaşıldı)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result, False
+
+    def stats(self) -> Dict:
+        """Leader/paylaşılan istek sayıları"""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio single-flight (tek event loop içinde)
+
+    Hesaplama ayrı bir task olarak çalışır ve bekleyenler onu shield ile bekler;
+    leader'ın isteği iptal edilse bile (client bağlantıyı kapattı) diğerleri sonucu alır.
+    Bekleyenlerin hepsi iptal edilirse hesaplama da iptal edilir (sonucu okuyan kalmadı).
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Args:
+            key: Sorgu anahtarı
+            fn: Coroutine döndüren fonksiyon (sadece leader çağırır)
+
+        Returns:
+            (sonuç, başka bir çağrının sonucu mu paylaşıldı)
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+
+    def _finished(self, key: str, task: asyncio.Task):
+        """Key'i sil; herkes iptal ettiyse hatayı 'never retrieved' uyarısı olmadan yut"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        """Leader/paylaşılan istek sayıları"""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._tasks),
+        }
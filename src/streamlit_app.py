@@ -5,6 +5,7 @@ import streamlit as st # type: ignore
 from rag_pipeline_hybrid import HybridRAGPipeline
 from config import config
 import time
+import uuid
 
 # Sayfa konfigürasyonu
 st.set_page_config(
@@ -61,6 +62,10 @@ st.markdown("""
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+# Takip soruları aynı Llama oturumunda devam eder (sunucudaki context)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if 'rag_pipeline' not in st.session_state:
     with st.spinner("🚀 RAG Pipeline yükleniyor..."):
         st.session_state.rag_pipeline = HybridRAGPipeline()
@@ -109,6 +114,8 @@ with st.sidebar:
     # Clear chat
     if st.button("🗑️ Sohbeti Temizle"):
         st.session_state.chat_history = []
+        st.session_state.rag_pipeline.ollama_sessions.clear(st.session_state.session_id)
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()
 
 # Main chat area
@@ -195,7 +202,9 @@ if submit_button and user_input:
     with st.spinner("🤔 Düşünüyorum..."):
         # Query RAG
         start_time = time.time()
-        result = st.session_state.rag_pipeline.query(user_input, top_k=top_k)
+        result = st.session_state.rag_pipeline.query(
+            user_input, top_k=top_k, session_id=st.session_state.session_id
+        )
         elapsed_time = time.time() - start_time
         
         # Add to history
@@ -4,11 +4,13 @@ Week 4 - Advanced Features
 """
 import streamlit as st  # type: ignore
 from rag_pipeline_hybrid import HybridRAGPipeline
+from retrieval_types import sources_to_json
 from config import config
 import pandas as pd  # type: ignore
 import plotly.graph_objects as go  # type: ignore
 import time
 import json
+import uuid
 from datetime import datetime
 from pathlib import Path
 
@@ -76,6 +78,10 @@ if 'chat_history' not in st.session_state:
     # Uygulama ilk açıldığında DB'deki sohbet geçmişini yükle
     st.session_state.chat_history = get_chat_history()
 
+# Takip soruları aynı Llama oturumunda devam eder (sunucudaki context)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if 'rag_pipeline' not in st.session_state:
     with st.spinner("🚀 RAG Pipeline yükleniyor..."):
         try:
@@ -100,6 +106,12 @@ with st.sidebar:
         help="Vector DB'den kaç chunk alınsın?"
     )
     
+    adaptive_k = st.checkbox(
+        "Adaptive Chunk Sayısı",
+        value=config.ADAPTIVE_K,
+        help="Chunk sayısını similarity dağılımına göre otomatik seç (slider yok sayılır)"
+    )
+    
     confidence_threshold = st.slider(
         "Confidence Threshold",
         min_value=0.5,
@@ -109,6 +121,12 @@ with st.sidebar:
         help="Bu değerin altında web araması yapılır"
     )
     
+    stream_answer = st.checkbox(
+        "Cevabı Canlı Göster",
+        value=True,
+        help="Cevap üretilirken token token göster (streaming)"
+    )
+    
     show_sources = st.checkbox("Kaynakları Göster", value=True)
     show_confidence = st.checkbox("Confidence Skorunu Göster", value=True)
     show_response_time = st.checkbox("Response Time Göster", value=True)
@@ -195,6 +213,9 @@ with st.sidebar:
     if st.button("🗑️ Sohbeti Temizle", use_container_width=True):
         st.session_state.chat_history = []   # UI state'i temizle
         clear_history()                      # DB'deki kayıtları temizle
+        # Llama oturumunu da sıfırla (yeni sohbet önceki context'i görmesin)
+        st.session_state.rag_pipeline.ollama_sessions.clear(st.session_state.session_id)
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()                           # Sayfayı yenile
 
 # Main chat area
@@ -221,8 +242,8 @@ with chat_container:
             else "confidence-low"
         )
         
-        method_icon = "🦙" if message['method'] == 'llama' else "☁️"
-        method_text = "Llama (Local)" if message['method'] == 'llama' else "Claude + Web"
+        method_icon = {"llama": "🦙", "entity": "📖"}.get(message['method'], "☁️")
+        method_text = {"llama": "Llama (Local)", "entity": "Kitap (Direkt)"}.get(message['method'], "Claude + Web")
         
         bot_message = f"""
         <div class="chat-message bot-message">
@@ -287,13 +308,61 @@ with st.form(key="chat_form", clear_on_submit=True):
     with col2:
         submit_button = st.form_submit_button("Gönder 🚀", use_container_width=True)
 
+def run_streaming_query(question: str) -> dict:
+    """
+    query_stream event'lerini okuyup cevabı geldikçe ekrana yaz
+    
+    Returns:
+        query() ile aynı formatta sonuç
+    """
+    status = st.empty()
+    answer_box = st.empty()
+    status.info("🔍 Kaynaklar aranıyor...")
+    
+    answer = ""
+    sources = []
+    result = {}
+    
+    for event in st.session_state.rag_pipeline.query_stream(
+        question,
+        top_k=top_k,
+        adaptive_k=adaptive_k,
+        session_id=st.session_state.session_id
+    ):
+        if event['type'] == 'sources':
+            sources = event['sources']
+            status.info(f"✍️ Cevap yazılıyor... ({len(sources)} kaynak)")
+        elif event['type'] == 'token':
+            answer += event['text']
+            answer_box.markdown(answer + "▌")
+        elif event['type'] == 'fallback':
+            # Düşük confidence - gösterilen Llama cevabı Claude cevabıyla değişecek
+            answer = ""
+            answer_box.empty()
+            status.warning("⚠️ Düşük confidence - Web + Claude ile yeniden yazılıyor...")
+        elif event['type'] == 'done':
+            result = event
+    
+    status.empty()
+    answer_box.markdown(answer)
+    return dict(result, sources=result.get('sources', sources))
+
+
 if submit_button and user_input:
     # Add user message
     with st.spinner("🤔 Düşünüyorum..."):
         try:
             # Query RAG
             start_time = time.time()
-            result = st.session_state.rag_pipeline.query(user_input, top_k=top_k)
+            if stream_answer:
+                result = run_streaming_query(user_input)
+            else:
+                result = st.session_state.rag_pipeline.query(
+                    user_input,
+                    top_k=top_k,
+                    adaptive_k=adaptive_k,
+                    session_id=st.session_state.session_id
+                )
             elapsed_time = time.time() - start_time
             
             # Yeni Q&A kaydı
@@ -302,7 +371,7 @@ if submit_button and user_input:
                 'answer': result['answer'],
                 'confidence': result['confidence'],
                 'method': result['method_used'],
-                'sources': result.get('sources', []),
+                'sources': sources_to_json(result.get('sources', [])),
                 'web_enhanced': result.get('web_enhanced', False),
                 'web_sources': result.get('web_sources', []),
                 'response_time': elapsed_time
@@ -390,9 +459,13 @@ with st.expander("📊 Analytics Dashboard"):
         method_counts = pd.Series(methods).value_counts()
         
         fig2 = go.Figure(data=[go.Pie(
-            labels=['Llama (Local)', 'Claude + Web'],
-            values=[method_counts.get('llama', 0), method_counts.get('claude+web', 0)],
-            marker_colors=['#00d4aa', '#4a9eff']
+            labels=['Llama (Local)', 'Claude + Web', 'Kitap (Direkt)'],
+            values=[
+                method_counts.get('llama', 0),
+                method_counts.get('claude+web', 0),
+                method_counts.get('entity', 0)
+            ],
+            marker_colors=['#00d4aa', '#4a9eff', '#ffa500']
         )])
         
         fig2.update_layout(
@@ -3,16 +3,139 @@ Vector Database modülü
 ChromaDB ile embedding'leri saklar ve arar
 """
 
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import chromadb # type: ignore
 from chromadb.config import Settings # type: ignore
-from typing import List, Dict
+from typing import List, Dict, Optional
 import numpy as np # type: ignore
 from config import config
+from chunk_index import ChunkIndex
+from chunk_store import ChunkStore
+from retrieval_types import RetrievedChunk
+
+
+def _include_fields(include_embeddings: bool, with_distances: bool = True,
+                    with_documents: bool = True) -> List[str]:
+    """ChromaDB include listesi"""
+    include = ["metadatas"]
+    if with_documents:
+        include.append("documents")
+    if with_distances:
+        include.append("distances")
+    if include_embeddings:
+        include.append("embeddings")
+    return include
+
+
+def _source_filter(sources: Optional[List[str]]) -> Optional[Dict]:
+    """Kitap filtresi (metadata 'source' alanı)"""
+    if not sources:
+        return None
+    if len(sources) == 1:
+        return {"source": sources[0]}
+    return {"source": {"$in": list(sources)}}
+
+
+def format_query_results(results: Dict, row: int, include_embeddings: bool) -> List[RetrievedChunk]:
+    """ChromaDB query sonucunun bir satırını RetrievedChunk listesine çevir"""
+    formatted_results = []
+    documents = results.get('documents')
+    distances = results.get('distances')
+    for i in range(len(results['ids'][row])):
+        # Distance'ı similarity'ye çevir
+        distance = distances[row][i] if distances else None
+        similarity = None
+        if distance is not None:
+            # ChromaDB L2 distance kullanır, 0-2 arası normalize edelim
+            similarity = max(0, 1 - (distance / 2))
+        
+        formatted_results.append(RetrievedChunk(
+            results['ids'][row][i],
+            documents[row][i] if documents else None,
+            results['metadatas'][row][i],
+            distance=distance,
+            similarity=similarity,
+            embedding=np.asarray(results['embeddings'][row][i]) if include_embeddings else None
+        ))
+    
+    return formatted_results
+
+
+def format_get_results(results: Dict, include_embeddings: bool) -> Dict[str, RetrievedChunk]:
+    """ChromaDB get sonucunu id -> RetrievedChunk sözlüğüne çevir"""
+    found = {}
+    documents = results.get('documents')
+    for i, doc_id in enumerate(results['ids']):
+        found[doc_id] = RetrievedChunk(
+            doc_id,
+            documents[i] if documents else None,
+            results['metadatas'][i],
+            embedding=np.asarray(results['embeddings'][i]) if include_embeddings else None
+        )
+    return found
+
+
+def score_documents(query_embedding: np.ndarray, docs: List[RetrievedChunk]):
+    """
+    Embedding'i olan document'lara search ile aynı ölçekte skor yaz
+    
+    ChromaDB'nin L2 (squared) distance'ı ve aynı similarity dönüşümü kullanılır.
+    """
+    query_vec = np.asarray(query_embedding)
+    for doc in docs:
+        if doc.embedding is None:
+            continue
+        distance = float(np.sum((query_vec - doc.embedding) ** 2))
+        doc.distance = distance
+        doc.similarity = max(0, 1 - (distance / 2))
+
+
+def open_chunk_store(store_dir: Path) -> Optional[ChunkStore]:
+    """config.USE_CHUNK_STORE açıksa ve store diskte varsa aç"""
+    if not config.USE_CHUNK_STORE:
+        return None
+    store = ChunkStore(store_dir)
+    return store if store.available else None
+
+
+def materialize_texts(docs: List[RetrievedChunk], chunk_store: Optional[ChunkStore], get_by_ids) -> int:
+    """
+    Text'i henüz okunmamış document'ların text'ini doldur
+
+    Önce chunk store'a bakılır; store'da olmayanlar tek bir get_by_ids ile gelir.
+
+    Returns:
+        Text'i doldurulan document sayısı
+    """
+    pending: Dict[str, List[RetrievedChunk]] = {}
+    for doc in docs:
+        if doc.text is None:
+            pending.setdefault(doc.id, []).append(doc)
+
+    if not pending:
+        return 0
+
+    texts = chunk_store.get_texts(list(pending)) if chunk_store is not None else {}
+    missing = [doc_id for doc_id in pending if doc_id not in texts]
+    if missing:
+        texts.update({doc.id: doc.text for doc in get_by_ids(missing)})
+
+    for doc_id, same_docs in pending.items():
+        for doc in same_docs:
+            doc.text = texts.get(doc_id, "")
+
+    return len(pending)
 
 
 class VectorDB:
     """ChromaDB wrapper sınıfı"""
     
+    score_documents = staticmethod(score_documents)
+    
     def __init__(self, collection_name: str = "dnd_knowledge"):
         """
         Args:
@@ -29,6 +152,15 @@ class VectorDB:
             metadata={"description": "D&D 5e knowledge base"}
         )
         
+        # Index/store dosyaları flat layout'un klasöründe (sharded build'inkiler ayrı)
+        self.index_dir = config.index_dir(sharded=False)
+        
+        # (source, chunk_id) -> id komşuluk index'i (ingest'te oluşturulur)
+        self.chunk_index = ChunkIndex(self.index_dir / "chunk_index.json")
+        
+        # Lazy text için sıkıştırılmış chunk store (yoksa text ChromaDB'den gelir)
+        self.chunk_store = open_chunk_store(self.index_dir)
+        
         print(f"✅ ChromaDB hazır: {collection_name}")
         print(f"📊 Mevcut document sayısı: {self.collection.count()}")
     
@@ -45,6 +177,8 @@ class VectorDB:
         
         # ChromaDB formatına çevir
         ids = [f"doc_{i}" for i in range(len(documents))]
+        for doc, doc_id in zip(documents, ids):
+            doc['id'] = doc_id
         texts = [doc['text'] for doc in documents]
         embeddings = [doc['embedding'].tolist() for doc in documents]
         metadatas = [doc['metadata'] for doc in documents]
@@ -65,9 +199,19 @@ class VectorDB:
             
             print(f"   ✅ {end_idx}/{len(documents)} eklendi")
         
+        # Komşuluk index'ini güncelle
+        self.chunk_index.update(documents)
+        self.chunk_index.save()
+        
+        # Id'ler her ingest'te doc_0'dan başladığı için store da yeniden yazılır
+        if config.USE_CHUNK_STORE:
+            self.chunk_store = ChunkStore(self.index_dir).build(documents)
+        
         print(f"✅ Toplam {self.collection.count()} document database'de")
     
-    def search(self, query_text: str, n_results: int = 5, query_embedding: np.ndarray = None) -> List[Dict]:
+    def search(self, query_text: str, n_results: int = 5, query_embedding: np.ndarray = None,
+               include_embeddings: bool = False, sources: List[str] = None,
+               stats: Dict = None, lazy_text: bool = False) -> List[RetrievedChunk]:
         """
         Query text'ine benzer document'ları ara
         
@@ -75,43 +219,114 @@ class VectorDB:
             query_text: Aranacak text
             n_results: Kaç sonuç döndürülsün (top-k)
             query_embedding: Önceden hazırlanmış query embedding (opsiyonel)
+            include_embeddings: Sonuçlara chunk embedding'lerini de ekle (MMR için)
+            sources: Sadece bu kitaplarda ara (None = hepsi)
+            stats: Verilirse arama süresi buraya yazılır
+            lazy_text: True ise (chunk store varsa) text None döner, materialize() ile okunur
             
         Returns:
             En benzer document'ların listesi
         """
+        include = _include_fields(include_embeddings, with_documents=not self._lazy(lazy_text))
+        start = time.perf_counter()
+        
         # Eğer embedding verilmişse onu kullan
         if query_embedding is not None:
             results = self.collection.query(
                 query_embeddings=[query_embedding.tolist()],
-                n_results=n_results
+                n_results=n_results,
+                where=_source_filter(sources),
+                include=include
             )
         else:
             # Text ile ara (ChromaDB kendi embedding'ini kullanır)
             results = self.collection.query(
                 query_texts=[query_text],
-                n_results=n_results
+                n_results=n_results,
+                where=_source_filter(sources),
+                include=include
             )
         
-        # Format results
-        formatted_results = []
-        for i in range(len(results['ids'][0])):
-            # Distance'ı similarity'ye çevir
-            distance = results['distances'][0][i] if 'distances' in results else None
-            similarity = None
-            if distance is not None:
-                # ChromaDB L2 distance kullanır, 0-2 arası normalize edelim
-                similarity = max(0, 1 - (distance / 2))
+        if stats is not None:
+            stats['search_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        
+        return format_query_results(results, 0, include_embeddings)
+    
+    def search_batch(self, query_embeddings: List[np.ndarray], n_results: int = 5,
+                     include_embeddings: bool = False, sources: List[str] = None,
+                     stats: Dict = None, lazy_text: bool = False) -> List[List[RetrievedChunk]]:
+        """
+        Birden fazla query embedding'ini tek bir ChromaDB çağrısında ara
+        
+        Args:
+            query_embeddings: Query embedding'leri
+            n_results: Her query için kaç sonuç
+            include_embeddings: Sonuçlara chunk embedding'lerini de ekle
+            sources: Sadece bu kitaplarda ara (None = hepsi)
+            stats: Verilirse arama süresi buraya yazılır
+            lazy_text: True ise (chunk store varsa) text None döner
+            
+        Returns:
+            Her query için sonuç listesi (query sırasıyla)
+        """
+        start = time.perf_counter()
+        
+        results = self.collection.query(
+            query_embeddings=[np.asarray(e).tolist() for e in query_embeddings],
+            n_results=n_results,
+            where=_source_filter(sources),
+            include=_include_fields(include_embeddings, with_documents=not self._lazy(lazy_text))
+        )
+        
+        if stats is not None:
+            stats['search_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        
+        return [
+            format_query_results(results, row, include_embeddings)
+            for row in range(len(query_embeddings))
+        ]
+    
+    def get_by_ids(self, ids: List[str], include_embeddings: bool = False,
+                   lazy_text: bool = False) -> List[RetrievedChunk]:
+        """
+        ID listesiyle document'ları tek seferde getir (similarity search yok)
+        
+        Args:
+            ids: Document id'leri
+            include_embeddings: Embedding'leri de getir
+            lazy_text: True ise (chunk store varsa) text None döner
             
-            doc = {
-                'id': results['ids'][0][i],
-                'text': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': distance,
-                'similarity': similarity
-            }
-            formatted_results.append(doc)
+        Returns:
+            Document'lar (verilen id sırasıyla, bulunamayanlar atlanır)
+        """
+        if not ids:
+            return []
         
-        return formatted_results
+        results = self.collection.get(
+            ids=ids,
+            include=_include_fields(include_embeddings, with_distances=False,
+                                    with_documents=not self._lazy(lazy_text))
+        )
+        found = format_get_results(results, include_embeddings)
+        
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+    
+    def _lazy(self, lazy_text: bool) -> bool:
+        """Text gerçekten ertelenebilir mi? (store yoksa ChromaDB'den okunmalı)"""
+        return lazy_text and self.chunk_store is not None
+    
+    def materialize(self, docs: List[RetrievedChunk]) -> int:
+        """
+        Lazy gelen document'ların text'ini doldur (sadece context/kaynaklara girecekler için)
+        
+        Returns:
+            Text'i okunan document sayısı
+        """
+        return materialize_texts(docs, self.chunk_store, self.get_by_ids)
+    
+    def count(self) -> int:
+        """Toplam document sayısı"""
+        return self.collection.count()
     
     def clear(self):
         """Database'i temizle"""
@@ -123,7 +338,301 @@ class VectorDB:
         return {
             "collection_name": self.collection.name,
             "document_count": self.collection.count(),
-            "storage_path": str(config.VECTOR_DB_DIR)
+            "storage_path": str(config.VECTOR_DB_DIR),
+            "index_dir": str(self.index_dir)
+        }
+
+
+class ShardedVectorDB:
+    """
+    Kitap başına bir ChromaDB collection'ı (shard)
+    
+    Aramalar seçili shard'lara thread pool üzerinden paralel dağıtılır ve
+    top-k sonuçlar birleştirilir. Tüm shard'lar aynı embedding modeli ve aynı
+    L2 uzayını kullandığı için distance'lar doğrudan karşılaştırılabilir;
+    similarity dönüşümü de tek bir yerde (format_query_results) yapılır.
+    """
+    
+    score_documents = staticmethod(score_documents)
+    
+    def __init__(self, base_name: str = "dnd_knowledge", lazy_load: bool = None,
+                 max_workers: int = None):
+        """
+        Args:
+            base_name: Shard collection'larının ortak ön eki
+            lazy_load: True ise shard'lar ilk aramada açılır (None = config)
+            max_workers: Paralel arama thread sayısı (None = config)
+        """
+        self.client = chromadb.PersistentClient(
+            path=str(config.VECTOR_DB_DIR)
+        )
+        self.prefix = f"{base_name}__"
+        self.index_dir = config.index_dir(sharded=True)
+        self.chunk_index = ChunkIndex(self.index_dir / "chunk_index.json")
+        self.chunk_store = open_chunk_store(self.index_dir)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.SHARD_SEARCH_WORKERS,
+            thread_name_prefix="shard-search"
+        )
+        
+        self._shards: Dict[str, object] = {}
+        # Shard adı -> document sayısı (n_results sınırı için, her aramada count() çağrılmaz)
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        
+        # Shard adı -> kitap adı (chunk index'teki kitaplardan, shard'ları açmadan)
+        existing = {getattr(c, 'name', c) for c in self.client.list_collections()}
+        self.shard_sources: Dict[str, str] = {
+            self.shard_name(source): source
+            for source in self.chunk_index.sources
+            if self.shard_name(source) in existing
+        }
+        
+        if not (config.SHARD_LAZY_LOAD if lazy_load is None else lazy_load):
+            for name in self.shard_sources:
+                self._get_shard(name)
+        
+        print(f"✅ Sharded ChromaDB hazır: {len(self.shard_sources)} shard")
+    
+    def shard_name(self, source: str) -> str:
+        """Kitap adından geçerli bir collection adı üret"""
+        slug = re.sub(r'[^a-zA-Z0-9_-]+', '_', Path(source).stem).strip('_-')[:40] or "book"
+        return f"{self.prefix}{slug}"
+    
+    def _get_shard(self, name: str):
+        """Shard'ı aç (lazy) ve cache'le"""
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = self.client.get_collection(name=name)
+            return self._shards[name]
+    
+    def _shard_count(self, name: str) -> int:
+        """Shard'daki document sayısı (cache'li, rebuild'de yenilenir)"""
+        count = self._counts.get(name)
+        if count is None:
+            count = self._get_shard(name).count()
+            with self._lock:
+                self._counts[name] = count
+        return count
+    
+    def select_shards(self, sources: List[str] = None) -> List[str]:
+        """Aranacak shard'lar (None = hepsi)"""
+        if not sources:
+            return list(self.shard_sources)
+        wanted = set(sources)
+        return [name for name, source in self.shard_sources.items() if source in wanted]
+    
+    def _query_shard(self, name: str, query_embeddings: List[list], n_results: int,
+                     include_embeddings: bool, with_documents: bool = True):
+        """Tek shard'da arama (thread pool içinde çalışır)"""
+        start = time.perf_counter()
+        shard = self._get_shard(name)
+        results = shard.query(
+            query_embeddings=query_embeddings,
+            n_results=min(n_results, max(self._shard_count(name), 1)),
+            include=_include_fields(include_embeddings, with_documents=with_documents)
+        )
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        return name, results, elapsed_ms
+    
+    def search_batch(self, query_embeddings: List[np.ndarray], n_results: int = 5,
+                     include_embeddings: bool = False, sources: List[str] = None,
+                     stats: Dict = None, lazy_text: bool = False) -> List[List[RetrievedChunk]]:
+        """
+        Seçili shard'larda scatter-gather arama
+        
+        Args:
+            query_embeddings: Query embedding'leri
+            n_results: Her query için kaç sonuç
+            include_embeddings: Sonuçlara chunk embedding'lerini de ekle
+            sources: Sadece bu kitapların shard'ları (None = hepsi)
+            stats: Verilirse toplam ve shard bazlı süreler buraya yazılır
+            lazy_text: True ise (chunk store varsa) text None döner
+            
+        Returns:
+            Her query için birleştirilmiş top-k sonuçlar
+        """
+        start = time.perf_counter()
+        embeddings = [np.asarray(e).tolist() for e in query_embeddings]
+        
+        with_documents = not self._lazy(lazy_text)
+        futures = [
+            self.executor.submit(self._query_shard, name, embeddings, n_results,
+                                 include_embeddings, with_documents)
+            for name in self.select_shards(sources)
+        ]
+        
+        merged: List[List[RetrievedChunk]] = [[] for _ in query_embeddings]
+        shard_latency = {}
+        
+        for future in futures:
+            name, results, elapsed_ms = future.result()
+            shard_latency[self.shard_sources.get(name, name)] = elapsed_ms
+            for row in range(len(query_embeddings)):
+                merged[row].extend(format_query_results(results, row, include_embeddings))
+        
+        # Her shard kendi top-k'sını döndürür, global top-k distance'a göre seçilir
+        for row in range(len(merged)):
+            merged[row].sort(key=lambda d: d['distance'] if d['distance'] is not None else float('inf'))
+            merged[row] = merged[row][:n_results]
+        
+        if stats is not None:
+            stats['search_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            stats['shard_latency_ms'] = shard_latency
+        
+        return merged
+    
+    def search(self, query_text: str, n_results: int = 5, query_embedding: np.ndarray = None,
+               include_embeddings: bool = False, sources: List[str] = None,
+               stats: Dict = None, lazy_text: bool = False) -> List[RetrievedChunk]:
+        """
+        VectorDB.search ile aynı arayüz (query_embedding zorunlu)
+        """
+        if query_embedding is None:
+            raise ValueError("ShardedVectorDB.search query_embedding gerektirir")
+        
+        return self.search_batch(
+            [query_embedding],
+            n_results=n_results,
+            include_embeddings=include_embeddings,
+            sources=sources,
+            stats=stats,
+            lazy_text=lazy_text
+        )[0]
+    
+    def get_by_ids(self, ids: List[str], include_embeddings: bool = False,
+                   lazy_text: bool = False) -> List[RetrievedChunk]:
+        """
+        ID listesiyle document'ları getir (id'ler '<shard>#<n>' formatında)
+        """
+        if not ids:
+            return []
+        
+        by_shard: Dict[str, List[str]] = {}
+        for doc_id in ids:
+            by_shard.setdefault(doc_id.rsplit('#', 1)[0], []).append(doc_id)
+        
+        found = {}
+        for name, shard_ids in by_shard.items():
+            if name not in self.shard_sources:
+                continue
+            results = self._get_shard(name).get(
+                ids=shard_ids,
+                include=_include_fields(include_embeddings, with_distances=False,
+                                        with_documents=not self._lazy(lazy_text))
+            )
+            found.update(format_get_results(results, include_embeddings))
+        
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+    
+    def _lazy(self, lazy_text: bool) -> bool:
+        """Text gerçekten ertelenebilir mi? (store yoksa ChromaDB'den okunmalı)"""
+        return lazy_text and self.chunk_store is not None
+    
+    def materialize(self, docs: List[RetrievedChunk]) -> int:
+        """Lazy gelen document'ların text'ini doldur (VectorDB.materialize ile aynı)"""
+        return materialize_texts(docs, self.chunk_store, self.get_by_ids)
+    
+    def rebuild_shard(self, source: str, documents: List[Dict]):
+        """
+        Tek bir kitabın shard'ını sıfırdan oluştur (diğer shard'lara dokunmaz)
+        
+        Args:
+            source: Kitap adı (PDF dosya adı)
+            documents: O kitabın embedding'li chunk'ları
+        """
+        name = self.shard_name(source)
+        
+        with self._lock:
+            if name in self.shard_sources:
+                self.client.delete_collection(name)
+                self._shards.pop(name, None)
+                self._counts.pop(name, None)
+                print(f"🗑️ Shard '{name}' silindi")
+            
+            collection = self.client.create_collection(
+                name=name,
+                metadata={"description": "D&D 5e knowledge base shard", "source": source}
+            )
+            self._shards[name] = collection
+            self.shard_sources[name] = source
+        
+        ids = [f"{name}#{i}" for i in range(len(documents))]
+        for doc, doc_id in zip(documents, ids):
+            doc['id'] = doc_id
+        
+        batch_size = 1000
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            collection.add(
+                ids=ids[i:i + batch_size],
+                documents=[doc['text'] for doc in batch],
+                embeddings=[doc['embedding'].tolist() for doc in batch],
+                metadatas=[doc['metadata'] for doc in batch]
+            )
+        
+        self.chunk_index.update(documents)
+        self.chunk_index.save()
+        
+        # Eski '<shard>#<n>' id'leri store'da başka metinlere işaret ediyor; bir sonraki
+        # rebuild_chunk_store'a kadar bu shard'ın text'leri ChromaDB'den okunur
+        if self.chunk_store is not None:
+            dropped = self.chunk_store.invalidate(f"{name}#")
+            if dropped:
+                print(f"   📦 Chunk store'dan {dropped} eski chunk düşürüldü")
+        
+        count = collection.count()
+        with self._lock:
+            self._counts[name] = count
+        print(f"✅ Shard '{name}': {count} document")
+    
+    def rebuild_chunk_store(self, documents: List[Dict] = None):
+        """
+        Chunk store'u tüm shard'lardan yeniden yaz (shard rebuild'lerinden sonra)
+        
+        Args:
+            documents: Tüm shard'ların chunk'ları (None ise get_all_documents)
+        """
+        if not config.USE_CHUNK_STORE:
+            return
+        self.chunk_store = ChunkStore(self.index_dir).build(documents or self.get_all_documents())
+    
+    def get_all_documents(self) -> List[RetrievedChunk]:
+        """Tüm shard'lardaki chunk'lar (embedding'siz, ingest sonrası index'ler için)"""
+        documents = []
+        for name in self.shard_sources:
+            results = self._get_shard(name).get(include=["documents", "metadatas"])
+            documents.extend(format_get_results(results, include_embeddings=False).values())
+        return documents
+    
+    def count(self) -> int:
+        """Toplam document sayısı"""
+        return sum(self._shard_count(name) for name in self.shard_sources)
+    
+    def clear(self):
+        """Tüm shard'ları sil"""
+        with self._lock:
+            for name in list(self.shard_sources):
+                self.client.delete_collection(name)
+                source = self.shard_sources.pop(name)
+                self._shards.pop(name, None)
+                self._counts.pop(name, None)
+                self.chunk_index.remove_source(source)
+        self.chunk_index.save()
+        print("🗑️ Tüm shard'lar silindi")
+    
+    def get_stats(self) -> Dict:
+        """Database istatistikleri"""
+        shards = {
+            source: self._get_shard(name).count()
+            for name, source in self.shard_sources.items()
+        }
+        return {
+            "collection_name": f"{self.prefix}*",
+            "document_count": sum(shards.values()),
+            "shards": shards,
+            "storage_path": str(config.VECTOR_DB_DIR),
+            "index_dir": str(self.index_dir)
         }
 
 
@@ -1,6 +1,7 @@
+import asyncio
 import requests
 from bs4 import BeautifulSoup # type: ignore
-from typing import List, Dict
+from typing import List, Dict, Optional
 import time
 from config import config
 
@@ -31,30 +32,16 @@ class WebScraper:
         
         print(f"🌐 Web araması: {query}")
         
-        
-        search_urls = [
-            f"https://www.dndbeyond.com/search?q={query.replace(' ', '+')}",
-            f"https://roll20.net/compendium/dnd5e/{query.replace(' ', '%20')}",
-        ]
-        
         results = []
         
-        for url in search_urls[:max_results]:
+        for url in self.search_urls(query)[:max_results]:
             try:
                 response = requests.get(url, headers=self.headers, timeout=10)
                 
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Text extraction (site'a göre özelleştirin)
-                    text = soup.get_text(separator=' ', strip=True)
-                    
-                    # İlk 1000 karakteri al
-                    text = text[:1000]
-                    
                     results.append({
                         'url': url,
-                        'text': text,
+                        'text': self.extract_text(response.content),
                         'source': 'web'
                     })
                 
@@ -71,6 +58,57 @@ class WebScraper:
         print(f"✅ {len(results)} web sonucu bulundu")
         return results
     
+    def search_urls(self, query: str) -> List[str]:
+        """Sorgu için taranacak sayfalar"""
+        return [
+            f"https://www.dndbeyond.com/search?q={query.replace(' ', '+')}",
+            f"https://roll20.net/compendium/dnd5e/{query.replace(' ', '%20')}",
+        ]
+    
+    def extract_text(self, content: bytes) -> str:
+        """HTML'den text çıkar (site'a göre özelleştirin), ilk 1000 karakter"""
+        soup = BeautifulSoup(content, 'html.parser')
+        return soup.get_text(separator=' ', strip=True)[:1000]
+    
+    async def asearch_dnd_content(self, query: str, client, max_results: int = 3,
+                                  executor=None) -> List[Dict]:
+        """
+        search_dnd_content'in async hali
+        
+        Sayfalar farklı sitelerde olduğu için paralel çekilir (site başına tek istek,
+        sleep'e gerek yok); HTML parse CPU işi olduğu için executor'da yapılır.
+        
+        Args:
+            query: Arama sorgusu
+            client: Paylaşılan httpx.AsyncClient
+            max_results: Maksimum sonuç sayısı
+            executor: HTML parse için executor (None = default)
+        """
+        if query in self.cache:
+            print(f"📦 Cache'den alındı: {query}")
+            return self.cache[query]
+        
+        print(f"🌐 Web araması (async): {query}")
+        loop = asyncio.get_running_loop()
+        
+        async def fetch(url: str) -> Optional[Dict]:
+            try:
+                response = await client.get(url, headers=self.headers, timeout=10)
+                if response.status_code != 200:
+                    return None
+                text = await loop.run_in_executor(executor, self.extract_text, response.content)
+                return {'url': url, 'text': text, 'source': 'web'}
+            except Exception as e:
+                print(f"⚠️ Web scraping hatası: {e}")
+                return None
+        
+        fetched = await asyncio.gather(*(fetch(url) for url in self.search_urls(query)[:max_results]))
+        results = [result for result in fetched if result is not None]
+        
+        self.cache[query] = results
+        print(f"✅ {len(results)} web sonucu bulundu")
+        return results
+    
     def format_web_results(self, results: List[Dict]) -> str:
         """Web sonuçlarını formatlı string'e çevir"""
         formatted = []
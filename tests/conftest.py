@@ -0,0 +1,8 @@
+"""
+Test ortamı: modüller src/ altında düz import edilir (from config import config)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -0,0 +1,77 @@
+"""ChunkStore: yazılan chunk'lar aynen okunur, eksik id'ler atlanır"""
+
+from config import config
+from chunk_store import ChunkStore
+
+
+def make_documents():
+    documents = []
+    for source in ["PHB.pdf", "DMG.pdf"]:
+        for chunk_id in range(7):
+            documents.append({
+                "id": f"{source}#{chunk_id}",
+                "text": f"{source} chunk {chunk_id} – Fireball 8d6, çğüşıö" * (chunk_id + 1),
+                "metadata": {"source": source, "chunk_id": chunk_id},
+            })
+    return documents
+
+
+def test_round_trip(tmp_path):
+    documents = make_documents()
+    store = ChunkStore(tmp_path, cache_blocks=2).build(documents, block_size=3)
+
+    assert store.available
+    texts = store.get_texts([doc["id"] for doc in documents])
+    assert texts == {doc["id"]: doc["text"] for doc in documents}
+    assert all(store.text_length(doc["id"]) == len(doc["text"]) for doc in documents)
+
+
+def test_reopen_from_disk(tmp_path):
+    documents = make_documents()
+    ChunkStore(tmp_path).build(documents, block_size=4).close()
+
+    reopened = ChunkStore(tmp_path)
+    assert reopened.get_texts(["DMG.pdf#6", "PHB.pdf#0"]) == {
+        "DMG.pdf#6": documents[13]["text"],
+        "PHB.pdf#0": documents[0]["text"],
+    }
+
+
+def test_missing_ids_are_skipped(tmp_path):
+    store = ChunkStore(tmp_path).build(make_documents())
+
+    assert store.get_texts(["yok#1", "PHB.pdf#1"]).keys() == {"PHB.pdf#1"}
+    assert store.text_length("yok#1") is None
+
+
+def test_invalidate_drops_prefix(tmp_path):
+    store = ChunkStore(tmp_path).build(make_documents(), block_size=3)
+
+    assert store.invalidate("PHB.pdf#") == 7
+    assert store.get_texts(["PHB.pdf#0", "DMG.pdf#0"]).keys() == {"DMG.pdf#0"}
+    # Düşürülen id'ler diskteki index'ten de silinir
+    assert "PHB.pdf#0" not in ChunkStore(tmp_path).locations
+
+
+def test_missing_store_is_unavailable(tmp_path):
+    store = ChunkStore(tmp_path)
+
+    assert not store.available
+    assert store.get_texts(["PHB.pdf#0"]) == {}
+
+
+def test_flat_and_sharded_layouts_do_not_overwrite(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_DB_DIR", tmp_path)
+    monkeypatch.setattr(config, "SHARDED_INDEX_DIR", tmp_path / "sharded")
+    flat_docs = [dict(doc, id=f"doc_{i}") for i, doc in enumerate(make_documents())]
+
+    ChunkStore(config.index_dir(sharded=False)).build(flat_docs).close()
+    ChunkStore(config.index_dir(sharded=True)).build(make_documents()).close()
+
+    # Varsayılan klasör USE_SHARDS'a göre seçilir
+    monkeypatch.setattr(config, "USE_SHARDS", False)
+    assert ChunkStore().get_texts(["doc_0"]) == {"doc_0": flat_docs[0]["text"]}
+    assert "PHB.pdf#0" not in ChunkStore().locations
+    monkeypatch.setattr(config, "USE_SHARDS", True)
+    assert "doc_0" not in ChunkStore().locations
+    assert "PHB.pdf#0" in ChunkStore().locations
@@ -0,0 +1,138 @@
+"""Retrieval sonrası: MMR seçimi, ardışık chunk birleştirme ve adaptive top-k"""
+
+import numpy as np
+
+from context_optimizer import choose_adaptive_k, mmr_select, merge_adjacent_chunks
+from retrieval_types import RetrievedChunk
+
+
+def doc(doc_id, source, chunk_id, text="", similarity=0.5, embedding=None):
+    return RetrievedChunk(doc_id, text, {"source": source, "chunk_id": chunk_id},
+                          distance=1 - similarity, similarity=similarity, embedding=embedding)
+
+
+# ---------- MMR ----------
+
+QUERY = np.array([1.0, 0.0, 0.0])
+# a ve a2 neredeyse aynı yönde (tekrar), b daha az alakalı ama farklı
+CANDIDATES = [
+    doc("a", "PHB.pdf", 1, embedding=[0.95, 0.31, 0.0]),
+    doc("a2", "PHB.pdf", 9, embedding=[0.94, 0.34, 0.0]),
+    doc("b", "DMG.pdf", 4, embedding=[0.80, 0.0, 0.60]),
+]
+
+
+def ids(docs):
+    return [d.id for d in docs]
+
+
+def test_mmr_pure_relevance_keeps_similarity_order():
+    assert ids(mmr_select(QUERY, CANDIDATES, k=2, lambda_mult=1.0, duplicate_threshold=1.1)) == ["a", "a2"]
+
+
+def test_mmr_prefers_diverse_chunk():
+    assert ids(mmr_select(QUERY, CANDIDATES, k=2, lambda_mult=0.5, duplicate_threshold=1.1)) == ["a", "b"]
+
+
+def test_mmr_drops_near_duplicates():
+    selected = mmr_select(QUERY, CANDIDATES, k=3, lambda_mult=1.0, duplicate_threshold=0.95)
+
+    assert ids(selected) == ["a", "b"]
+
+
+def test_mmr_without_embeddings_keeps_order():
+    plain = [doc("x", "PHB.pdf", 1), doc("y", "PHB.pdf", 2), doc("z", "PHB.pdf", 3)]
+
+    assert ids(mmr_select(QUERY, plain, k=2)) == ["x", "y"]
+    assert mmr_select(QUERY, [], k=2) == []
+
+
+# ---------- Birleştirme ----------
+
+def test_merges_consecutive_chunks_once_through_overlap():
+    docs = [
+        doc("PHB#2", "PHB.pdf", 2, "the creature is prone until it stands up", 0.6),
+        doc("PHB#1", "PHB.pdf", 1, "When knocked down, the creature is prone", 0.8),
+    ]
+
+    merged = merge_adjacent_chunks(docs, max_overlap=100)
+
+    assert len(merged) == 1
+    span = merged[0]
+    assert span.text == "When knocked down, the creature is prone until it stands up"
+    assert span.metadata["merged_chunk_ids"] == [1, 2]
+    assert span.merged_ids == ["PHB#1", "PHB#2"]
+    # Span skoru en alakalı parçanın skoru
+    assert span.similarity == 0.8
+
+
+def test_non_adjacent_chunks_stay_separate():
+    docs = [doc("PHB#1", "PHB.pdf", 1, "one", 0.9), doc("PHB#3", "PHB.pdf", 3, "three", 0.7)]
+
+    merged = merge_adjacent_chunks(docs)
+
+    assert ids(merged) == ["PHB#1", "PHB#3"]
+    assert all(len(d.merged_ids) == 1 for d in merged)
+
+
+def test_same_chunk_ids_from_different_sources_are_not_merged():
+    docs = [doc("PHB#1", "PHB.pdf", 1, "phb", 0.7), doc("DMG#2", "DMG.pdf", 2, "dmg", 0.9)]
+
+    merged = merge_adjacent_chunks(docs)
+
+    assert ids(merged) == ["DMG#2", "PHB#1"]
+    assert merged[0].text == "dmg"
+
+
+def test_merge_joins_with_space_when_no_overlap_and_keeps_input_intact():
+    first = doc("PHB#5", "PHB.pdf", 5, "Fireball deals 8d6 fire damage.", 0.9)
+    second = doc("PHB#6", "PHB.pdf", 6, "Each creature makes a Dexterity save.", 0.5)
+
+    merged = merge_adjacent_chunks([first, second])
+
+    assert merged[0].text == "Fireball deals 8d6 fire damage. Each creature makes a Dexterity save."
+    # Girdi document'ları değişmez
+    assert first.text == "Fireball deals 8d6 fire damage."
+    assert "merged_chunk_ids" not in first.metadata
+
+
+def test_chunks_without_int_chunk_id_pass_through():
+    web = RetrievedChunk("web-1", "web text", {"source": "web", "chunk_id": "N/A"}, similarity=0.99)
+    merged = merge_adjacent_chunks([web, doc("PHB#1", "PHB.pdf", 1, "x", 0.1)])
+
+    assert ids(merged) == ["PHB#1", "web-1"]
+
+
+# ---------- Adaptive k ----------
+
+def test_adaptive_k_cuts_at_gap():
+    assert choose_adaptive_k([0.9, 0.88, 0.86, 0.6, 0.58], min_k=2, max_k=10) == (3, "gap")
+
+
+def test_adaptive_k_gap_before_min_k_is_ignored():
+    # En büyük düşüş 1. chunk'tan sonra ama en az 2 chunk istenir
+    k, method = choose_adaptive_k([0.9] + [0.5] * 20, min_k=2, max_k=10)
+
+    assert k == 2
+    assert method != "gap"
+
+
+def test_adaptive_k_knee_without_sharp_gap():
+    assert choose_adaptive_k([0.90, 0.86, 0.82, 0.80, 0.79, 0.78, 0.78, 0.78], min_k=2, max_k=10) == (4, "knee")
+
+
+def test_adaptive_k_cumulative_on_steady_decline():
+    assert choose_adaptive_k([0.90, 0.86, 0.82, 0.78, 0.74, 0.70], min_k=2, max_k=10) == (4, "cumulative")
+
+
+def test_adaptive_k_flat_scores_keep_all():
+    assert choose_adaptive_k([0.8] * 6, min_k=2, max_k=10) == (6, "flat")
+
+
+def test_adaptive_k_bounds():
+    assert choose_adaptive_k([0.9, 0.5], min_k=2, max_k=10) == (2, "all")
+    # max_k'dan sonraki adaylar hesaba girmez
+    k, _ = choose_adaptive_k([0.8] * 30, min_k=2, max_k=5)
+    assert k == 5
+    # Skoru olmayan aday 0 sayılır
+    assert choose_adaptive_k([None, 0.7, 0.6], min_k=1, max_k=10) == (2, "gap")
@@ -0,0 +1,72 @@
+"""ContextPacker: bütçe aşılmaz, en alakalı chunk kalır, 0 bütçe = dokunma"""
+
+import numpy as np
+import pytest
+
+from context_packer import ContextPacker, TokenCounter
+from retrieval_types import RetrievedChunk, format_context
+
+DIM = 8
+
+
+def fake_embed(sentences):
+    # Cümle başına sabit, uzunluğa bağlı vektör (model yüklemeden)
+    return np.asarray([np.roll(np.eye(DIM)[0], len(s) % DIM) + 0.1 for s in sentences])
+
+
+def chunk(i, similarity, sentences=6):
+    text = " ".join(f"Rule {i}.{n} says the creature moves {n * 5} feet when prone." for n in range(sentences))
+    return RetrievedChunk(f"PHB#{i}", text, {"source": "PHB.pdf", "chunk_id": i}, similarity=similarity)
+
+
+@pytest.fixture
+def packer():
+    # TOKENIZER_MODEL boş: ~4 karakter/token yaklaşımı
+    return ContextPacker(TokenCounter(""), fake_embed)
+
+
+def test_packed_context_stays_within_budget(packer):
+    docs = [chunk(i, 0.9 - i * 0.1) for i in range(6)]
+    counter = packer.token_counter
+
+    for budget in (60, 150, 300):
+        packed, stats = packer.pack(np.ones(DIM), docs, budget, format_context)
+        assert counter.count(format_context(packed)) <= budget
+        assert stats["context_tokens"] <= budget
+        assert len(packed) + stats["chunks_dropped"] == len(docs)
+
+
+def test_keeps_highest_ranked_chunk_first(packer):
+    docs = [chunk(1, 0.4), chunk(2, 0.9), chunk(3, 0.6)]
+    first_cost = packer.token_counter.count(format_context([docs[1]]))
+
+    packed, stats = packer.pack(np.ones(DIM), docs, first_cost + 5, format_context)
+
+    assert packed[0].id == "PHB#2"
+    assert not packed[0].compressed
+    assert stats["chunks_dropped"] + stats["chunks_compressed"] >= 1
+
+
+def test_pinned_chunk_wins_over_similarity(packer):
+    pinned = chunk(7, 0.1)
+    pinned.pinned = True
+    packed, _ = packer.pack(np.ones(DIM), [chunk(1, 0.9), pinned], 200, format_context)
+
+    assert packed[0].id == "PHB#7"
+
+
+def test_oversized_chunk_is_compressed_to_sentences(packer):
+    doc = chunk(1, 0.9, sentences=20)
+    packed, stats = packer.pack(np.ones(DIM), [doc], 120, format_context)
+
+    assert stats["chunks_compressed"] == 1
+    assert packed[0].compressed
+    assert len(packed[0].text) < len(doc.text)
+
+
+def test_zero_budget_returns_input_unchanged(packer):
+    docs = [chunk(i, 0.5) for i in range(3)]
+    packed, stats = packer.pack(np.ones(DIM), docs, 0, format_context)
+
+    assert packed is docs
+    assert stats == {"context_token_budget": 0}
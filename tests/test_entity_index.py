@@ -0,0 +1,43 @@
+"""AhoCorasick: iç içe ve örtüşen pattern'lerin hepsi bulunur"""
+
+from entity_index import AhoCorasick
+
+
+def build(patterns):
+    automaton = AhoCorasick()
+    for pattern in patterns:
+        automaton.add(pattern, pattern)
+    automaton.build()
+    return automaton
+
+
+def found(automaton, text):
+    return sorted((start, end, value) for start, end, value in automaton.find(text))
+
+
+def test_overlapping_matches():
+    automaton = build(["he", "she", "his", "hers"])
+
+    assert found(automaton, "ushers") == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_nested_entity_names():
+    automaton = build(["fireball", "delayedblastfireball", "blast"])
+
+    assert found(automaton, "castdelayedblastfireballnow") == [
+        (4, 24, "delayedblastfireball"),
+        (11, 16, "blast"),
+        (16, 24, "fireball"),
+    ]
+
+
+def test_repeated_and_self_overlapping():
+    automaton = build(["aa", "aaa"])
+
+    assert found(automaton, "aaaa") == [
+        (0, 2, "aa"), (0, 3, "aaa"), (1, 3, "aa"), (1, 4, "aaa"), (2, 4, "aa"),
+    ]
+
+
+def test_no_match():
+    assert build(["prone", "grappled"]).find("stunned") == []
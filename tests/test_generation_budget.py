@@ -0,0 +1,82 @@
+"""GenerationBudgets: soru sınıfları (regex sırası) ve bütçe seçimi"""
+
+import pytest
+
+from config import config
+from generation_budget import DEFAULT_BUDGET, LLAMA_STOP, GenerationBudgets
+
+
+@pytest.mark.parametrize("question, expected", [
+    # Karşılaştırma, "what is"/"how many" kalıplarından önce gelir
+    ("What is the difference between a spell attack and a saving throw spell?", "comparison"),
+    ("What is the difference in damage?", "comparison"),
+    ("Fireball vs Lightning Bolt", "comparison"),
+    ("Is a longsword better than a greatsword?", "comparison"),
+    # Sayısal, "how ..." procedural'dan ve "what is" definition'dan önce gelir
+    ("How many spell slots does a 3rd level wizard have?", "numeric"),
+    ("How much does plate armor cost?", "numeric"),
+    ("How far can I jump?", "numeric"),
+    ("What is the range of Fireball?", "numeric"),
+    ("What's the DC for a death save?", "numeric"),
+    ("Fireball kaç hasar verir?", "numeric"),
+    ("How do I calculate armor class?", "procedural"),
+    ("What happens when I drop to 0 hit points?", "procedural"),
+    ("Nasıl multiclass yaparım?", "procedural"),
+    ("What does Prone do?", "definition"),
+    ("What is a saving throw?", "definition"),
+    ("Explain concentration", "definition"),
+    ("Grappled nedir?", "definition"),
+    ("Tell me about dwarves", "general"),
+])
+def test_classify_question(question, expected):
+    assert GenerationBudgets.classify_question(question) == expected
+
+
+def test_disabled_budgets_use_defaults(monkeypatch):
+    monkeypatch.setattr(config, "GENERATION_BUDGETS", False)
+
+    budget = GenerationBudgets().budget("What is the range of Fireball?")
+
+    # Sınıf yine kaydedilir ama limitler eski sabitler
+    assert budget == {"class": "numeric", "llama": DEFAULT_BUDGET["llama"],
+                      "claude": DEFAULT_BUDGET["claude"], "stop": [], "hint": None}
+
+
+def test_enabled_budgets_per_class(monkeypatch):
+    monkeypatch.setattr(config, "GENERATION_BUDGETS", True)
+    monkeypatch.setattr(config, "GENERATION_BUDGET_TOKENS", {
+        "numeric": {"llama": 160, "claude": 300},
+        "comparison": {"llama": 448, "claude": 900},
+    })
+    budgets = GenerationBudgets()
+
+    numeric = budgets.budget("How many hit dice does a fighter have?")
+    assert (numeric["llama"], numeric["claude"]) == (160, 300)
+    assert numeric["stop"] == LLAMA_STOP + ["\n\n"]
+    assert numeric["hint"]
+
+    comparison = budgets.budget("Compare grapple and shove")
+    assert (comparison["llama"], comparison["claude"]) == (448, 900)
+    assert comparison["stop"] == LLAMA_STOP
+    assert comparison["hint"] is None
+
+    # Config'te olmayan sınıf varsayılan limitleri alır
+    general = budgets.budget("Tell me about dwarves")
+    assert (general["llama"], general["claude"]) == (DEFAULT_BUDGET["llama"], DEFAULT_BUDGET["claude"])
+
+
+def test_record_and_stats(monkeypatch):
+    monkeypatch.setattr(config, "GENERATION_BUDGETS", False)
+    budgets = GenerationBudgets()
+    budget = budgets.budget("What is the range of Fireball?")
+
+    summary = budgets.record("llama", budget, tokens=256, truncated=False, ms=900.0)
+    budgets.record("llama", budget, tokens=512, truncated=True, ms=1800.0)
+
+    assert summary == {"class": "numeric", "budget": 512, "tokens": 256, "truncated": False}
+    stats = budgets.stats()["llama"]["numeric"]
+    assert stats["count"] == 2
+    assert stats["tokens_mean"] == 384.0
+    assert stats["budget_used"] == 0.75
+    assert stats["truncated_rate"] == 0.5
+    assert budgets.stats()["claude"] == {}
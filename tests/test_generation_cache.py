@@ -0,0 +1,74 @@
+"""GenerationCache: anahtar parmak izi, LRU ve TTL"""
+
+import pytest
+
+import generation_cache
+from generation_cache import GenerationCache
+
+OPTIONS = {"system": "You are a D&D rules assistant.", "options": {"temperature": 0.7, "num_predict": 512}}
+CHUNKS = ["PHB#12", "PHB#13"]
+
+
+@pytest.fixture
+def cache():
+    return GenerationCache(max_size=3, ttl=60)
+
+
+def test_normalized_query_hits(cache):
+    key = cache.make_key("llama", OPTIONS, "What does Prone do?", CHUNKS)
+    cache.set(key, "crawl")
+
+    for variant in ["what does prone do", "  WHAT   does Prone do ?? ", "What does\tProne do"]:
+        assert cache.get(cache.make_key("llama", OPTIONS, variant, CHUNKS)) == "crawl"
+
+
+@pytest.mark.parametrize("model, options, query, chunk_ids", [
+    ("claude", OPTIONS, "What does Prone do?", CHUNKS),
+    ("llama", {**OPTIONS, "options": {"temperature": 0.2, "num_predict": 512}}, "What does Prone do?", CHUNKS),
+    ("llama", {**OPTIONS, "options": {"temperature": 0.7, "num_predict": 160}}, "What does Prone do?", CHUNKS),
+    ("llama", {**OPTIONS, "web_context": "extra"}, "What does Prone do?", CHUNKS),
+    ("llama", OPTIONS, "What does Prone do?", list(reversed(CHUNKS))),
+    ("llama", OPTIONS, "What does Prone do?", CHUNKS[:1]),
+    ("llama", OPTIONS, "What does Grappled do?", CHUNKS),
+])
+def test_any_generation_input_change_misses(cache, model, options, query, chunk_ids):
+    cache.set(cache.make_key("llama", OPTIONS, "What does Prone do?", CHUNKS), "crawl")
+
+    assert cache.get(cache.make_key(model, options, query, chunk_ids)) is None
+
+
+def test_option_dict_order_does_not_matter(cache):
+    reordered = {"options": {"num_predict": 512, "temperature": 0.7}, "system": OPTIONS["system"]}
+
+    assert cache.make_key("llama", OPTIONS, "q", CHUNKS) == cache.make_key("llama", reordered, "q", CHUNKS)
+
+
+def test_lru_evicts_least_recently_used(cache):
+    for name in "abc":
+        cache.set(name, name.upper())
+    # "a" kullanıldı, en eski "b"
+    assert cache.get("a") == "A"
+    cache.set("d", "D")
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+    assert cache.stats()["size"] == 3
+
+
+def test_ttl_expiry(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(generation_cache.time, "time", lambda: now[0])
+
+    cache.set("k", "answer")
+    now[0] += 59
+    assert cache.get("k") == "answer"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_none_key_bypasses(cache):
+    cache.set(None, "x")
+
+    assert cache.get(None) is None
+    assert cache.stats() == {"size": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
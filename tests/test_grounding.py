@@ -0,0 +1,65 @@
+"""GroundingScorer: desteklenen, uydurma ve kaçamak cevaplar"""
+
+import pytest
+
+from grounding import GroundingScorer, terms
+
+SOURCES = [
+    "A grappled creature's speed becomes 0, and it can't benefit from any bonus to its speed. "
+    "The condition ends if the grappler is incapacitated.",
+    "Prone: A prone creature's only movement option is to crawl. The creature has disadvantage "
+    "on attack rolls. An attack roll against the creature has advantage if the attacker is within 5 feet.",
+]
+
+
+@pytest.fixture
+def scorer():
+    return GroundingScorer(min_support=0.3, full_support=0.65)
+
+
+def test_supported_answer(scorer):
+    result = scorer.score(
+        "A grappled creature's speed becomes 0 and it can't benefit from bonuses to speed "
+        "(Source 1). Attacks against a prone creature within 5 feet have advantage (Source 2).",
+        SOURCES
+    )
+
+    assert result["confidence"] == 1.0
+    assert result["unsupported_numbers"] == 0
+    assert result["invalid_citations"] == 0
+
+
+def test_fabricated_answer(scorer):
+    result = scorer.score(
+        "A grappled creature takes 2d6 bludgeoning damage each round and must make a "
+        "DC 15 Strength saving throw to escape (Source 3).",
+        SOURCES
+    )
+
+    assert result["confidence"] == 0.0
+    assert result["unsupported_numbers"] > 0
+    assert result["invalid_citations"] == 1
+
+
+def test_refusal(scorer):
+    result = scorer.score("I don't have enough information to answer that.", SOURCES)
+
+    assert result["confidence"] == 0.0
+    assert result["claims"] == 0
+
+
+def test_no_sources(scorer):
+    assert scorer.score("A grappled creature's speed becomes 0 (Source 1).", [])["confidence"] == 0.0
+
+
+def test_full_text_scores_higher_than_preview(scorer):
+    # Sadece önizleme verilirse cevabın desteği eksik sayılır
+    answer = "An attack roll against a prone creature has advantage if the attacker is within 5 feet (Source 1)."
+    full = scorer.score(answer, [SOURCES[1]])["confidence"]
+    preview = scorer.score(answer, [SOURCES[1][:60]])["confidence"]
+
+    assert full > preview
+
+
+def test_terms_drop_stopwords_and_stem():
+    assert terms("The grappled creature and the grappling") == {"grappl", "creatu"}
@@ -0,0 +1,60 @@
+"""ModelRouter: kolay/zor ayrımı ve MODEL_ROUTING kapalıyken büyük model"""
+
+import pytest
+
+from config import config
+from model_router import ModelRouter
+
+
+def make_router():
+    return ModelRouter(min_similarity=0.7, max_words=12)
+
+
+@pytest.mark.parametrize("question, entities, similarity, easy", [
+    # Kısa, tek entity -> similarity düşük olsa da kolay
+    ("What does Prone do?", [{"key": "prone"}], 0.4, True),
+    # Kısa, entity yok ama güçlü retrieval
+    ("How long does a short rest take?", [], 0.85, True),
+    # Kısa, entity yok, zayıf retrieval
+    ("How long does a short rest take?", [], 0.55, False),
+    # Birden fazla entity = karşılaştırma
+    ("Compare Fireball and Lightning Bolt", [{"key": "fireball"}, {"key": "lightning bolt"}], 0.9, False),
+    # Uzun soru
+    ("How does grappling interact with the Prone condition and opportunity attacks "
+     "when the target is already restrained?", [{"key": "prone"}], 0.9, False),
+])
+def test_classify_easy_split(monkeypatch, question, entities, similarity, easy):
+    monkeypatch.setattr(config, "MODEL_ROUTING", True)
+    router = make_router()
+
+    decision = router.classify([{"similarity": similarity}], question, entities)
+
+    assert decision["easy"] is easy
+    assert decision["tier"] == ("small" if easy else "large")
+    assert decision["model"] == router.models[decision["tier"]]
+    assert decision["entity_hits"] == len(entities)
+
+
+def test_routing_disabled_always_large(monkeypatch):
+    monkeypatch.setattr(config, "MODEL_ROUTING", False)
+    router = make_router()
+
+    decision = router.classify([{"similarity": 0.95}], "What does Prone do?", [{"key": "prone"}])
+
+    # Sınıflandırma yine loglanır ama model her zaman büyük
+    assert decision["easy"] is True
+    assert decision["tier"] == "large"
+    assert decision["model"] == config.OLLAMA_MODEL
+
+
+def test_stats_per_tier():
+    router = make_router()
+    router.record("small", 400.0, 0.9)
+    router.record("small", None, None)
+    router.record("large", 1200.0, 0.8)
+
+    stats = router.stats()
+    assert stats["small"]["count"] == 2
+    assert stats["small"]["latency_ms_mean"] == 400.0
+    assert stats["small"]["fallback_rate"] == 0.5
+    assert stats["large"]["fallback_rate"] == 0.0
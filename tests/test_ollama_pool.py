@@ -0,0 +1,74 @@
+"""OllamaPool: en az bekleyen isteği olan sunucu seçilir, eşitlikte sırayla"""
+
+import pytest
+
+from ollama_pool import OllamaPool
+from resilience import BackendUnavailable
+
+URLS = ["http://a:11434", "http://b:11434", "http://c:11434"]
+
+
+def make_pool(**kwargs) -> OllamaPool:
+    return OllamaPool(URLS, eject_failures=2, eject_seconds=60, health_interval=0, **kwargs)
+
+
+def test_picks_least_outstanding():
+    pool = make_pool()
+    a, b, c = pool.endpoints
+    a.outstanding, b.outstanding, c.outstanding = 2, 0, 1
+
+    assert pool.acquire() is b
+    assert b.outstanding == 1
+    # b ve c eşit (1), a dolu
+    assert pool.acquire() in (b, c)
+
+
+def test_ties_rotate_across_servers():
+    pool = make_pool()
+    chosen = []
+    for _ in range(3):
+        endpoint = pool.acquire()
+        chosen.append(endpoint.url)
+        pool.release(endpoint, ok=True)
+
+    assert sorted(chosen) == URLS
+
+
+def test_concurrent_requests_spread_evenly():
+    pool = make_pool()
+    held = [pool.acquire() for _ in range(6)]
+
+    assert [e.outstanding for e in pool.endpoints] == [2, 2, 2]
+    for endpoint in held:
+        pool.release(endpoint, ok=True)
+    assert [e.outstanding for e in pool.endpoints] == [0, 0, 0]
+
+
+def test_prefer_within_one_request_of_least_loaded():
+    pool = make_pool()
+    a, b, _ = pool.endpoints
+    a.outstanding = 1
+
+    assert pool.acquire(prefer=a.url) is a
+    # a artık 2, en boş sunucu 0: tercih yok sayılır
+    assert pool.acquire(prefer=a.url) is not a
+
+
+def test_failing_server_is_ejected():
+    pool = make_pool()
+    a = pool.endpoints[0]
+    for _ in range(2):
+        a.outstanding += 1
+        pool.release(a, ok=False)
+
+    assert not a.healthy
+    assert all(pool.acquire() is not a for _ in range(4))
+
+
+def test_no_healthy_server_raises():
+    pool = OllamaPool(URLS[:1], eject_failures=1, eject_seconds=60, health_interval=0)
+    endpoint = pool.acquire()
+    pool.release(endpoint, ok=False)
+
+    with pytest.raises(BackendUnavailable):
+        pool.acquire()
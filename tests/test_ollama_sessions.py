@@ -0,0 +1,76 @@
+"""OllamaSessionStore: context kaydı/değiştirme, TTL, sıfırlama ve LRU"""
+
+import ollama_sessions
+from ollama_sessions import OllamaSessionStore
+
+
+def test_update_replaces_context():
+    store = OllamaSessionStore(max_sessions=4, max_context_tokens=100, ttl=60)
+
+    first = store.get("s", "llama")
+    assert first.context is None and first.turns == 0
+    store.update(first, [1, 2, 3], "http://a")
+
+    second = store.get("s", "llama")
+    assert (second.context, second.endpoint, second.turns) == ([1, 2, 3], "http://a", 1)
+
+    # Yeni context eskisini ekleyerek değil, tamamen değiştirerek yazılır
+    store.update(second, [1, 2, 3, 4, 5], "http://b")
+    third = store.get("s", "llama")
+    assert (third.context, third.endpoint, third.turns) == ([1, 2, 3, 4, 5], "http://b", 2)
+    assert store.stats()["context_tokens"] == 5
+
+
+def test_empty_context_is_not_stored():
+    store = OllamaSessionStore(max_sessions=4, max_context_tokens=100, ttl=60)
+    store.update(store.get("s", "llama"), None, "http://a")
+    store.update(store.get("s", "llama"), [], "http://a")
+    assert store.stats()["sessions"] == 0
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ollama_sessions.time, "time", lambda: now[0])
+    store = OllamaSessionStore(max_sessions=4, max_context_tokens=100, ttl=30)
+
+    store.update(store.get("s", "llama"), [1, 2], None)
+    now[0] += 29
+    assert store.get("s", "llama").context == [1, 2]
+
+    # get() son kullanımı güncellemez; TTL son update'ten sayılır
+    now[0] += 2
+    expired = store.get("s", "llama")
+    assert expired.context is None and expired.turns == 0
+    assert store.stats()["sessions"] == 0
+
+
+def test_context_over_limit_resets_session():
+    store = OllamaSessionStore(max_sessions=4, max_context_tokens=4, ttl=60)
+    store.update(store.get("s", "llama"), [1, 2, 3], None)
+
+    store.update(store.get("s", "llama"), [1, 2, 3, 4, 5], None)
+
+    assert store.get("s", "llama").context is None
+    assert store.resets == 1
+
+
+def test_model_change_drops_context_keeps_turns():
+    store = OllamaSessionStore(max_sessions=4, max_context_tokens=100, ttl=60)
+    store.update(store.get("s", "small"), [1, 2, 3], "http://a")
+
+    session = store.get("s", "large")
+
+    assert session.context is None and session.endpoint is None
+    assert session.turns == 1
+
+
+def test_lru_eviction():
+    store = OllamaSessionStore(max_sessions=2, max_context_tokens=100, ttl=60)
+    store.update(store.get("a", "llama"), [1], None)
+    store.update(store.get("b", "llama"), [2], None)
+    store.get("a", "llama")  # 'a' en son kullanılan
+    store.update(store.get("c", "llama"), [3], None)
+
+    assert store.get("a", "llama").context == [1]
+    assert store.get("b", "llama").context is None
+    assert store.evictions == 1
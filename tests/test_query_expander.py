@@ -0,0 +1,61 @@
+"""fuse_rankings: Reciprocal Rank Fusion sırası ve tekilleştirme"""
+
+import pytest
+
+from query_expander import fuse_rankings
+from retrieval_types import RetrievedChunk
+
+
+def doc(doc_id, similarity):
+    return RetrievedChunk(doc_id, f"text {doc_id}", {"source": "PHB.pdf", "chunk_id": 0},
+                          distance=1 - similarity, similarity=similarity)
+
+
+def ids(docs):
+    return [d.id for d in docs]
+
+
+def test_single_query_passthrough():
+    results = [doc("a", 0.9), doc("b", 0.8), doc("c", 0.7)]
+
+    fused = fuse_rankings([results], rrf_k=60)
+
+    assert ids(fused) == ["a", "b", "c"]
+    assert fused[0].fusion_score == pytest.approx(1 / 61)
+    assert [d.similarity for d in fused] == [0.9, 0.8, 0.7]
+
+
+def test_chunk_found_by_several_queries_ranks_first():
+    # "b" hiçbir listede birinci değil ama iki sorguda da var
+    fused = fuse_rankings([
+        [doc("a", 0.9), doc("b", 0.8)],
+        [doc("c", 0.85), doc("b", 0.7)],
+    ])
+
+    assert ids(fused) == ["b", "a", "c"]
+    assert fused[0].fusion_score == pytest.approx(2 / 62)
+
+
+def test_duplicates_are_merged_with_best_similarity():
+    first = doc("a", 0.6)
+    fused = fuse_rankings([[first], [doc("a", 0.9)], [doc("a", 0.7)]])
+
+    assert ids(fused) == ["a"]
+    assert fused[0].similarity == 0.9
+    assert fused[0].distance == pytest.approx(0.1)
+    # Girdi document'ı değişmez
+    assert first.similarity == 0.6
+    assert first.fusion_score is None
+
+
+def test_rrf_k_weights_lower_ranks():
+    lists = [[doc("a", 0.9), doc("b", 0.8), doc("c", 0.7)], [doc("d", 0.75), doc("c", 0.7)]]
+
+    # Küçük k: tek listede birinci olmak kazanır; büyük k: iki listede olmak kazanır
+    assert ids(fuse_rankings(lists, rrf_k=0))[0] == "a"
+    assert ids(fuse_rankings(lists, rrf_k=60))[0] == "c"
+
+
+def test_empty_inputs():
+    assert fuse_rankings([]) == []
+    assert fuse_rankings([[], []]) == []
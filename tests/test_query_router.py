@@ -0,0 +1,70 @@
+"""QueryRouter eğitimi/tahmini ve QueryLog döndürme"""
+
+import numpy as np
+
+from query_router import FEATURE_NAMES, QueryLog, QueryRouter, retrieval_features
+
+
+def make_entry(sim_max, fell_back):
+    docs = [{"similarity": sim_max}, {"similarity": sim_max - 0.1}, {"similarity": sim_max - 0.2}]
+    return {"features": retrieval_features(docs, "What does Prone do?"), "fell_back": fell_back}
+
+
+def test_predict_none_when_untrained(tmp_path):
+    router = QueryRouter(model_path=tmp_path / "missing.json", threshold=0.5)
+
+    assert not router.trained
+    assert router.predict(make_entry(0.9, False)["features"]) is None
+    # Model yoksa router pasif: her soru Llama'ya
+    assert router.route([{"similarity": 0.1}], "What does Prone do?")["decision"] == "llama"
+
+
+def test_fit_separates_synthetic_set(tmp_path):
+    rng = np.random.default_rng(0)
+    entries = ([make_entry(s, True) for s in rng.uniform(0.25, 0.45, 40)]
+               + [make_entry(s, False) for s in rng.uniform(0.7, 0.9, 40)])
+    router = QueryRouter(model_path=tmp_path / "router.json", threshold=0.5).fit(entries)
+
+    assert router.trained and router.model["features"] == FEATURE_NAMES
+    assert router.predict(make_entry(0.3, True)["features"]) > 0.9
+    assert router.predict(make_entry(0.85, False)["features"]) < 0.1
+    assert router.route([{"similarity": 0.3}, {"similarity": 0.2}, {"similarity": 0.1}],
+                        "What does Prone do?")["decision"] == "claude"
+
+    # Kaydedilen model yeniden yüklenince aynı tahmini verir
+    router.save()
+    reloaded = QueryRouter(model_path=tmp_path / "router.json", threshold=0.5)
+    features = make_entry(0.6, False)["features"]
+    assert reloaded.predict(features) == router.predict(features)
+
+
+def test_query_log_rotation(tmp_path):
+    log = QueryLog(path=tmp_path / "query_log.jsonl", max_bytes=600)
+    route = {"features": make_entry(0.8, False)["features"], "decision": "llama",
+             "fallback_probability": 0.1}
+
+    for i in range(10):
+        log.record({"question": f"q{i}", "method_used": "llama",
+                    "diagnostics": {"route": route, "llama_confidence": 0.9}})
+
+    assert log.rotated_path.exists()
+    # Döndürme yazmadan önce yapılır: aktif dosya en fazla max_bytes + bir satır
+    line_size = len(log.path.read_text(encoding="utf-8").splitlines()[0].encode("utf-8")) + 1
+    assert log.path.stat().st_size < log.max_bytes + line_size
+    assert log.rotated_path.stat().st_size >= log.max_bytes
+
+    # Tek yedek tutulur: en eski kayıtlar düşer, kalanlar sıralı
+    questions = [entry["question"] for entry in log.load()]
+    assert questions == [f"q{i}" for i in range(10 - len(questions), 10)]
+    assert len(log.labeled_entries()) == len(questions)
+
+
+def test_query_log_keeps_unrouted_out_of_training(tmp_path):
+    log = QueryLog(path=tmp_path / "query_log.jsonl", max_bytes=600)
+    log.record({"question": "What does Prone do?", "method_used": "entity", "diagnostics": {}})
+
+    # Entity fast path / USE_OLLAMA=false sonuçları loglanır ama label taşımaz
+    entries = log.load()
+    assert len(entries) == 1
+    assert entries[0]["method_used"] == "entity" and entries[0]["route"] is None
+    assert log.labeled_entries() == []
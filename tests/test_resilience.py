@@ -0,0 +1,102 @@
+"""CircuitBreaker durum geçişleri ve istek deadline'ı (0/None = deadline yok)"""
+
+import time
+
+import pytest
+
+from resilience import (CircuitBreaker, DeadlineExceeded, call_timeout, check_deadline,
+                        deadline_expired, make_deadline, wait_timeout)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("llama", failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("llama", failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_single_probe_then_closes():
+    breaker = CircuitBreaker("claude", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    # Deneme sürerken ikinci istek geçmez
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("claude", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_release_frees_probe_without_changing_state():
+    breaker = CircuitBreaker("llama", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("seconds", [0, None, -1])
+def test_zero_or_unset_deadline_is_disabled(seconds):
+    deadline = make_deadline(seconds)
+
+    assert deadline is None
+    # Retrieval adımı DeadlineExceeded fırlatmaz, çağrılar kendi cap'ini kullanır
+    check_deadline(deadline, "retrieval")
+    assert not deadline_expired(deadline)
+    assert call_timeout(deadline, 300, "llama") == 300
+    assert wait_timeout(deadline, 1.5) == 1.5
+    assert wait_timeout(deadline) is None
+
+
+def test_deadline_caps_call_timeout():
+    deadline = make_deadline(10)
+
+    assert deadline is not None
+    assert call_timeout(deadline, 300, "llama") <= 10
+    assert call_timeout(deadline, 5, "claude") == 5
+    assert 0 < wait_timeout(deadline) <= 10
+
+
+def test_expired_deadline_raises():
+    deadline = make_deadline(0.01)
+    time.sleep(0.02)
+
+    assert deadline_expired(deadline)
+    assert wait_timeout(deadline) == 0
+    with pytest.raises(DeadlineExceeded):
+        check_deadline(deadline, "retrieval")
+    with pytest.raises(DeadlineExceeded):
+        call_timeout(deadline, 300, "llama")
@@ -0,0 +1,85 @@
+"""SingleFlight: leader'ın sonucu ve hatası bekleyen çağrılara aynen gider"""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_followers_share_leader_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "cevap"
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("q", compute)))
+    leader.start()
+    started.wait(5)
+
+    followers = [threading.Thread(target=lambda: results.append(flight.do("q", compute))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    # Follower'lar leader'ın call'ına bağlansın
+    while flight.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("cevap", False)] + [("cevap", True)] * 3
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_leader_error_propagates_to_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise ValueError("ollama düştü")
+
+    def call():
+        try:
+            flight.do("q", compute)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call) for _ in range(2)]
+    for t in threads[1:]:
+        t.start()
+    while flight.coalesced < 2:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(errors) == 3
+    # Hepsi leader'ın fırlattığı aynı exception
+    assert all(e is errors[0] for e in errors)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_key_is_released_after_error():
+    flight = SingleFlight()
+
+    with pytest.raises(RuntimeError):
+        flight.do("q", lambda: (_ for _ in ()).throw(RuntimeError("x")))
+
+    # Hata cache'lenmez, sonraki çağrı yeniden hesaplar
+    assert flight.do("q", lambda: 42) == (42, False)